@@ -9,7 +9,7 @@ from pandas import read_excel, read_csv
 # To save the results
 import json
 import pickle
-from time import localtime
+from time import localtime, perf_counter
 from torch import save as torchsave
 from collections import OrderedDict
 # Convenience imports
@@ -24,12 +24,14 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
             group_name = None, plot_interrogation = False, nested_cv = False, robust_priority = False, dynamic_model = False, lag = [0], min_lag = 0,
             significance = 0.05, cat = None, classification = False, xticks = None, yticks = ['y'], model_name = None, cv_method = None, K_fold = 5, Nr = 10,
             num_outer = 10, l1_ratio = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.97, 0.99], alpha = 20, SPLS_K = None, SPLS_eta = None, degree = [1, 2, 3],
-            trans_type = 'all', LCEN_cutoff = 4e-2, LCEN_interaction = True, LCEN_transform_y = False, RF_n_estimators = [10, 25, 50, 100, 200, 300],
+            trans_type = 'all', LCEN_cutoff = 4e-2, LCEN_interaction = True, LCEN_transform_y = False, LCEN_dtype = np.float64, RF_n_estimators = [10, 25, 50, 100, 200, 300],
             RF_max_depth = [2, 3, 5, 10, 15, 20, 40], RF_min_samples_leaf = [0.001, 0.01, 0.02, 0.05, 0.1], RF_n_features = [0.1, 0.25, 0.333, 0.5, 0.667, 0.75, 1.0],
-            SVM_gamma = None, SVM_C = [0.001, 0.01, 0.1, 1, 10, 50, 100, 500], SVM_epsilon = [0.01, 0.02, 0.03, 0.05, 0.08, 0.09, 0.1, 0.15, 0.2, 0.3], activation = ['relu'],
+            SVM_gamma = None, SVM_C = [0.001, 0.01, 0.1, 1, 10, 50, 100, 500], SVM_epsilon = [0.01, 0.02, 0.03, 0.05, 0.08, 0.09, 0.1, 0.15, 0.2, 0.3], ASVM_rank = [100, 300, 1000],
+            activation = ['relu'],
             MLP_layers = None, RNN_layers = None, batch_size = 32, learning_rate = [1e-2, 5e-3], weight_decay = 0, l1_penalty_factor = 0, n_epochs = 100,
             class_weight = None, scheduler = 'plateau', scheduler_mode = 'min', scheduler_factor = 0.5, scheduler_patience = 10, scheduler_min_LR = 1/16,
-            scheduler_last_epoch = None, scheduler_warmup = 10, val_loss_file = None, expand_hyperparameter_search = False, verbosity_level = 2):
+            scheduler_last_epoch = None, scheduler_warmup = 10, val_loss_file = None, expand_hyperparameter_search = False, verbosity_level = 2, EN_solver = 'auto',
+            n_jobs = -1, backend = 'loky', inner_max_num_threads = None, search = 'grid', n_trials = 50):
     """
     The main SPA function, which calls all other functions needed for model building.
 
@@ -104,13 +106,16 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
         A single name to label the y variable in plots generated by SPA.
     model_name : list of str or None, optional, default = None
         The name of the model(s) you want SPA to evaluate.
-        Each entry must be in {'OLS', 'LCEN', 'SVM', 'RF', 'GBDT', 'AdaB', 'EN', 'SPLS', 'PLS', ...
+        Each entry must be in {'OLS', 'LCEN', 'SVM', 'ASVM', 'RF', 'GBDT', 'AdaB', 'EN', 'SPLS', 'PLS', ...
             'MLP', 'RNN'}.
-        If None, SPA determines which model architectures are viable based on the data.
+        'ASVM' is an approximate SVM (Nystroem kernel approximation + linear solver) for large datasets.
+        If None, SPA determines which model architectures are viable based on the data. ASVM replaces SVM when there are more than 50000 samples.
     cv_method : str or None, optional, default = None
         Which cross validation method to use.
         Each entry must be in {'Single', 'KFold', 'MC', 'Re_KFold'} when dynamic_model == False ...
             or {'Single_ordered', 'Timeseries', 'AIC', 'AICc', 'BIC'} when dynamic_model == True.
+        With 'AIC', 'AICc', or 'BIC', models with at least N-1 nonzero coefficients get infinite information criteria and are never selected, ...
+            as they can interpolate the training data.
     K_fold : int, optional, default = 5
         Number of folds used in cross validation.
     Nr : int, optional, default = 10
@@ -150,6 +155,9 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
     LCEN_transform_y : bool, optional, default = False
         Whether to also perform nonlinear transforms on the y variable.
         Relevant only when 'LCEN' in model_name and lag > 0.
+    LCEN_dtype : NumPy float dtype, optional, default = np.float64
+        The dtype of the transformed features. np.float32 halves their memory use, which matters for degree >= 3 transforms of many variables.
+        Relevant only when 'LCEN' is in model_name
     RF_n_estimators : list of integers, optional, default = [10, 25, 50, 100, 200, 300]
         The number of trees in the random forest.
         Relevant only when 'RF' in model_name.
@@ -168,13 +176,16 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
         If 'scale', gamma = 1 / (X.shape[1] * X.var())
         If 'auto', gamma = 1 / X.shape[1]
         If None, gamma = (1 / X.shape[1]) * [1/50, 1/10, 1/5, 1/2, 1, 2, 5, 10, 50]
-        Relevant only when 'SVM' in model_name.
+        Relevant only when 'SVM' or 'ASVM' in model_name.
     SVM_C : list of floats > 0, optional, default = [0.001, 0.01, 0.1, 1, 10, 50, 100, 500]
         Parameter inversely proportional to the strength of the regularization.
-        Relevant only when 'SVM' in model_name.
+        Relevant only when 'SVM' or 'ASVM' in model_name.
     SVM_epsilon : list of floats >= 0, optional, default = [0.01, 0.02, 0.03, 0.05, 0.08, 0.09, 0.1, 0.15, 0.2, 0.3]
         Epsilon-tube within which no penalty is associated in the training loss function.
-        Relevant only when 'SVM' in model_name.
+        Relevant only when 'SVM' or 'ASVM' in model_name.
+    ASVM_rank : list of int > 0, optional, default = [100, 300, 1000]
+        The rank of the Nystroem approximation of the RBF kernel. Larger values are more accurate but slower.
+        Relevant only when 'ASVM' in model_name.
     activation : list of str, optional, default = ['relu']
         The activation function(s) used to build ANNs. Each entry must be in {'relu', 'tanh', 'sigmoid', 'tanhshrink', 'selu'}.
         If multiple values, all are cross-validated and the best is selected.
@@ -244,6 +255,34 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
         2: All in level 1 and progress on the current training (such as CV folds for most models) are printed. [Default]
         3: All in level 2 and additional progress on the current training for MLPs and RNNs, final feature selection information for LCEN, and nested validation progress. Equal to 2 if these model architectures or nested validation is not used.
         4: All in level 3 and progress on each epoch of training for MLPs and RNNs. Equal to 2 if these model architectures are not used.
+    EN_solver : str in {'auto', 'batched', 'path', 'individual'}, optional, default = 'auto'
+        How the EN and LCEN models are fit during cross-validation or IC calculations.
+        'auto': 'batched' if the dataset has fewer than 500 samples and at most 30 features (after the LCEN expansion), 'path' otherwise.
+        'batched': all folds and (l1_ratio, alpha) combinations are fit at once by a vectorized solver, which avoids the per-fit overhead ...
+            of sklearn and joblib on small datasets. Problems with many features are fit as regularization paths in the same process.
+        'path': all alphas of each l1_ratio are fit as one warm-started regularization path, which is much faster than 'individual'.
+        'individual': each (l1_ratio, alpha) combination is fit independently from a cold start.
+        Classification tasks always use 'individual'.
+    n_jobs : int, optional, default = -1
+        The number of workers used to run the cross-validation tasks in parallel. -1 uses all CPUs.
+    backend : str in {'loky', 'threading', 'multiprocessing'}, optional, default = 'loky'
+        The joblib backend used to run the cross-validation tasks in parallel.
+    inner_max_num_threads : int or None, optional, default = None
+        The maximum number of BLAS / OpenMP threads used by each worker. Limiting these threads avoids oversubscribing the CPUs ...
+            when each worker runs multithreaded code (such as SVDs) or when multiple SPA runs share a machine.
+        If None, uses joblib's default, which is the number of CPUs divided by the number of workers for the loky backend.
+        MLP and RNN models are cross-validated in this process, so this limits the threads of torch during their CV instead.
+    search : str in {'grid', 'racing', 'bayes'}, optional, default = 'grid'
+        How the hyperparameters of the RF, GBDT, SVM, and AdaB models are searched during cross-validation.
+        MLP and RNN models always use a grid search, and a warning is printed for them if search != 'grid'.
+        'grid': every hyperparameter combination is evaluated on every fold.
+        'racing': all combinations are evaluated on the first fifth of the folds (at least 2), then those significantly worse than the current best ...
+            (paired t-test) are eliminated before the next fifth of the folds. This is much faster and usually selects the same hyperparameters.
+        'bayes': only n_trials combinations are evaluated, which are proposed by a Gaussian process model of the validation score.
+            This allows passing long lists of hyperparameters (such as np.logspace(-3, 3, 50) for SVM_C) without evaluating all their combinations.
+    n_trials : int, optional, default = 50
+        The number of model fits (per fold) evaluated per model when search == 'bayes'.
+        Staged RF, GBDT, and AdaB fits score all RF_n_estimators values at once, so each counts as one trial but evaluates multiple combinations.
     """
     # Loading group (the actual data) from group_name (a path)
     if group_name:
@@ -299,15 +338,16 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
             # Nonlinear, nondynamic models
             if not dynamic_model:
                 lag, min_lag = [0], 0
+                SVM_type = 'ASVM' if X_original.shape[0] > 50000 else 'SVM' # Exact SVMs become infeasible for large datasets
                 if interpretable:
                     if verbosity_level: print('As your data are nonlinear and you require an interpretable model, only LCEN will be used.')
                 elif continuity:
-                    if verbosity_level: print('As your data are nonlinear, you do not require the model to be interpretable, and you require continuity, LCEN, SVM, and MLP will be tested')
-                    model_name.append('SVM')
+                    if verbosity_level: print(f'As your data are nonlinear, you do not require the model to be interpretable, and you require continuity, LCEN, {SVM_type}, and MLP will be tested')
+                    model_name.append(SVM_type)
                     model_name.append('MLP')
                 else:
-                    if verbosity_level: print('As your data are nonlinear, you do not require the model to be interpretable, and you do not require continuity, LCEN, SVM, MLP, RF, and AdaBoost will be tested')
-                    model_name.append('SVM')
+                    if verbosity_level: print(f'As your data are nonlinear, you do not require the model to be interpretable, and you do not require continuity, LCEN, {SVM_type}, MLP, RF, and AdaBoost will be tested')
+                    model_name.append(SVM_type)
                     model_name.append('MLP')
                     model_name.append('RF')
                     model_name.append('AdaB')
@@ -422,24 +462,31 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
         fitting_result['OLS'] = OrderedDict({'final_model': final_model, 'model_params': model_params, 'mse_train': mse_train, 'mse_test': mse_test, 'yhat_train': yhat_train, 'yhat_test': yhat_test})
     else: # TODO: how do we compare OLS with the other models if OLS doesn't have validation scores?
         if not nested_cv: # Static / traditional CV
-            for index, this_model in enumerate(model_name):
-                if this_model in {'LCEN', 'SVM', 'RF', 'GBDT', 'AdaB', 'EN', 'PLS', 'SPLS'}: # There may be other models if the user passed model_name manually
-                    if verbosity_level >= 2: print(f'Running model {this_model}', end = '\r')
-                    fitting_result[this_model], _ = run_cv_ML(this_model, X, y, X_scale, y_scale, X_test, y_test, X_test_scale, y_test_scale, cv_method, group,
-                                                K_fold, Nr, scale_X, scale_y, classification, l1_ratio, alpha, SPLS_K, SPLS_eta, lag, min_lag, robust_priority, degree,
-                                                trans_type, LCEN_cutoff, LCEN_interaction, LCEN_transform_y, RF_n_estimators, RF_max_depth, RF_min_samples_leaf, RF_n_features,
-                                                learning_rate, SVM_gamma, SVM_C, SVM_epsilon, verbosity_level)
-                    if verbosity_level: print(f'Completed model {this_model}')
-                elif this_model in {'MLP', 'RNN'}: # There may be other models if the user passed model_name manually
-                    temp = cv.CV_mse(this_model, X_scale, y_scale, X_test_scale, y_test_scale, X, y, cv_type = cv_method, group = group, K_fold = K_fold, Nr = Nr,
-                        scale_X = scale_X, scale_y = scale_y, classification = classification, activation = activation, MLP_layers = MLP_layers, RNN_layers = RNN_layers,
-                        batch_size = batch_size, learning_rate = learning_rate, weight_decay = weight_decay, l1_penalty_factor = l1_penalty_factor, n_epochs = n_epochs,
-                        class_weight = class_weight, scheduler = scheduler, scheduler_mode = scheduler_mode, scheduler_factor = scheduler_factor,
-                        scheduler_patience = scheduler_patience, scheduler_last_epoch = scheduler_last_epoch, scheduler_warmup = scheduler_warmup,
-                        val_loss_file = val_loss_file, expand_hyperparameter_search = expand_hyperparameter_search, verbosity_level = verbosity_level)
-                    fitting_result[this_model] = OrderedDict({'final_model': temp[0], 'mse_train': temp[2], 'mse_val': temp[1].min().min(), 'mse_test': temp[3],
-                                                        'best_hyperparameters': temp[6], 'yhat_train': temp[4], 'yhat_test': temp[5]})
-                    if verbosity_level: print(f'Completed model {this_model}' + ' '*15)
+            fold_cache = {} # The CV folds are made and scaled only once, then shared by all models
+            try:
+                for index, this_model in enumerate(model_name):
+                    if this_model in {'LCEN', 'SVM', 'ASVM', 'RF', 'GBDT', 'AdaB', 'EN', 'PLS', 'SPLS'}: # There may be other models if the user passed model_name manually
+                        if verbosity_level >= 2: print(f'Running model {this_model}', end = '\r')
+                        fitting_result[this_model], _ = run_cv_ML(this_model, X, y, X_scale, y_scale, X_test, y_test, X_test_scale, y_test_scale, cv_method, group,
+                                                    K_fold, Nr, scale_X, scale_y, classification, l1_ratio, alpha, SPLS_K, SPLS_eta, lag, min_lag, robust_priority, degree,
+                                                    trans_type, LCEN_cutoff, LCEN_interaction, LCEN_transform_y, RF_n_estimators, RF_max_depth, RF_min_samples_leaf, RF_n_features,
+                                                    learning_rate, SVM_gamma, SVM_C, SVM_epsilon, verbosity_level, ASVM_rank = ASVM_rank, EN_solver = EN_solver, LCEN_dtype = LCEN_dtype, fold_cache = fold_cache,
+                                                    n_jobs = n_jobs, backend = backend, inner_max_num_threads = inner_max_num_threads, search = search, n_trials = n_trials)
+                        if verbosity_level: print(f'Completed model {this_model}')
+                    elif this_model in {'MLP', 'RNN'}: # There may be other models if the user passed model_name manually
+                        start_time = perf_counter()
+                        temp = cv.CV_mse(this_model, X_scale, y_scale, X_test_scale, y_test_scale, X, y, cv_type = cv_method, group = group, K_fold = K_fold, Nr = Nr,
+                            scale_X = scale_X, scale_y = scale_y, classification = classification, activation = activation, MLP_layers = MLP_layers, RNN_layers = RNN_layers,
+                            batch_size = batch_size, learning_rate = learning_rate, weight_decay = weight_decay, l1_penalty_factor = l1_penalty_factor, n_epochs = n_epochs,
+                            class_weight = class_weight, scheduler = scheduler, scheduler_mode = scheduler_mode, scheduler_factor = scheduler_factor,
+                            scheduler_patience = scheduler_patience, scheduler_last_epoch = scheduler_last_epoch, scheduler_warmup = scheduler_warmup,
+                            val_loss_file = val_loss_file, expand_hyperparameter_search = expand_hyperparameter_search, verbosity_level = verbosity_level,
+                            fold_cache = fold_cache, n_jobs = n_jobs, backend = backend, inner_max_num_threads = inner_max_num_threads, search = search, n_trials = n_trials)
+                        fitting_result[this_model] = OrderedDict({'final_model': temp[0], 'mse_train': temp[2], 'mse_val': temp[1].min().min(), 'mse_test': temp[3],
+                                                            'best_hyperparameters': temp[6], 'yhat_train': temp[4], 'yhat_test': temp[5], 'runtime': perf_counter() - start_time})
+                        if verbosity_level: print(f'Completed model {this_model}' + ' '*15)
+            finally:
+                cv.clear_fold_cache(fold_cache)
 
         else: # Nested CV
             if group_name is None:
@@ -450,11 +497,11 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
                     X_nest, X_nest_val, y_nest, y_nest_val = train_test_split(X, y, test_size = 1/K_fold, random_state = index_out)
                     X_nest_scale, X_nest_scale_val, y_nest_scale, y_nest_scale_val = train_test_split(X_scale, y_scale, test_size = 1/K_fold, random_state = index_out)
                     for index, this_model in enumerate(model_name):
-                        if this_model in {'LCEN', 'SVM', 'RF', 'GBDT', 'AdaB', 'EN', 'PLS', 'SPLS'}: # There may be other models if the user passed model_name manually
+                        if this_model in {'LCEN', 'SVM', 'ASVM', 'RF', 'GBDT', 'AdaB', 'EN', 'PLS', 'SPLS'}: # There may be other models if the user passed model_name manually
                             MSE_val[index, index_out] = run_cv_ML(this_model, X_nest, y_nest, X_nest_scale, y_nest_scale, X_nest_val, y_nest_val, X_nest_scale_val, y_nest_scale_val,
                                     cv_method, group, K_fold, Nr, scale_X, scale_y, l1_ratio, alpha, SPLS_K, SPLS_eta, lag, min_lag, robust_priority, degree, trans_type,
                                     LCEN_cutoff, LCEN_transform_y, LCEN_interaction, RF_n_estimators, RF_max_depth, RF_min_samples_leaf, RF_n_features, learning_rate, SVM_gamma,
-                                    SVM_C, SVM_epsilon, verbosity_level, True)
+                                    SVM_C, SVM_epsilon, verbosity_level, True, ASVM_rank = ASVM_rank, EN_solver = EN_solver, LCEN_dtype = LCEN_dtype, n_jobs = n_jobs, backend = backend, inner_max_num_threads = inner_max_num_threads, search = search, n_trials = n_trials)
             else:
                 from sklearn.model_selection import LeaveOneGroupOut
                 MSE_val = np.empty((len(model_name), len(np.unique(group)))) * np.nan
@@ -463,11 +510,11 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
                 for index_out, (train, val) in enumerate( logo.split(X, y.flatten(), groups = group.flatten()) ):
                     if verbosity_level >= 3: print(f'Beginning nested CV loop {index_out+1} out of {len( set(group.flatten()) )}', end = '\r')
                     for index, this_model in enumerate(model_name):
-                        if this_model in {'LCEN', 'SVM', 'RF', 'GBDT', 'AdaB', 'EN', 'PLS', 'SPLS'}: # There may be other models if the user passed model_name manually
+                        if this_model in {'LCEN', 'SVM', 'ASVM', 'RF', 'GBDT', 'AdaB', 'EN', 'PLS', 'SPLS'}: # There may be other models if the user passed model_name manually
                             MSE_val[index, index_out] = run_cv_ML(this_model, X[train], y[train], X_scale[train], y_scale[train], X[val], y[val], X_scale[val], y_scale[val],
                                     cv_method, group[train], K_fold, Nr, scale_X, scale_y, l1_ratio, alpha, SPLS_K, SPLS_eta, lag, min_lag, robust_priority, degree,
                                     trans_type, LCEN_cutoff, LCEN_interaction, LCEN_transform_y, RF_n_estimators, RF_max_depth, RF_min_samples_leaf, RF_n_features,
-                                    learning_rate, SVM_gamma, SVM_C, SVM_epsilon, verbosity_level, True)
+                                    learning_rate, SVM_gamma, SVM_C, SVM_epsilon, verbosity_level, True, ASVM_rank = ASVM_rank, EN_solver = EN_solver, LCEN_dtype = LCEN_dtype, n_jobs = n_jobs, backend = backend, inner_max_num_threads = inner_max_num_threads, search = search, n_trials = n_trials)
 
             # Nested CV MSE results
             time_now = '-'.join([str(elem) for elem in localtime()[:6]]) # YYYY-MM-DD-hh-mm-ss
@@ -494,7 +541,7 @@ def main_SPA(main_data, main_data_y = None, test_data = None, test_data_y = None
             fitting_result[local_selected_model], _ = run_cv_ML(local_selected_model, X, y, X_scale, y_scale, X_test, y_test, X_test_scale, y_test_scale,
                     cv_method, group, K_fold, Nr, scale_X, scale_y, l1_ratio, alpha, SPLS_K, SPLS_eta, lag, min_lag, robust_priority, degree, trans_type,
                     LCEN_cutoff, LCEN_interaction, LCEN_transform_y, RF_n_estimators, RF_max_depth, RF_min_samples_leaf, RF_n_features, learning_rate,
-                    SVM_gamma, SVM_C, SVM_epsilon, verbosity_level)
+                    SVM_gamma, SVM_C, SVM_epsilon, verbosity_level, ASVM_rank = ASVM_rank, EN_solver = EN_solver, LCEN_dtype = LCEN_dtype, n_jobs = n_jobs, backend = backend, inner_max_num_threads = inner_max_num_threads, search = search, n_trials = n_trials)
 
     # Finding the best model
     for idx, entry in enumerate(fitting_result): # TODO: this will probably not work with OLS, since it doesn't have a mse_val entry (see above)
@@ -610,7 +657,7 @@ def load_file(filename):
 
 def run_cv_ML(model_index, X_train, y_train, X_train_scaled, y_train_scaled, X_test, y_test, X_test_scaled, y_test_scaled, cv_method, group, K_fold, Nr, scale_X, scale_y,
               classification, l1_ratio, alpha, SPLS_K, SPLS_eta, lag, min_lag, robust_priority, degree, trans_type, LCEN_cutoff, LCEN_interaction, LCEN_transform_y, RF_n_estimators,
-              RF_max_depth, RF_min_samples_leaf, RF_n_features, learning_rate, SVM_gamma, SVM_C, SVM_epsilon, verbosity_level, for_nested_validation = False):
+              RF_max_depth, RF_min_samples_leaf, RF_n_features, learning_rate, SVM_gamma, SVM_C, SVM_epsilon, verbosity_level, for_nested_validation = False, **kwargs):
     """
     Runs a nondynamic model for CV or final-run purposes. Automatically called by SPA.
 
@@ -622,7 +669,10 @@ def run_cv_ML(model_index, X_train, y_train, X_train_scaled, y_train_scaled, X_t
         Whether the run is done to validate a model through nested validation (NV) (to determine ...
             the best hyperparameters) or test the best model obtained from CV/NV.
         This changes a little the syntax and values returned, but not the logic.
+    **kwargs : dict, optional
+        Additional options passed directly to cv.CV_mse(), such as EN_solver or n_jobs.
     """
+    start_time = perf_counter()
     if for_nested_validation:
         # For the sake of clarity
         X_val, y_val = X_test, y_test
@@ -631,45 +681,46 @@ def run_cv_ML(model_index, X_train, y_train, X_train_scaled, y_train_scaled, X_t
         if model_index == 'LCEN':
             _, _, _, _, mse_val, _, _, _ = cv.CV_mse(model_index, X_train, y_train, X_val, y_val, None, None, cv_method, K_fold, Nr, scale_X = scale_X, scale_y = scale_y,
                     group = group, classification = classification, alpha = alpha, l1_ratio = l1_ratio, lag = lag, min_lag = min_lag, label_name = True, robust_priority = robust_priority,
-                    degree = degree, trans_type = trans_type, LCEN_cutoff = LCEN_cutoff, LCEN_interaction = LCEN_interaction, LCEN_transform_y = LCEN_transform_y, verbosity_level = verbosity_level)
+                    degree = degree, trans_type = trans_type, LCEN_cutoff = LCEN_cutoff, LCEN_interaction = LCEN_interaction, LCEN_transform_y = LCEN_transform_y, verbosity_level = verbosity_level, **kwargs)
         elif model_index in {'RF', 'GBDT', 'AdaB'}:
             _, _, _, mse_val, _, _, _ = cv.CV_mse(model_index, X_train_scaled, y_train_scaled, X_val_scaled, y_val_scaled, X_train, y_train, cv_method, K_fold, Nr,
                     scale_X = scale_X, scale_y = scale_y, group = group, classification = classification, robust_priority = robust_priority, RF_n_estimators = RF_n_estimators,
-                    RF_max_depth = RF_max_depth, RF_min_samples_leaf = RF_min_samples_leaf, RF_n_features = RF_n_features, learning_rate = learning_rate, verbosity_level = verbosity_level)
-        elif model_index == 'SVM':
+                    RF_max_depth = RF_max_depth, RF_min_samples_leaf = RF_min_samples_leaf, RF_n_features = RF_n_features, learning_rate = learning_rate, verbosity_level = verbosity_level, **kwargs)
+        elif model_index in {'SVM', 'ASVM'}:
             _, _, _, mse_val, _, _, _ = cv.CV_mse(model_index, X_train_scaled, y_train_scaled, X_val_scaled, y_val_scaled, X_train, y_train, cv_method, K_fold, Nr, scale_X = scale_X,
                     scale_y = scale_y, group = group, classification = classification, robust_priority = robust_priority, SVM_gamma = SVM_gamma, SVM_C = SVM_C, SVM_epsilon = SVM_epsilon,
-                    verbosity_level = verbosity_level)
+                    verbosity_level = verbosity_level, **kwargs)
         else: # EN, PLS, and SPLS
             _, _, _, _, mse_val, _, _, _ = cv.CV_mse(model_index, X_train_scaled, y_train_scaled, X_val_scaled, y_val_scaled, X_train, y_train, cv_method, K_fold, Nr, scale_X = scale_X,
                     scale_y = scale_y, group = group, classification = classification, alpha = alpha, l1_ratio = l1_ratio, SPLS_K = SPLS_K, SPLS_eta = SPLS_eta, robust_priority = robust_priority,
-                    verbosity_level = verbosity_level)
+                    verbosity_level = verbosity_level, **kwargs)
         return mse_val
     else:
         if model_index == 'LCEN':
             model_hyper, final_model, model_params, mse_train, mse_test, yhat_train, yhat_test, mse_val = cv.CV_mse(model_index, X_train, y_train, X_test, y_test, None, None,
                     cv_method, K_fold, Nr, scale_X = scale_X, scale_y = scale_y, group = group, classification = classification, alpha = alpha, l1_ratio = l1_ratio, lag = lag,
                     min_lag = min_lag, label_name = True, robust_priority = robust_priority, degree = degree, trans_type = trans_type, LCEN_cutoff = LCEN_cutoff,
-                    LCEN_interaction = LCEN_interaction, LCEN_transform_y = LCEN_transform_y, verbosity_level = verbosity_level)
+                    LCEN_interaction = LCEN_interaction, LCEN_transform_y = LCEN_transform_y, verbosity_level = verbosity_level, **kwargs)
             fitting_result = {'model_hyper': model_hyper, 'final_model': final_model, 'model_params': model_params, 'mse_train': mse_train, 'mse_val': mse_val,
                               'mse_test': mse_test, 'yhat_train': yhat_train, 'yhat_test': yhat_test}
         elif model_index in {'RF', 'GBDT', 'AdaB'}:
             model_hyper, final_model, mse_train, mse_test, yhat_train, yhat_test, mse_val = cv.CV_mse(model_index, X_train_scaled, y_train_scaled, X_test_scaled, y_test_scaled,
                     X_train, y_train, cv_method, K_fold, Nr, scale_X = scale_X, scale_y = scale_y, group = group, classification = classification, robust_priority = robust_priority,
                     RF_n_estimators = RF_n_estimators, RF_max_depth = RF_max_depth, RF_min_samples_leaf = RF_min_samples_leaf, RF_n_features = RF_n_features, learning_rate = learning_rate,
-                    verbosity_level = verbosity_level)
+                    verbosity_level = verbosity_level, **kwargs)
             fitting_result = {'model_hyper': model_hyper, 'final_model': final_model, 'mse_train': mse_train, 'mse_val': mse_val, 'mse_test': mse_test,
                               'yhat_train': yhat_train, 'yhat_test': yhat_test}
-        elif model_index == 'SVM':
+        elif model_index in {'SVM', 'ASVM'}:
             model_hyper, final_model, mse_train, mse_test, yhat_train, yhat_test, mse_val = cv.CV_mse(model_index, X_train_scaled, y_train_scaled, X_test_scaled, y_test_scaled,
                     X_train, y_train, cv_method, K_fold, Nr, scale_X = scale_X, scale_y = scale_y, group = group, classification = classification, robust_priority = robust_priority,
-                    SVM_gamma = SVM_gamma, SVM_C = SVM_C, SVM_epsilon = SVM_epsilon, verbosity_level = verbosity_level)
+                    SVM_gamma = SVM_gamma, SVM_C = SVM_C, SVM_epsilon = SVM_epsilon, verbosity_level = verbosity_level, **kwargs)
             fitting_result = {'model_hyper': model_hyper, 'final_model': final_model, 'mse_train': mse_train, 'mse_val': mse_val, 'mse_test': mse_test,
                               'yhat_train': yhat_train, 'yhat_test': yhat_test}
         else: # EN, PLS, and SPLS
             model_hyper, final_model, model_params, mse_train, mse_test, yhat_train, yhat_test, mse_val = cv.CV_mse(model_index, X_train_scaled, y_train_scaled, X_test_scaled,
                     y_test_scaled, X_train, y_train, cv_method, K_fold, Nr, scale_X = scale_X, scale_y = scale_y, group = group, classification = classification, alpha = alpha,
-                    l1_ratio = l1_ratio, SPLS_K = SPLS_K, SPLS_eta = SPLS_eta, robust_priority = robust_priority, verbosity_level = verbosity_level)
+                    l1_ratio = l1_ratio, SPLS_K = SPLS_K, SPLS_eta = SPLS_eta, robust_priority = robust_priority, verbosity_level = verbosity_level, **kwargs)
             fitting_result = {'model_hyper': model_hyper, 'final_model': final_model, 'model_params': model_params, 'mse_train': mse_train, 'mse_val': mse_val,
                               'mse_test': mse_test, 'yhat_train': yhat_train, 'yhat_test': yhat_test}
+        fitting_result['runtime'] = perf_counter() - start_time # In seconds, including CV. Used to compare the accuracy/speed tradeoff of models such as SVM and ASVM
         return OrderedDict(fitting_result), mse_val
@@ -7,6 +7,8 @@ simplefilter(action='ignore', category=FutureWarning)
 def SPLS(X, y, K, eta, kappa = 0.5, select = 'pls2', eps = 1e-4, max_steps = 200):
     """
     A Python port of the original Sparse PLS function by Chun and Keleş (doi.org/10.1111/j.1467-9868.2009.00723.x)
+    Returns [betahat, all_selected, betahat_list, new_selected_list, all_selected_list], where the lists contain the results after ...
+        each of the k = 1..K iterations. As the iterations are sequential, the first k entries are the same as those of an SPLS() call with K = k.
     """
     if K >= X.shape[0] or K > X.shape[1]:
         raise ValueError(f'K = {K} was input to SPLS(), but K must be <= {np.minimum(X.shape[0]-1, X.shape[1])}')
@@ -24,6 +26,9 @@ def SPLS(X, y, K, eta, kappa = 0.5, select = 'pls2', eps = 1e-4, max_steps = 200
     new_selected_list = []
     y_for_PLS = y # This variable is changed in each iteration of the for loop below if select == 'pls2'
     X_for_PLS = X # This variable is changed in each iteration of the for loop below if select == 'simpls'
+    all_selected_list = []
+    # PLS components are nested, so the (k+1)-component PLS model of each iteration is obtained from the first k+1 components of a single K-component model
+    my_PLS = PLSRegression(K, scale = False, tol = eps).fit(X, y)
 
     for k in range(K):
         # PLS setup and PLS
@@ -31,11 +36,10 @@ def SPLS(X, y, K, eta, kappa = 0.5, select = 'pls2', eps = 1e-4, max_steps = 200
         direction_vector = _SPLS_dv(Z, eta, kappa, eps, max_steps).squeeze()
         all_selected = np.unique(potential_idx[(direction_vector != 0) | (betahat != 0)]) # All selected variables
         new_selected_list.append( potential_idx[(direction_vector != 0) | (betahat == 0)] ) # Variables that were selected in this iteration of the for loop
-        xA = X[:, all_selected]
-        my_PLS = PLSRegression(k+1, scale = False, tol = eps).fit(X, y)
-        # Updating the beta
+        all_selected_list.append(all_selected)
+        # Updating the beta with the coefficients of the (k+1)-component PLS model
         betahat = np.zeros((X.shape[1]))
-        betahat[all_selected] = my_PLS.coef_.squeeze()[all_selected]
+        betahat[all_selected] = PLS_coef(my_PLS, k+1).squeeze()[all_selected]
         betahat_list.append(betahat)
         if select.casefold() == 'pls2':
             temp = (X@betahat).reshape(-1, 1) # Reshaping to avoid broadcasting issues
@@ -44,7 +48,50 @@ def SPLS(X, y, K, eta, kappa = 0.5, select = 'pls2', eps = 1e-4, max_steps = 200
             proj = 'TODO' # TODO
             raise NotImplementedError('select = "simpls" has not been implemented yet. Please use select = "pls2"')
 
-    return [betahat, all_selected, betahat_list, new_selected_list]
+    return [betahat, all_selected, betahat_list, new_selected_list, all_selected_list]
+
+def SPLS_path(X, y, K, eta, kappa = 0.5, select = 'pls2', eps = 1e-4, max_steps = 200):
+    """
+    Runs SPLS() for multiple eta values at once. The K-component PLS model and its coefficients after each iteration do not depend on eta, ...
+        so they are calculated only once. For a single response, the direction vectors of all etas are also calculated together.
+    Returns [betahat_list, all_selected_list], where betahat_list[e] and all_selected_list[e] are the betahat_list and all_selected_list ...
+        returned by SPLS() with eta = eta[e].
+    """
+    if K >= X.shape[0] or K > X.shape[1]:
+        raise ValueError(f'K = {K} was input to SPLS_path(), but K must be <= {np.minimum(X.shape[0]-1, X.shape[1])}')
+    if select.casefold() == 'simpls':
+        raise NotImplementedError('select = "simpls" has not been implemented yet. Please use select = "pls2"')
+    eta = np.atleast_1d(eta)
+    if len(y.shape) == 1:
+        y = y.reshape(-1, 1)
+    if y.shape[1] > 1: # The direction vectors of multiple responses are calculated iteratively by _SPLS_dv()
+        results = [SPLS(X, y, K, this_eta, kappa, select, eps, max_steps) for this_eta in eta]
+        return [[result[2] for result in results], [result[4] for result in results]]
+
+    betahat = np.zeros((X.shape[1], len(eta))) # One column per eta
+    betahat_list = [[] for _ in eta]
+    all_selected_list = [[] for _ in eta]
+    my_PLS = PLSRegression(K, scale = False, tol = eps).fit(X, y)
+    for k in range(K):
+        # Same as _SPLS_dv() and _UST() for all etas: Z is normalized by its median, and only whether each entry of the direction vector is nonzero matters
+        Z = X.T @ (y - X@betahat) # y_for_PLS of select == 'pls2' for each eta
+        Z = Z / np.median(np.abs(Z), axis = 0)
+        direction_nonzero = np.abs(Z) - eta * np.max(np.abs(Z), axis = 0) > 0
+        all_selected = direction_nonzero | (betahat != 0)
+        betahat = np.where(all_selected, PLS_coef(my_PLS, k+1), 0)
+        for eta_idx in range(len(eta)):
+            betahat_list[eta_idx].append(betahat[:, eta_idx])
+            all_selected_list[eta_idx].append(np.flatnonzero(all_selected[:, eta_idx]))
+
+    return [betahat_list, all_selected_list]
+
+def PLS_coef(PLS_model, k):
+    """
+    Returns the coefficients of the model made of the first k components of a fitted PLSRegression with scale = False.
+    PLS components are nested, so these are the same as the coef_.T of a PLSRegression(k, scale = False) fit to the same data.
+    """
+    W, P, Q = PLS_model.x_weights_[:, :k], PLS_model.x_loadings_[:, :k], PLS_model.y_loadings_[:, :k]
+    return W @ np.linalg.pinv(P.T @ W) @ Q.T
 
 def _SPLS_dv(Z, eta, kappa, eps, max_steps):
     """
@@ -54,14 +101,21 @@ def _SPLS_dv(Z, eta, kappa, eps, max_steps):
     if Z.shape[1] == 1:
         circle = _UST(Z, eta)
     else:
-        M = Z @ Z.T # Matrix multiplication
+        # M = Z @ Z.T is p x p but has rank <= Z.shape[1], so M @ v is calculated as Z @ (Z.T @ v) without forming M (power iteration on the thin factors)
+        if kappa != 0.5:
+            M = Z @ Z.T # Matrix multiplication
         circle = np.ones((Z.shape[0], 1))
         for idx in range(max_steps):
             # Calculating the A vector
             if kappa == 0.5:
-                U, _, V = np.linalg.svd(M @ circle)
-                U = np.atleast_2d(U[:, 0]).T # We want just the first vector, but we want a 2D Nx1 array
-                A = U @ V # Matrix multiplication
+                M_circle = Z @ (Z.T @ circle)
+                norm = np.linalg.norm(M_circle)
+                if norm > 0: # U[:, 0] @ V of the SVD of the p x 1 matrix M @ circle, which is simply M @ circle normalized
+                    A = M_circle / norm
+                else: # The SVD of a zero matrix returns the identity as U
+                    A = np.zeros_like(M_circle)
+                    A[0] = 1
+                M_A = Z @ (Z.T @ A)
             else: # TODO: not tested since SPA always calls SPLS with kappa = 0.5
                 while _hfunction(eps, M, circle, kappa2) <= 1e5 and _hfunction(eps, M, circle, kappa2) * _hfunction(1e30, M, circle, kappa2) > 0:
                     M *= 2
@@ -69,8 +123,9 @@ def _SPLS_dv(Z, eta, kappa, eps, max_steps):
                 # Optimizing A for a fixed circle
                 lambda_s = least_squares(_hfunction, eps, args = (M, circle, kappa2), bounds = (eps, 1e30)).x[0]
                 A = kappa2 * np.linalg.inv(M + lambda_s*np.identity(M.shape[0])) @ M @ circle
+                M_A = M @ A
             # Updating the circle based on the new A vector
-            current_circle = _UST(M@A, eta)
+            current_circle = _UST(M_A, eta)
             discrepancy = np.max(np.abs(current_circle-circle))
             circle = current_circle
             if discrepancy <= eps:
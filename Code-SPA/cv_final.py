@@ -5,9 +5,18 @@ from sklearn.utils._testing import ignore_warnings
 from sklearn.metrics import mean_squared_error as MSE
 from sklearn.metrics import confusion_matrix
 from scipy.special import softmax
+from scipy.stats import t as t_dist, norm
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import ConstantKernel, Matern, WhiteKernel
 import regression_models as rm
 from itertools import product
-from joblib import Parallel, delayed
+from joblib import Parallel, delayed, dump, load, parallel_config, effective_n_jobs
+from threadpoolctl import threadpool_limits
+import os
+import warnings
+from tempfile import mkdtemp
+from shutil import rmtree
+from contextlib import contextmanager, ExitStack, nullcontext
 import torch
 from torch.utils.data import Dataset, DataLoader
 import pandas as pd
@@ -37,59 +46,55 @@ def CVpartition(X, y, Type = 'Re_KFold', K = 5, Nr = 10, random_state = 0, group
     group : list, optional, default = None
         Group indices for grouped CV methods.
     """
+    for train_index, val_index in CVpartition_indices(X, y, Type, K, Nr, random_state, group):
+        yield (X[train_index], y[train_index], X[val_index], y[val_index])
+
+def CVpartition_indices(X, y, Type = 'Re_KFold', K = 5, Nr = 10, random_state = 0, group = None):
+    """
+    Partitions data for cross-validation and bootstrapping without copying the data.
+    Returns a generator with the (train_index, val_index) of each fold, which index the rows of X and y.
+    The parameters are the same as those of CVpartition().
+    """
     Type = Type.casefold() # To avoid issues with uppercase/lowercase
+    if Type in {'single_group', 'group', 'group_no_extrapolation'}:
+        label, group_idx = np.unique(np.ravel(group), return_inverse = True) # group_idx[i] is the position of the group of sample i in label
     if Type == 'mc':
         CV = ShuffleSplit(n_splits = Nr, test_size = 1/K, random_state = random_state)
-        for train_index, val_index in CV.split(X, y):
-            yield (X[train_index], y[train_index], X[val_index], y[val_index])
+        yield from CV.split(X, y)
     elif Type == 'single':
-        X, X_test, y, y_test = train_test_split(X, y, test_size = 1/K, random_state = random_state)
-        yield (X, y, X_test, y_test)
+        train_index, val_index = train_test_split(np.arange(X.shape[0]), test_size = 1/K, random_state = random_state)
+        yield (train_index, val_index)
     elif Type == 'kfold':
         CV = KFold(n_splits = int(K))
-        for train_index, val_index in CV.split(X, y):
-            yield (X[train_index], y[train_index], X[val_index], y[val_index])
+        yield from CV.split(X, y)
     elif Type == 'stratifiedkfold':
         CV = StratifiedKFold(n_splits = int(K), shuffle = True, random_state = 123)
-        for train_index, val_index in CV.split(X, y):
-            yield (X[train_index], y[train_index], X[val_index], y[val_index])
+        yield from CV.split(X, y)
     elif Type == 're_kfold':
         CV = RepeatedKFold(n_splits = int(K), n_repeats = Nr, random_state = random_state)
-        for train_index, val_index in CV.split(X, y):
-            yield (X[train_index], y[train_index], X[val_index], y[val_index])
+        yield from CV.split(X, y)
     elif Type == 'timeseries':
         TS = TimeSeriesSplit(n_splits = int(K))
-        for train_index, val_index in TS.split(X):
-            yield (X[train_index], y[train_index], X[val_index], y[val_index])
+        yield from TS.split(X)
     elif Type == 'single_group':
-        label = np.unique(group)
-        num = int(len(label)/K)
-        final_list = np.squeeze(group == label[0])
-        for i in range(1, num):
-            final_list = final_list | np.squeeze(group == label[i])
-        yield(X[~final_list], y[~final_list], X[final_list], y[final_list])
-    elif Type == 'group':
-        label = np.unique(group)
+        num = max(int(len(label)/K), 1) # The first num groups are used for validation
+        val_mask = group_idx < num
+        yield (np.flatnonzero(~val_mask), np.flatnonzero(val_mask))
+    elif Type in {'group', 'group_no_extrapolation'}:
         for i in range(len(label)):
-            yield(X[np.squeeze(group != label[i])], y[np.squeeze(group != label[i])], X[np.squeeze(group == label[i])], y[np.squeeze(group == label[i])])
-    elif Type == 'group_no_extrapolation':
-        label = np.unique(group)
-        for i in range(len(label)):
-            if min(label) < label[i] and label[i] < max(label):
-                yield(X[np.squeeze(group != label[i])], y[np.squeeze(group != label[i])], X[np.squeeze(group == label[i])], y[np.squeeze(group == label[i])])
+            if Type == 'group' or (min(label) < label[i] and label[i] < max(label)):
+                yield (np.flatnonzero(group_idx != i), np.flatnonzero(group_idx == i))
     elif Type == 'groupkfold':
         gkf = GroupKFold(n_splits = int(K))
-        for train_index, val_index in gkf.split(X, y, groups = group):
-            yield (X[train_index], y[train_index], X[val_index], y[val_index])
+        yield from gkf.split(X, y, groups = group)
     elif Type == 'groupshufflesplit':
         gss = GroupShuffleSplit(n_splits = int(Nr), test_size = 1 / K, random_state = random_state)
-        for train_index, val_index in gss.split(X, y, groups = group):
-            yield (X[train_index], y[train_index], X[val_index], y[val_index])
+        yield from gss.split(X, y, groups = group)
     elif Type == 'no_cv':
-        yield (X, y, X, y)
+        yield (np.arange(X.shape[0]), np.arange(X.shape[0]))
     elif Type == 'single_ordered':
-        num = X.shape[0]
-        yield (X[:num-round(X.shape[0]*1/K):], y[:num-round(X.shape[0]*1/K):], X[num-round(X.shape[0]*1/K):], y[num-round(X.shape[0]*1/K):])
+        num = X.shape[0] - round(X.shape[0]*1/K)
+        yield (np.arange(num), np.arange(num, X.shape[0]))
     else:
         raise ValueError(f'{Type} is not a valid CV type.')
 
@@ -141,47 +146,65 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
         kwargs['scale_y'] = True
     if 'verbosity_level' not in kwargs:
         kwargs['verbosity_level'] = 2
+    if 'EN_solver' not in kwargs: # How EN and LCEN models are fit during CV
+        kwargs['EN_solver'] = 'auto'
+    elif kwargs['EN_solver'] not in {'auto', 'batched', 'path', 'individual'}:
+        raise ValueError(f'EN_solver must be in {{"auto", "batched", "path", "individual"}}, but you passed {kwargs["EN_solver"]}')
+    if 'n_jobs' not in kwargs: # Parallelization of the CV tasks
+        kwargs['n_jobs'] = -1
+    if 'backend' not in kwargs:
+        kwargs['backend'] = 'loky'
+    elif kwargs['backend'] not in {'loky', 'threading', 'multiprocessing'}:
+        raise ValueError(f'backend must be in {{"loky", "threading", "multiprocessing"}}, but you passed {kwargs["backend"]}')
+    if 'inner_max_num_threads' not in kwargs: # Max BLAS / OpenMP threads used by each worker. None uses joblib's default
+        kwargs['inner_max_num_threads'] = None
+    if 'search' not in kwargs: # How the hyperparameters of RF, GBDT, SVM, and AdaB models are searched during CV
+        kwargs['search'] = 'grid'
+    elif kwargs['search'] not in {'grid', 'racing', 'bayes'}:
+        raise ValueError(f'search must be in {{"grid", "racing", "bayes"}}, but you passed {kwargs["search"]}')
+    if 'racing_folds' not in kwargs: # Number of folds evaluated in each round of racing. None uses a fifth of the folds (at least 2)
+        kwargs['racing_folds'] = None
+    if 'racing_alpha' not in kwargs: # Significance level used to eliminate hyperparameters during racing
+        kwargs['racing_alpha'] = 0.05
+    if 'n_trials' not in kwargs: # Number of model fits (per fold) evaluated by the Bayesian search. All n_estimators of a staged RF/GBDT/AdaB fit count as one
+        kwargs['n_trials'] = 50
+    if 'bayes_batch' not in kwargs: # Number of hyperparameter combinations proposed at once by the Bayesian search
+        kwargs['bayes_batch'] = 5
+    if 'fold_cache' not in kwargs: # A dict shared by CV_mse calls with the same data (such as all models of a main_SPA run) to reuse their CV folds
+        kwargs['fold_cache'] = None
+    EN_solver = _EN_solver(X.shape[0], X.shape[1], kwargs)
 
     if model_name == 'EN':
         hyperparam_prod = list(product(kwargs['l1_ratio'], kwargs['alpha']))
         MSE_result = np.empty((len(kwargs['alpha']) * len(kwargs['l1_ratio']), K_fold*Nr)) * np.nan
         Var = np.empty((len(kwargs['alpha']) * len(kwargs['l1_ratio']), K_fold*Nr)) * np.nan
+        path_groups = _path_groups(hyperparam_prod, 1) # Each l1_ratio is fit as a single regularization path over all alphas
 
-        with Parallel(n_jobs = -1) as PAR:
-            for counter, (X_train, y_train, X_val, y_val) in enumerate(CVpartition(X_unscaled, y_unscaled, Type = cv_type, K = K_fold, Nr = Nr, group = group)):
-                # Rescaling here to avoid validation dataset leakage
-                if kwargs['scale_X'] and len(X.shape) == 2 and X.shape[1] > 0: # StandardScaler doesn't work with 3D arrays or with arrays that are 2D but empty in one dimension
-                    scaler_x = StandardScaler(with_mean=True, with_std=True)
-                    scaler_x.fit(X_train)
-                    X_train_scale = scaler_x.transform(X_train)
-                    X_val_scale = scaler_x.transform(X_val)
-                else:
-                    X_train_scale = X_train
-                    X_val_scale = X_val
-                if kwargs['scale_y'] and not kwargs['classification']:
-                    scaler_y = StandardScaler(with_mean=True, with_std=True)
-                    scaler_y.fit(y_train)
-                    y_train_scale = scaler_y.transform(y_train)
-                    y_val_scale = scaler_y.transform(y_val)
-                else:
-                    y_train_scale = y_train
-                    y_val_scale = y_val
-                temp = PAR(delayed(rm.EN_fitting)(X_train_scale, y_train_scale, X_val_scale, y_val_scale, this_prod[1], this_prod[0], classification = kwargs['classification'],
-                                    class_weight = kwargs['class_weight']) for this_prod in hyperparam_prod)
-                if not kwargs['classification']:
-                    _, temp_var_count, _, MSE_result[:, counter], _, _ = zip(*temp)
+        fold_indices, fold_key = _CV_fold_indices(X_unscaled, y_unscaled, cv_type, K_fold, Nr, group, kwargs)
+        if EN_solver == 'batched': # All folds and hyperparameters are fit at once in this process
+            folds = [tuple(np.array(elem) for elem in fold) for fold in _cached_folds(X_unscaled, y_unscaled, fold_indices, fold_key, kwargs)] # Copies, as _scaled_folds() reuses its buffers
+            l1_ratio, alpha = np.array(hyperparam_prod).T
+            loss_test, n_vars = rm.EN_batch_fitting(*zip(*folds), alpha, l1_ratio, cv_mode = True)
+            MSE_result[:, :len(folds)], Var[:, :len(folds)] = loss_test.T, n_vars.T
+        else:
+            tasks = [] # All (fold, hyperparameter) tasks are run as a single stream by _CV_dispatch()
+            for counter in range(len(fold_indices)):
+                if EN_solver == 'path':
+                    for (l1_ratio,), (rows, path_alpha) in path_groups.items():
+                        tasks.append((counter, rows, len(path_alpha), counter, delayed(rm.EN_path_fitting)(path_alpha, l1_ratio, cv_mode = True)))
                 else:
-                    _, temp_var_count, _, loss_dicts, _, _ = zip(*temp)
-                    MSE_result[:, counter] = [elem['MCC'] for elem in loss_dicts]
-                Var[:, counter] = [np.sum(elem != 0) for elem in temp_var_count]
+                    for prod_idx, (l1_ratio, alpha) in enumerate(hyperparam_prod):
+                        tasks.append((counter, [prod_idx], -alpha, counter, delayed(rm.EN_fitting)(alpha, l1_ratio, classification = kwargs['classification'],
+                                        class_weight = kwargs['class_weight'], cv_mode = True))) # Low alphas take the longest to converge
+            _CV_dispatch(tasks, _scaled_folds(X_unscaled, y_unscaled, fold_indices, kwargs), (MSE_result, Var), model_name, kwargs, fold_key)
 
-        MSE_mean = np.nanmean(MSE_result, axis = 1)
+        MSE_mean = _row_nanmean(MSE_result)
         if not kwargs['classification']:
             ind = np.nanargmin(MSE_mean) # Minimize the MSE
         else:
             ind = np.nanargmax(MSE_mean) # Maximize the MCC
         if kwargs['robust_priority']:
-            MSE_std = np.nanstd(MSE_result, axis = 1)
+            MSE_std = _row_nanstd(MSE_result)
             MSE_min = MSE_mean[ind]
             Var_num = np.nansum(Var, axis = 1) # Here, Var is n_hyperparams x n_folds, and Var_num is n_hyperparams
             if not kwargs['classification']:
@@ -213,34 +236,24 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
         # Var = np.empty((len(kwargs['SPLS_K']) * len(kwargs['SPLS_eta']), X_unscaled.shape[1], K_fold*Nr)) * np.nan
         Var = np.empty((len(kwargs['SPLS_K']) * len(kwargs['SPLS_eta']), K_fold*Nr)) * np.nan # Var is n_hyperparams x n_folds because rm.SPLS_fitting() can return a different number of variables each time, so we do some processing to directly save the number of variables in the Var array
 
-        with Parallel(n_jobs = -1) as PAR:
-            for counter, (X_train, y_train, X_val, y_val) in enumerate(CVpartition(X_unscaled, y_unscaled, Type = cv_type, K = K_fold, Nr = Nr, group = group)):
-                # Rescaling here to avoid validation dataset leakage
-                if kwargs['scale_X'] and len(X.shape) == 2 and X.shape[1] > 0: # StandardScaler doesn't work with 3D arrays or with arrays that are 2D but empty in one dimension
-                    scaler_x = StandardScaler(with_mean=True, with_std=True)
-                    scaler_x.fit(X_train)
-                    X_train_scale = scaler_x.transform(X_train)
-                    X_val_scale = scaler_x.transform(X_val)
-                else:
-                    X_train_scale = X_train
-                    X_val_scale = X_val
-                if kwargs['scale_y'] and not kwargs['classification']:
-                    scaler_y = StandardScaler(with_mean=True, with_std=True)
-                    scaler_y.fit(y_train)
-                    y_train_scale = scaler_y.transform(y_train)
-                    y_val_scale = scaler_y.transform(y_val)
-                else:
-                    y_train_scale = y_train
-                    y_val_scale = y_val
-                temp = PAR(delayed(rm.SPLS_fitting)(X_train_scale, y_train_scale, X_val_scale, y_val_scale, this_prod[0], this_prod[1]) for this_prod in hyperparam_prod)
-                _, temp_var_count, _, MSE_result[:, counter], _, _ = zip(*temp)
-                Var[:, counter] = [np.sum(elem != 0) for elem in temp_var_count]
+        tasks = []
+        fold_indices, fold_key = _CV_fold_indices(X_unscaled, y_unscaled, cv_type, K_fold, Nr, group, kwargs)
+        PLS_rows = [prod_idx for prod_idx, (K, eta) in enumerate(hyperparam_prod) if not eta] # eta = 0 is regular PLS, whose components are nested
+        SPLS_rows = [prod_idx for prod_idx, (K, eta) in enumerate(hyperparam_prod) if eta]
+        for counter in range(len(fold_indices)):
+            if PLS_rows: # All K values of regular PLS are scored from a single fit with the largest K
+                PLS_K = [hyperparam_prod[prod_idx][0] for prod_idx in PLS_rows]
+                tasks.append((counter, PLS_rows, max(PLS_K), counter, delayed(rm.PLS_path_fitting)(PLS_K, cv_mode = True)))
+            if SPLS_rows: # All (K, eta) of SPLS are scored from a single SPLS run with the largest K
+                SPLS_K, SPLS_eta = zip(*[hyperparam_prod[prod_idx] for prod_idx in SPLS_rows])
+                tasks.append((counter, SPLS_rows, max(SPLS_K) * len(SPLS_rows), counter, delayed(rm.SPLS_path_fitting)(SPLS_K, SPLS_eta, cv_mode = True)))
+        _CV_dispatch(tasks, _scaled_folds(X_unscaled, y_unscaled, fold_indices, kwargs), (MSE_result, Var), model_name, kwargs, fold_key)
 
-        MSE_mean = np.nanmean(MSE_result, axis = 1)
+        MSE_mean = _row_nanmean(MSE_result)
         # Min MSE value (first occurrence)
         ind = np.nanargmin(MSE_mean)
         if kwargs['robust_priority']:
-            MSE_std = np.nanstd(MSE_result, axis = 1)
+            MSE_std = _row_nanstd(MSE_result)
             MSE_min = MSE_mean[ind]
             MSE_bar = MSE_min + MSE_std[ind]
             Var_num = np.nansum(Var, axis = 1) # Here, Var is n_hyperparams x n_folds, and Var_num is n_hyperparams
@@ -271,45 +284,29 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
             kwargs['LCEN_interaction'] = True
         if 'LCEN_transform_y' not in kwargs:
             kwargs['LCEN_transform_y'] = False
+        if 'LCEN_dtype' not in kwargs: # dtype of the expanded features. np.float32 halves the memory used by high-degree expansions of many variables
+            kwargs['LCEN_dtype'] = np.float64
         kwargs['selection'] = None # for the _LCEN_joblib_fun called below
         kwargs['all_pos_X'] = np.all(X >= 0, axis = 0) & np.all(X_test >= 0, axis = 0) # Whether all entries in X are positive; used in _feature_trans() inside regression_models.py
         kwargs['all_pos_y'] = np.all(y >= 0, axis = 0) & np.all(y_test >= 0, axis = 0) # Whether all entries in y are positive; used in _feature_trans() inside regression_models.py
         # First run for variable selection using a L1_ratio of 1 (that is, only using an L1 penalty)
         hyperparam_prod = list(product(kwargs['degree'], [1], kwargs['alpha'], kwargs['lag']))
         if kwargs['verbosity_level'] >= 2: print(f'Beginning variable selection runs. There are {len(hyperparam_prod)} hyperparameter combinations')
-        with Parallel(n_jobs = -1) as PAR:
-            if 'IC' in cv_type: # Information criterion
-                temp = PAR(delayed(_LCEN_joblib_fun)(X, y, X_test, y_test, eps, kwargs, prod_idx, this_prod) for prod_idx, this_prod in enumerate(hyperparam_prod))
-                temp = list(zip(*temp))[2] # To isolate the (AIC, AICc, BIC) tuple, which is the 3rd subentry of each entry in the original temp
-                temp = np.array(temp)
-                if cv_type == 'AICc':
-                    IC_result = temp[:, 1]
-                elif cv_type == 'BIC':
-                    IC_result = temp[:, 2]
-                else: # AIC
-                    IC_result = temp[:, 0]
-                ind = np.argmin(IC_result)
-            else: # Cross-validation
-                MSE_result = np.empty((len(kwargs['degree']) * len(kwargs['alpha']) * len(kwargs['lag']), K_fold*Nr)) * np.nan
-                for counter, (X_train, y_train, X_val, y_val) in enumerate(CVpartition(X, y, Type = cv_type, K = K_fold, Nr = Nr, group = group)):
-                    temp = PAR(delayed(_LCEN_joblib_fun)(X_train, y_train, X_val, y_val, eps, kwargs,
-                            prod_idx, this_prod, counter) for prod_idx, this_prod in enumerate(hyperparam_prod))
-                    if not kwargs['classification']:
-                        MSE_result[:, counter], _, _ = zip(*temp)
-                    else:
-                        loss_dicts, _, _ = zip(*temp)
-                        MSE_result[:, counter] = [elem['MCC'] for elem in loss_dicts]
-                # Best hyperparameters for the preliminary run
-                MSE_mean = np.nanmean(MSE_result, axis = 1)
-                if not kwargs['classification']:
-                    ind = np.nanargmin(MSE_mean) # Minimize the MSE
-                else:
-                    ind = np.nanargmax(MSE_mean) # Maximize the MCC
+        MSE_result, _, IC_result = _LCEN_run_stage(X, y, X_test, y_test, hyperparam_prod, cv_type, K_fold, Nr, group, eps, kwargs)
+        if 'IC' in cv_type: # Information criterion
+            ind = np.argmin(IC_result)
+        else: # Cross-validation
+            # Best hyperparameters for the preliminary run
+            MSE_mean = _row_nanmean(MSE_result)
+            if not kwargs['classification']:
+                ind = np.nanargmin(MSE_mean) # Minimize the MSE
+            else:
+                ind = np.nanargmax(MSE_mean) # Maximize the MCC
         # Run to obtain the coefficients when LCEN is run with L1_ratio = 1
         degree, l1_ratio, alpha, lag = hyperparam_prod[ind]
         _, LCEN_params, _, _, _, _, label_names, _ = rm.LCEN_fitting(X, y, X_test, y_test, alpha, l1_ratio, degree, lag, kwargs['min_lag'], kwargs['trans_type'],
                                         kwargs['LCEN_interaction'], kwargs['selection'], kwargs['LCEN_transform_y'], kwargs['all_pos_X'], kwargs['all_pos_y'],
-                                        kwargs['scale_X'], kwargs['scale_y'], kwargs['classification'], kwargs['class_weight'])
+                                        kwargs['scale_X'], kwargs['scale_y'], kwargs['classification'], kwargs['class_weight'], kwargs['LCEN_dtype'])
         kwargs['selection'] = (np.abs(LCEN_params) >= kwargs['LCEN_cutoff'])&(np.abs(LCEN_params) != 0) # 1st clip step
         if kwargs['classification']: # Classification generates one set of features per class, but there is no way (to my knowledge) to run the EN step with a different set of features for each class
             kwargs['selection'] = np.any(kwargs['selection'], axis = 0)
@@ -317,45 +314,26 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
         # Second run with a free L1_ratio but fixed degree and lag
         hyperparam_prod = list(product([degree], kwargs['l1_ratio'], kwargs['alpha'], [lag])) # Degree and lag have been fixed above
         if kwargs['verbosity_level'] >= 2: print(f'Beginning real runs. There are {len(hyperparam_prod)} hyperparameter combinations')
-        with Parallel(n_jobs = -1) as PAR:
-            if 'IC' in cv_type: # Information criterion
-                temp = PAR(delayed(_LCEN_joblib_fun)(X, y, X_test, y_test, eps, kwargs, prod_idx, this_prod) for prod_idx, this_prod in enumerate(hyperparam_prod))
-                temp = list(zip(*temp))[2] # To isolate the (AIC, AICc, BIC) tuple, which is the 3rd subentry of each entry in the original temp
-                temp = np.array(temp)
-                if cv_type == 'AICc':
-                    IC_result = temp[:, 1]
-                elif cv_type == 'BIC':
-                    IC_result = temp[:, 2]
-                else: # AIC
-                    IC_result = temp[:, 0]
-                ind = np.argmin(IC_result)
+        MSE_result, Var, IC_result = _LCEN_run_stage(X, y, X_test, y_test, hyperparam_prod, cv_type, K_fold, Nr, group, eps, kwargs)
+        if 'IC' in cv_type: # Information criterion
+            ind = np.argmin(IC_result)
+        else:
+            # Best hyperparameters
+            MSE_mean = _row_nanmean(MSE_result)
+            if not kwargs['classification']:
+                ind = np.nanargmin(MSE_mean) # Minimize the MSE
             else:
-                MSE_result = np.empty((len(kwargs['alpha']) * len(kwargs['l1_ratio']), K_fold*Nr)) * np.nan
-                Var = np.empty((len(kwargs['alpha']) * len(kwargs['l1_ratio']), K_fold*Nr)) * np.nan # Used when robust_priority == True
-                for counter, (X_train, y_train, X_val, y_val) in enumerate(CVpartition(X, y, Type = cv_type, K = K_fold, Nr = Nr, group = group)):
-                    temp = PAR(delayed(_LCEN_joblib_fun)(X_train, y_train, X_val, y_val, eps, kwargs, prod_idx,
-                            this_prod, counter) for prod_idx, this_prod in enumerate(hyperparam_prod))
-                    if not kwargs['classification']:
-                        MSE_result[:, counter], Var[:, counter], _ = zip(*temp)
-                    else:
-                        loss_dicts, Var[:, counter], _ = zip(*temp)
-                        MSE_result[:, counter] = [elem['MCC'] for elem in loss_dicts]
-                # Best hyperparameters
-                MSE_mean = np.nanmean(MSE_result, axis = 1)
+                ind = np.nanargmax(MSE_mean) # Maximize the MCC
+            if kwargs['robust_priority']:
+                MSE_std = _row_nanstd(MSE_result)
+                MSE_min = MSE_mean[ind]
+                Var_num = np.nansum(Var, axis = 1) # Here, Var is n_hyperparams x n_folds, and Var_num is n_hyperparams
                 if not kwargs['classification']:
-                    ind = np.nanargmin(MSE_mean) # Minimize the MSE
+                    MSE_bar = MSE_min + MSE_std[ind]
+                    ind = np.nonzero( Var_num == np.nanmin(Var_num[MSE_mean < MSE_bar]) )[0][0] # Hyperparams with the lowest number of variables but still within one stdev of the best MSE
                 else:
-                    ind = np.nanargmax(MSE_mean) # Maximize the MCC
-                if kwargs['robust_priority']:
-                    MSE_std = np.nanstd(MSE_result, axis = 1)
-                    MSE_min = MSE_mean[ind]
-                    Var_num = np.nansum(Var, axis = 1) # Here, Var is n_hyperparams x n_folds, and Var_num is n_hyperparams
-                    if not kwargs['classification']:
-                        MSE_bar = MSE_min + MSE_std[ind]
-                        ind = np.nonzero( Var_num == np.nanmin(Var_num[MSE_mean < MSE_bar]) )[0][0] # Hyperparams with the lowest number of variables but still within one stdev of the best MSE
-                    else:
-                        MSE_bar = MSE_min - MSE_std[ind] # Despite the name, MSE_min is more like MCC_max in this context
-                        ind = np.nonzero( Var_num == np.nanmin(Var_num[MSE_mean > MSE_bar]) )[0][0] # Hyperparams with the lowest number of variables but still within one stdev of the best MCC
+                    MSE_bar = MSE_min - MSE_std[ind] # Despite the name, MSE_min is more like MCC_max in this context
+                    ind = np.nonzero( Var_num == np.nanmin(Var_num[MSE_mean > MSE_bar]) )[0][0] # Hyperparams with the lowest number of variables but still within one stdev of the best MCC
 
         # Hyperparameter setup
         degree, l1_ratio, alpha, lag = hyperparam_prod[ind]
@@ -363,7 +341,7 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
         # Final run with the test set and best hyperparameters
         LCEN_model, LCEN_params, _, _, _, _, label_names, ICs = rm.LCEN_fitting(X, y, X_test, y_test, alpha, l1_ratio, degree, lag, kwargs['min_lag'], kwargs['trans_type'],
                                         kwargs['LCEN_interaction'], kwargs['selection'], kwargs['LCEN_transform_y'], kwargs['all_pos_X'], kwargs['all_pos_y'],
-                                        kwargs['scale_X'], kwargs['scale_y'], kwargs['classification'], kwargs['class_weight'])
+                                        kwargs['scale_X'], kwargs['scale_y'], kwargs['classification'], kwargs['class_weight'], kwargs['LCEN_dtype'])
         label_names = label_names[kwargs['selection']]
         # Removing the features that had small coefficients after the final model selection (2nd clip step)
         if kwargs['classification'] and len( set(y.squeeze()) ) == 2: # Binary classification generates only one set of features for the positive class, but the set of features for the negative class is just that of the positive class * -1
@@ -383,7 +361,7 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
             label_names = [label_names[elem] for elem in final_selection]
         # Unscaling the model coefficients as per stackoverflow.com/questions/23642111/how-to-unscale-the-coefficients-from-an-lmer-model-fitted-with-a-scaled-respon
         if not kwargs['LCEN_transform_y'] and X.shape[1] > 0:
-            X, X_test, _ = rm._feature_trans(X, X_test, degree, kwargs['LCEN_interaction'], kwargs['trans_type'], kwargs['all_pos_X'], kwargs['all_pos_y'])
+            X, X_test, _ = rm._feature_trans(X, X_test, degree, kwargs['LCEN_interaction'], kwargs['trans_type'], kwargs['all_pos_X'], kwargs['all_pos_y'], kwargs['LCEN_dtype'])
         if lag > 0:
             X_temp = np.hstack([X[lag-1-idx : -idx-1, :] for idx in range(kwargs['min_lag'], lag)]) # The additional entries representing the previous times (t-1 to t-lag)
             y_temp = np.hstack([y[lag-1-idx : -idx-1] for idx in range(kwargs['min_lag'], lag)])
@@ -393,7 +371,7 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
             y = y[lag:] # Shorterning y
             X_test = np.hstack((X_test, X_test_temp, y_test_temp))
         if kwargs['LCEN_transform_y']: # Feature transformation that includes the y features in the X and X_test variables
-            X, X_test, _ = rm._feature_trans(X, X_test, degree, kwargs['LCEN_interaction'], kwargs['trans_type'], kwargs['all_pos_X'], kwargs['all_pos_y'])
+            X, X_test, _ = rm._feature_trans(X, X_test, degree, kwargs['LCEN_interaction'], kwargs['trans_type'], kwargs['all_pos_X'], kwargs['all_pos_y'], kwargs['LCEN_dtype'])
         if not kwargs['classification']:
             LCEN_params_unscaled = np.zeros_like(LCEN_params)
             y_vars = np.array(['y' in label_names[idx] for idx in range(len(label_names))])
@@ -491,42 +469,23 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
                         S[i, j, k] = i/len(kwargs['max_depth']) - k/len(kwargs['min_samples_leaf'])
         """
 
-        with Parallel(n_jobs = -1) as PAR:
-            for counter, (X_train, y_train, X_val, y_val) in enumerate(CVpartition(X_unscaled, y_unscaled, Type = cv_type, K = K_fold, Nr = Nr, group = group)):
-                print(f'{model_name}: Beginning fold {counter+1}', end = '\r')
-                # Rescaling here to avoid validation dataset leakage
-                if kwargs['scale_X'] and len(X.shape) == 2 and X.shape[1] > 0: # StandardScaler doesn't work with 3D arrays or with arrays that are 2D but empty in one dimension
-                    scaler_x = StandardScaler(with_mean=True, with_std=True)
-                    scaler_x.fit(X_train)
-                    X_train_scale = scaler_x.transform(X_train)
-                    X_val_scale = scaler_x.transform(X_val)
-                else:
-                    X_train_scale = X_train
-                    X_val_scale = X_val
-                if kwargs['scale_y'] and not kwargs['classification']:
-                    scaler_y = StandardScaler(with_mean=True, with_std=True)
-                    scaler_y.fit(y_train)
-                    y_train_scale = scaler_y.transform(y_train)
-                    y_val_scale = scaler_y.transform(y_val)
-                else:
-                    y_train_scale = y_train
-                    y_val_scale = y_val
-                temp = PAR(delayed(rm.forest_fitting)(X_train_scale, y_train_scale, X_val_scale, y_val_scale, this_prod[0], this_prod[1], this_prod[2], this_prod[3],
-                                    this_prod[4], classification = kwargs['classification'], class_weight = kwargs['class_weight']) for this_prod in hyperparam_prod)
-                if not kwargs['classification']:
-                    _, _, MSE_result[:, counter], _, _ = zip(*temp)
-                else:
-                    _, _, loss_dicts, _, _ = zip(*temp)
-                    MSE_result[:, counter] = [elem['MCC'] for elem in loss_dicts]
+        tasks = []
+        fold_indices, fold_key = _CV_fold_indices(X_unscaled, y_unscaled, cv_type, K_fold, Nr, group, kwargs)
+        for counter in range(len(fold_indices)):
+            for staged_key, (rows, staged_n_estimators) in _path_groups(hyperparam_prod, 0).items(): # All n_estimators of each combination of the other hyperparameters are scored from a single fit
+                tasks.append((counter, rows, max(staged_n_estimators) * staged_key[0] * staged_key[2], counter, # n_estimators * max_depth * n_features
+                        delayed(rm.forest_fitting)(max(staged_n_estimators), *staged_key, classification = kwargs['classification'], class_weight = kwargs['class_weight'],
+                        cv_mode = True, staged_n_estimators = staged_n_estimators)))
+        _CV_search(tasks, _scaled_folds(X_unscaled, y_unscaled, fold_indices, kwargs), (MSE_result, ), model_name, kwargs, fold_key, hyperparam_prod)
 
-        MSE_mean = np.nanmean(MSE_result, axis = 1)
+        MSE_mean = _row_nanmean(MSE_result)
         if not kwargs['classification']:
             ind = np.nanargmin(MSE_mean) # Minimize the MSE
         else:
             ind = np.nanargmax(MSE_mean) # Maximize the MCC
         """ # TODO: see above for the robust_priority changes
         if kwargs['robust_priority']:
-            MSE_std = np.nanstd(MSE_result, axis = 1)
+            MSE_std = _row_nanstd(MSE_result)
             MSE_min = MSE_mean[ind]
             MSE_bar = MSE_min + MSE_std[ind]
             ind = np.nonzero( S == np.nanmin(S[MSE_mean < MSE_bar]) )[0][0] # Hyperparams with the lowest number of variables but still within one stdev of the best MSE
@@ -544,13 +503,7 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
         return(hyperparams, RF_model, loss_train, loss_test, yhat_train, yhat_test, MSE_mean[ind])
 
     elif model_name == 'SVM':
-        if 'SVM_gamma' not in kwargs or kwargs['SVM_gamma'] is None:
-            gd = 1/X.shape[1]
-            kwargs['SVM_gamma'] = [gd/50, gd/10, gd/5, gd/2, gd, gd*2, gd*5, gd*10, gd*50]
-        if 'SVM_C' not in kwargs:
-            kwargs['SVM_C'] = [0.01, 0.1, 1, 10, 50, 100]
-        if 'SVM_epsilon' not in kwargs:
-            kwargs['SVM_epsilon'] = [0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3]
+        _SVM_grid_defaults(X, kwargs)
 
         if not kwargs['classification']:
             hyperparam_prod = list(product(kwargs['SVM_gamma'], kwargs['SVM_C'], kwargs['SVM_epsilon']))
@@ -568,44 +521,43 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
                         S[i, j, k] = i/len(kwargs['C']) - j/len(kwargs['gamma']) - k/len(kwargs['epsilon'])
         """
 
-        with Parallel(n_jobs = -1) as PAR:
-            for counter, (X_train, y_train, X_val, y_val) in enumerate(CVpartition(X_unscaled, y_unscaled, Type = cv_type, K = K_fold, Nr = Nr, group = group)):
-                print(f'{model_name}: Beginning fold {counter+1}', end = '\r')
-                # Rescaling here to avoid validation dataset leakage
-                if kwargs['scale_X'] and len(X.shape) == 2 and X.shape[1] > 0: # StandardScaler doesn't work with 3D arrays or with arrays that are 2D but empty in one dimension
-                    scaler_x = StandardScaler(with_mean=True, with_std=True)
-                    scaler_x.fit(X_train)
-                    X_train_scale = scaler_x.transform(X_train)
-                    X_val_scale = scaler_x.transform(X_val)
-                else:
-                    X_train_scale = X_train
-                    X_val_scale = X_val
-                if kwargs['scale_y'] and not kwargs['classification']:
-                    scaler_y = StandardScaler(with_mean=True, with_std=True)
-                    scaler_y.fit(y_train)
-                    y_train_scale = scaler_y.transform(y_train)
-                    y_val_scale = scaler_y.transform(y_val)
-                else:
-                    y_train_scale = y_train
-                    y_val_scale = y_val
+        if 'SVM_kernel' not in kwargs: # Whether the RBF kernel of each fold is calculated once per gamma and shared by all (C, epsilon) fits
+            kwargs['SVM_kernel'] = 'auto'
+        elif kwargs['SVM_kernel'] not in {'auto', 'precomputed', 'rbf'}:
+            raise ValueError(f'SVM_kernel must be in {{"auto", "precomputed", "rbf"}}, but you passed {kwargs["SVM_kernel"]}')
+        if 'SVM_kernel_memory' not in kwargs: # Max bytes used by the precomputed kernels of all workers at once when SVM_kernel == 'auto'
+            kwargs['SVM_kernel_memory'] = 2e9
 
+        tasks = []
+        fold_indices, fold_key = _CV_fold_indices(X_unscaled, y_unscaled, cv_type, K_fold, Nr, group, kwargs)
+        gamma_groups = {} # {gamma: indices in hyperparam_prod}
+        for prod_idx, this_prod in enumerate(hyperparam_prod):
+            gamma_groups.setdefault(this_prod[0], []).append(prod_idx)
+        use_precomputed = _SVM_precomputed(X.shape[0], len(fold_indices) * len(gamma_groups), kwargs)
+        for counter in range(len(fold_indices)):
+            if use_precomputed:
+                for gamma, rows in gamma_groups.items():
+                    C = [hyperparam_prod[prod_idx][1] for prod_idx in rows]
+                    epsilon = None if kwargs['classification'] else [hyperparam_prod[prod_idx][2] for prod_idx in rows]
+                    tasks.append((counter, rows, sum(C), counter, delayed(rm.SVM_kernel_fitting)(gamma, C, epsilon, classification = kwargs['classification'],
+                            class_weight = kwargs['class_weight'], cv_mode = True)))
+                continue
+            for prod_idx, this_prod in enumerate(hyperparam_prod):
                 if not kwargs['classification']:
-                    temp = PAR(delayed(rm.SVM_fitting)(X_train_scale, y_train_scale, X_val_scale, y_val_scale, this_prod[0], this_prod[1], this_prod[2]) for this_prod in hyperparam_prod)
-                    _, _, MSE_result[:, counter], _, _ = zip(*temp)
+                    SVM_call = delayed(rm.SVM_fitting)(*this_prod, cv_mode = True)
                 else: # SVM for classification does not use the epsilon hyperparameter
-                    temp = PAR(delayed(rm.SVM_fitting)(X_train_scale, y_train_scale, X_val_scale, y_val_scale, this_prod[0], this_prod[1], classification = kwargs['classification'],
-                                        class_weight = kwargs['class_weight']) for this_prod in hyperparam_prod)
-                    _, _, loss_dicts, _, _ = zip(*temp)
-                    MSE_result[:, counter] = [elem['MCC'] for elem in loss_dicts]
+                    SVM_call = delayed(rm.SVM_fitting)(*this_prod, classification = kwargs['classification'], class_weight = kwargs['class_weight'], cv_mode = True)
+                tasks.append((counter, [prod_idx], this_prod[1], counter, SVM_call)) # Large values of C take the longest to converge
+        _CV_search(tasks, _scaled_folds(X_unscaled, y_unscaled, fold_indices, kwargs), (MSE_result, ), model_name, kwargs, fold_key, hyperparam_prod)
 
-        MSE_mean = np.nanmean(MSE_result, axis = 1)
+        MSE_mean = _row_nanmean(MSE_result)
         if not kwargs['classification']:
             ind = np.nanargmin(MSE_mean) # Minimize the MSE
         else:
             ind = np.nanargmax(MSE_mean) # Maximize the MCC
         """ # TODO: see above for the robust_priority changes
         if kwargs['robust_priority']:
-            MSE_std = np.nanstd(MSE_result, axis = 1)
+            MSE_std = _row_nanstd(MSE_result)
             MSE_min = MSE_mean[ind]
             MSE_bar = MSE_min + MSE_std[ind]
             ind = np.nonzero( S == np.nanmin(S[MSE_mean < MSE_bar]) )[0][0] # Hyperparams with the lowest number of variables but still within one stdev of the best MSE
@@ -622,6 +574,52 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
             SVM_model, loss_train, loss_test, yhat_train, yhat_test = rm.SVM_fitting(X, y, X_test, y_test, gamma, C, classification = True, class_weight = kwargs['class_weight']) # Fitting the final model
         return(hyperparams, SVM_model, loss_train, loss_test, yhat_train, yhat_test, MSE_mean[ind])
 
+    elif model_name == 'ASVM': # Approximate SVM for large datasets
+        _SVM_grid_defaults(X, kwargs) # The same grid as SVM, which ASVM replaces for large datasets
+        if 'ASVM_rank' not in kwargs or kwargs['ASVM_rank'] is None: # Rank of the Nystroem approximation of the RBF kernel
+            kwargs['ASVM_rank'] = [100, 300, 1000]
+
+        if not kwargs['classification']:
+            hyperparam_prod = list(product(kwargs['SVM_gamma'], kwargs['ASVM_rank'], kwargs['SVM_C'], kwargs['SVM_epsilon']))
+        else: # SVM for classification does not use the epsilon hyperparameter
+            hyperparam_prod = list(product(kwargs['SVM_gamma'], kwargs['ASVM_rank'], kwargs['SVM_C']))
+        MSE_result = np.empty( (len(hyperparam_prod), K_fold*Nr) ) * np.nan
+
+        tasks = []
+        fold_indices, fold_key = _CV_fold_indices(X_unscaled, y_unscaled, cv_type, K_fold, Nr, group, kwargs)
+        map_groups = {} # {(gamma, rank): indices in hyperparam_prod}. The Nystroem map of each group is calculated once and shared by all (C, epsilon) fits
+        for prod_idx, this_prod in enumerate(hyperparam_prod):
+            if kwargs['search'] == 'grid':
+                map_groups.setdefault(this_prod[:2], []).append(prod_idx)
+            else: # Racing and Bayesian searches skip (C, epsilon) combinations, so each combination is fit separately
+                map_groups[prod_idx] = [prod_idx]
+        for counter in range(len(fold_indices)):
+            for rows in map_groups.values():
+                gamma, rank = hyperparam_prod[rows[0]][:2]
+                C = [hyperparam_prod[prod_idx][2] for prod_idx in rows]
+                epsilon = None if kwargs['classification'] else [hyperparam_prod[prod_idx][3] for prod_idx in rows]
+                tasks.append((counter, rows, rank * len(rows), counter, delayed(rm.ASVM_fitting)(gamma, rank, C, epsilon, classification = kwargs['classification'],
+                        class_weight = kwargs['class_weight'], cv_mode = True)))
+        _CV_search(tasks, _scaled_folds(X_unscaled, y_unscaled, fold_indices, kwargs), (MSE_result, ), model_name, kwargs, fold_key, hyperparam_prod)
+
+        MSE_mean = _row_nanmean(MSE_result)
+        if not kwargs['classification']:
+            ind = np.nanargmin(MSE_mean) # Minimize the MSE
+        else:
+            ind = np.nanargmax(MSE_mean) # Maximize the MCC
+
+        # Hyperparameter setup
+        if not kwargs['classification']:
+            gamma, rank, C, epsilon = hyperparam_prod[ind]
+            hyperparams = {'gamma': gamma, 'rank': rank, 'C': C, 'epsilon': epsilon}
+            ASVM_model, loss_train, loss_test, yhat_train, yhat_test = rm.ASVM_fitting(X, y, X_test, y_test, gamma, rank, C, epsilon) # Fitting the final model
+        else:
+            gamma, rank, C = hyperparam_prod[ind]
+            hyperparams = {'gamma': gamma, 'rank': rank, 'C': C}
+            ASVM_model, loss_train, loss_test, yhat_train, yhat_test = rm.ASVM_fitting(X, y, X_test, y_test, gamma, rank, C, classification = True,
+                                                                    class_weight = kwargs['class_weight']) # Fitting the final model
+        return(hyperparams, ASVM_model, loss_train, loss_test, yhat_train, yhat_test, MSE_mean[ind])
+
     elif model_name == 'AdaB':
         if 'RF_n_estimators' not in kwargs:
             kwargs['RF_n_estimators'] = [10, 25, 50, 100, 200, 300]
@@ -631,34 +629,15 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
         hyperparam_prod = list(product(kwargs['RF_n_estimators'], kwargs['learning_rate']))
         MSE_result = np.empty( (len(kwargs['RF_n_estimators']) * len(kwargs['learning_rate']), K_fold*Nr) ) * np.nan
 
-        with Parallel(n_jobs = -1) as PAR:
-            for counter, (X_train, y_train, X_val, y_val) in enumerate(CVpartition(X_unscaled, y_unscaled, Type = cv_type, K = K_fold, Nr = Nr, group = group)):
-                # Rescaling here to avoid validation dataset leakage
-                if kwargs['scale_X'] and len(X.shape) == 2 and X.shape[1] > 0: # StandardScaler doesn't work with 3D arrays or with arrays that are 2D but empty in one dimension
-                    scaler_x = StandardScaler(with_mean=True, with_std=True)
-                    scaler_x.fit(X_train)
-                    X_train_scale = scaler_x.transform(X_train)
-                    X_val_scale = scaler_x.transform(X_val)
-                else:
-                    X_train_scale = X_train
-                    X_val_scale = X_val
-                if kwargs['scale_y'] and not kwargs['classification']:
-                    scaler_y = StandardScaler(with_mean=True, with_std=True)
-                    scaler_y.fit(y_train)
-                    y_train_scale = scaler_y.transform(y_train)
-                    y_val_scale = scaler_y.transform(y_val)
-                else:
-                    y_train_scale = y_train
-                    y_val_scale = y_val
-                temp = PAR(delayed(rm.AdaBoost_fitting)(X_train_scale, y_train_scale, X_val_scale, y_val_scale, this_prod[0], this_prod[1],
-                                    classification = kwargs['classification'], class_weight = kwargs['class_weight']) for this_prod in hyperparam_prod)
-                if not kwargs['classification']:
-                    _, _, MSE_result[:, counter], _, _ = zip(*temp)
-                else:
-                    _, _, loss_dicts, _, _ = zip(*temp)
-                    MSE_result[:, counter] = [elem['MCC'] for elem in loss_dicts]
+        tasks = []
+        fold_indices, fold_key = _CV_fold_indices(X_unscaled, y_unscaled, cv_type, K_fold, Nr, group, kwargs)
+        for counter in range(len(fold_indices)):
+            for (learning_rate, ), (rows, staged_n_estimators) in _path_groups(hyperparam_prod, 0).items(): # Boosting is sequential, so all n_estimators are scored from a single fit
+                tasks.append((counter, rows, max(staged_n_estimators), counter, delayed(rm.AdaBoost_fitting)(max(staged_n_estimators), learning_rate,
+                        classification = kwargs['classification'], class_weight = kwargs['class_weight'], cv_mode = True, staged_n_estimators = staged_n_estimators)))
+        _CV_search(tasks, _scaled_folds(X_unscaled, y_unscaled, fold_indices, kwargs), (MSE_result, ), model_name, kwargs, fold_key, hyperparam_prod)
 
-        MSE_mean = np.nanmean(MSE_result, axis = 1)
+        MSE_mean = _row_nanmean(MSE_result)
         if not kwargs['classification']:
             ind = np.nanargmin(MSE_mean) # Minimize the MSE
         else:
@@ -731,7 +710,10 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
             kwargs['val_loss_file'] = f'ANN_val-loss_{time_now}.csv'
         if 'expand_hyperparameter_search' not in kwargs:
             kwargs['expand_hyperparameter_search'] = False
+        if kwargs['search'] != 'grid': # The MLP / RNN hyperparameters are evaluated sequentially by CV_model() below (and possibly expanded), which does not support the other searches
+            print(f'WARNING: search = "{kwargs["search"]}" is not available for {model_name} models, so a grid search is used instead.') # Printed, as regression_models.py ignores all warnings
 
+        @_torch_thread_limit(kwargs['inner_max_num_threads']) # The folds are trained in this process, so inner_max_num_threads limits the threads of torch during CV
         def CV_model(X_unscaled, y_unscaled, loss_function, cv_type, K_fold, Nr, group, kwargs, hyperparam_list = None):
             """
             This function runs a cross-validation procedure for each combination of MLP / RNN hyperparameters.
@@ -749,6 +731,7 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
             # Train and validate
             if hyperparam_list is None:
                 hyperparam_list = list(product(kwargs['MLP_layers'], kwargs['learning_rate'], kwargs['activation']))
+            fold_indices, fold_key = _CV_fold_indices(X_unscaled, y_unscaled, cv_type, K_fold, Nr, group, kwargs) # Shared by all hyperparameters
             for cur_idx, cur_hp in enumerate(hyperparam_list): # cur_hp is (layers, lr, activation)
                 # We added a new layer configuration to the hyperparameters
                 if not str(cur_hp[0]) in list(final_val_loss.columns):
@@ -764,24 +747,12 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
                         print(f'Beginning hyperparameters {cur_idx+1:3}/{len(hyperparam_list)}: MLP layers = {cur_hp[0]}; LR = {cur_hp[1]}; activation = {cur_hp[2]}   ', end = '\r')
                     scheduler_min_lr = kwargs['scheduler_min_lr'] * cur_hp[1]
                     temp_val_loss = 0
-                    for counter, (X_train, y_train, X_val, y_val) in enumerate(CVpartition(X_unscaled, y_unscaled, Type = cv_type, K = K_fold, Nr = Nr, group = group)):
+                    for counter, (X_train, y_train, X_val, y_val) in enumerate(_cached_folds(X_unscaled, y_unscaled, fold_indices, fold_key, kwargs)): # Already rescaled to avoid validation dataset leakage
                         if kwargs['verbosity_level'] >= 3:
                             print(f'Current fold: {counter+1}', end = '\r')
-                        # Rescaling to avoid validation dataset leakage
-                        if kwargs['scale_X'] and len(X.shape) == 2 and X.shape[1] > 0: # StandardScaler doesn't work with 3D arrays
-                            scaler_x_train = StandardScaler(with_mean=True, with_std=True)
-                            scaler_x_train.fit(X_train)
-                            X_train_scale = torch.Tensor(scaler_x_train.transform(X_train))
-                            X_val_scale = torch.Tensor(scaler_x_train.transform(X_val))
-                        else:
-                            X_train_scale = torch.Tensor(X_train)
-                            X_val_scale = torch.Tensor(X_val)
-                        if kwargs['scale_y'] and not kwargs['classification']:
-                            scaler_y_train = StandardScaler(with_mean=True, with_std=True)
-                            scaler_y_train.fit(y_train)
-                            y_train_scale = torch.Tensor(scaler_y_train.transform(y_train))
-                            y_val_scale = torch.Tensor(scaler_y_train.transform(y_val))
-                        elif kwargs['classification']:
+                        X_train_scale = torch.Tensor(X_train) # torch.Tensor copies the data, so the fold buffers can be reused
+                        X_val_scale = torch.Tensor(X_val)
+                        if kwargs['classification']:
                             y_train_scale = torch.LongTensor(y_train)
                             y_val_scale = torch.LongTensor(y_val)
                         else:
@@ -974,6 +945,542 @@ def CV_mse(model_name, X, y, X_test, y_test, X_unscaled = None, y_unscaled = Non
             test_loss['Cross Entropy loss'] = temp_test_loss
         return model, final_val_loss, train_loss, test_loss, train_pred, test_pred, best_hyperparameters
 
+def _CV_fold_indices(X, y, cv_type, K_fold, Nr, group, kwargs, scale = True, random_state = 0):
+    """
+    A helper function that returns the (train_index, val_index) of each fold and the key of the folds in kwargs['fold_cache'].
+    The indices are taken from kwargs['fold_cache'] if the same split was already made by another model, such that all models share the same folds.
+    The key includes the scaling of the folds, as _LCEN_run_stage() uses unscaled folds.
+    Shouldn't be called by the user
+    """
+    group_key = None if group is None else np.asarray(group).tobytes() # Numpy arrays are not hashable
+    split_key = (cv_type, K_fold, Nr, random_state, group_key, X.shape)
+    fold_key = split_key + (scale and kwargs['scale_X'], scale and kwargs['scale_y'] and not kwargs['classification'])
+    if kwargs['fold_cache'] is None:
+        return list(CVpartition_indices(X, y, Type = cv_type, K = K_fold, Nr = Nr, random_state = random_state, group = group)), fold_key
+    if split_key not in kwargs['fold_cache']:
+        kwargs['fold_cache'][split_key] = list(CVpartition_indices(X, y, Type = cv_type, K = K_fold, Nr = Nr, random_state = random_state, group = group))
+    return kwargs['fold_cache'][split_key], fold_key
+
+def _cached_folds(X, y, fold_indices, fold_key, kwargs):
+    """
+    A helper function that yields the (X_train, y_train, X_val, y_val) of each fold as read-only memmaps if another model already saved them ...
+        in kwargs['fold_cache'], or from _scaled_folds() otherwise.
+    Shouldn't be called by the user
+    """
+    if kwargs['fold_cache'] is not None and fold_key in kwargs['fold_cache']:
+        for counter in range(len(fold_indices)):
+            yield tuple(load(filename, mmap_mode = 'r') for filename in kwargs['fold_cache'][fold_key][counter])
+    else:
+        yield from _scaled_folds(X, y, fold_indices, kwargs)
+
+def _scaled_folds(X, y, fold_indices, kwargs, scale = True):
+    """
+    A helper function that writes the (X_train, y_train, X_val, y_val) of each fold in fold_indices into Fortran-contiguous buffers, which are reused for all folds.
+    If scale == True, each fold is also rescaled based only on its training data to avoid validation dataset leakage. The means and stdevs ...
+        are obtained by _fold_scaler() without refitting a StandardScaler to each fold, and the scaling is done while writing the buffers.
+    Returns a generator. The arrays of a fold are overwritten when the next fold is requested, so each fold must be used (or copied) before that.
+    Shouldn't be called by the user
+    """
+    scale_X = scale and kwargs['scale_X'] and len(X.shape) == 2 and X.shape[1] > 0 # StandardScaler doesn't work with 3D arrays or with arrays that are 2D but empty in one dimension
+    scale_y = scale and kwargs['scale_y'] and not kwargs['classification']
+    if scale_X:
+        X = np.asfortranarray(X, dtype = float) # The scaled values are written into the buffers, so they must have a float dtype
+        X_moments = _column_moments(X)
+    if scale_y:
+        y = np.asfortranarray(y, dtype = float)
+        y_moments = _column_moments(y)
+    buffers = {}
+    X_scaler, y_scaler = None, None # No scaling
+    for train_index, val_index in fold_indices:
+        if scale_X:
+            X_scaler = _fold_scaler(X, train_index, val_index, X_moments)
+        if scale_y:
+            y_scaler = _fold_scaler(y, train_index, val_index, y_moments)
+        X_train, X_val = _take_rows(X, train_index, buffers, 'X_train', X_scaler), _take_rows(X, val_index, buffers, 'X_val', X_scaler)
+        y_train, y_val = _take_rows(y, train_index, buffers, 'y_train', y_scaler), _take_rows(y, val_index, buffers, 'y_val', y_scaler)
+        yield (X_train, y_train, X_val, y_val)
+
+def _column_moments(A):
+    """
+    A helper function that returns the column means of A, and the column sums and sums of squares of A after centering it by these means.
+    Centering avoids the loss of precision of computing variances from raw sums of squares.
+    Shouldn't be called by the user
+    """
+    mean = A.mean(axis = 0)
+    centered_sum = np.empty_like(mean)
+    centered_sq = np.empty_like(mean)
+    for col in range(A.shape[1]):
+        temp = A[:, col] - mean[col]
+        centered_sum[col] = temp.sum()
+        centered_sq[col] = temp @ temp
+    return mean, centered_sum, centered_sq
+
+def _fold_scaler(A, train_index, val_index, moments):
+    """
+    A helper function that returns the mean and stdev of A[train_index], as calculated by StandardScaler.
+    When the training and validation data of a fold partition A, these are obtained from the moments of the whole A (returned by _column_moments()) ...
+        minus those of A[val_index], such that only the (usually much smaller) validation data are read.
+    Shouldn't be called by the user
+    """
+    n_train = len(train_index)
+    if n_train + len(val_index) == A.shape[0]: # The training data are all data not in the validation data
+        mean, centered_sum, centered_sq = moments
+        val_centered = A[val_index] - mean
+        train_centered_mean = (centered_sum - val_centered.sum(axis = 0)) / n_train
+        var = np.maximum( (centered_sq - (val_centered**2).sum(axis = 0)) / n_train - train_centered_mean**2, 0 ) # np.maximum to avoid negative values due to rounding
+        train_mean = mean + train_centered_mean
+    else: # Such as in TimeSeriesSplit, in which the data after the validation data are not used for training
+        train_mean = A[train_index].mean(axis = 0)
+        var = A[train_index].var(axis = 0)
+    # Constant features are not scaled, as in StandardScaler
+    eps = np.finfo(float).eps
+    constant = var <= n_train * eps * var + (n_train * train_mean * eps)**2
+    scale = np.sqrt(var)
+    scale[constant] = 1
+    return train_mean, scale
+
+def _take_rows(array, index, buffers, name, scaler = None):
+    """
+    A helper function that writes array[index] into buffers[name], a Fortran-contiguous buffer that is reused (and enlarged when needed) across folds.
+    Fortran order is what sklearn's linear models use internally, so they do not need to copy the folds again.
+    If scaler is a (mean, stdev) tuple, the columns are also scaled as they are written.
+    Shouldn't be called by the user
+    """
+    shape = (len(index), ) + array.shape[1:]
+    size = int(np.prod(shape))
+    if name not in buffers or buffers[name].size < size:
+        buffers[name] = np.empty(size, dtype = array.dtype)
+    out = buffers[name][:size].reshape(shape, order = 'F')
+    if array.ndim == 2: # Column by column, which is much faster than np.take(axis = 0) when array is also Fortran-ordered
+        for col in range(array.shape[1]):
+            np.take(array[:, col], index, out = out[:, col], mode = 'clip') # mode = 'clip' avoids a temporary copy; all indices are valid anyway
+            if scaler is not None: # The column is still in the cache
+                out[:, col] -= scaler[0][col]
+                out[:, col] /= scaler[1][col]
+    else:
+        np.take(array, index, axis = 0, out = out, mode = 'clip')
+    return out
+
+def _CV_dispatch(tasks, folds, results, model_name, kwargs, fold_key = None, published = False):
+    """
+    A helper function that runs all (fold, hyperparameter) tasks of a model as a single stream of joblib tasks, instead of waiting for all tasks of a fold ...
+        to finish before starting the next fold. The tasks with the largest estimated cost are started first, so they do not become stragglers at the end of the stream.
+    tasks is a list of (fold number, rows of the result arrays, estimated cost, key of the fold in folds, delayed function call)
+    The data of each fold are written to disk only once by _published_folds(), and the delayed functions receive them as read-only memmaps before their other arguments
+    results is a tuple of n_hyperparams x n_folds (x ...) arrays, which are filled in-place as the outputs arrive
+    fold_key is the key of folds in kwargs['fold_cache'] (see _CV_fold_indices()), which is used only if kwargs['fold_cache'] is not None
+    If published == True, folds is already a dict of {fold key: file names}, such as those of _LCEN_feature_cache()
+    Shouldn't be called by the user
+    """
+    order = sorted(range(len(tasks)), key = lambda task_idx: tasks[task_idx][2], reverse = True) # sorted() is stable, so tasks with the same cost keep their original order
+    thread_limit = _worker_thread_limit(kwargs)
+    with (nullcontext(folds) if published else _published_folds(folds, kwargs['fold_cache'], fold_key)) as handles, _parallel_pool(kwargs, return_as = 'generator_unordered') as PAR:
+        for finished, (task_idx, output) in enumerate(PAR(delayed(_fold_call)(task_idx, handles[tasks[task_idx][3]], thread_limit, *tasks[task_idx][4]) for task_idx in order)):
+            counter, rows = tasks[task_idx][:2]
+            for result, value in zip(results, output): # The delayed functions return (validation metric, number of variables, ...)
+                result[rows, counter] = value
+            if kwargs['verbosity_level'] >= 2 and (finished == 0 or not (finished+1)%100 or finished+1 == len(tasks)):
+                print(f'{model_name}: finished {finished+1:5} of {len(tasks)} CV tasks', end = '\r')
+
+def _CV_search(tasks, folds, results, model_name, kwargs, fold_key, hyperparam_prod):
+    """
+    A helper function that runs the (fold, hyperparameter) tasks of a model with the hyperparameter search in kwargs['search'].
+    hyperparam_prod is the list of hyperparameter combinations; the other arguments are the same as those of _CV_dispatch().
+    Shouldn't be called by the user
+    """
+    if kwargs['search'] == 'racing':
+        _CV_race(tasks, folds, results, model_name, kwargs, fold_key)
+    elif kwargs['search'] == 'bayes':
+        _CV_bayes(tasks, folds, results, model_name, kwargs, fold_key, hyperparam_prod)
+    else: # Grid search
+        _CV_dispatch(tasks, folds, results, model_name, kwargs, fold_key)
+
+@contextmanager
+def _round_kwargs(kwargs):
+    """
+    A helper function that yields kwargs with a fold_cache, such that the folds are published only once for all rounds of _CV_race() or _CV_bayes()
+    Shouldn't be called by the user
+    """
+    if kwargs['fold_cache'] is not None:
+        yield kwargs
+        return
+    round_kwargs = dict(kwargs, fold_cache = {})
+    try:
+        yield round_kwargs
+    finally:
+        clear_fold_cache(round_kwargs['fold_cache'])
+
+def _CV_race(tasks, folds, results, model_name, kwargs, fold_key = None):
+    """
+    A helper function that runs the (fold, hyperparameter) tasks of a model as a race instead of evaluating every hyperparameter on every fold.
+    All hyperparameters are evaluated on the first kwargs['racing_folds'] folds, then those whose per-fold validation scores are worse than those of the ...
+        current leader (one-sided paired t-test with significance kwargs['racing_alpha']) are eliminated. Only the survivors are evaluated on the next folds.
+    If kwargs['racing_folds'] is None, each round has a fifth of the folds (at least 2), such that non-repeated CV types (such as KFold) also have multiple rounds.
+    The arguments are the same as those of _CV_dispatch(). The scores of the eliminated hyperparameters are set to +inf in results[0] (or -inf ...
+        when maximizing the MCC for classification), so they are never selected over a hyperparameter evaluated on all folds.
+    Shouldn't be called by the user
+    """
+    sign = -1 if kwargs['classification'] else 1 # Such that lower values are always better
+    scores = results[0]
+    n_folds = max(task[0] for task in tasks) + 1
+    racing_folds = kwargs['racing_folds'] if kwargs['racing_folds'] is not None else max(2, n_folds // 5)
+    if racing_folds >= n_folds or n_folds < 3: # A single round, or a t-test only after the last round
+        print(f'WARNING: racing cannot eliminate {model_name} hyperparameters with {n_folds} folds and racing_folds = {racing_folds}, so all are evaluated on all folds.') # Printed, as regression_models.py ignores all warnings
+    alive = np.ones(scores.shape[0], dtype = bool)
+    with _round_kwargs(kwargs) as round_kwargs:
+        for start in range(0, n_folds, racing_folds):
+            end = min(start + racing_folds, n_folds)
+            round_tasks = [task for task in tasks if start <= task[0] < end and alive[task[1]].any()]
+            _CV_dispatch(round_tasks, folds, results, model_name, round_kwargs, fold_key)
+            if end < 2 or end == n_folds: # The t-test needs at least 2 folds, and no tasks are left after the last round
+                continue
+            # Paired differences to the leader on the folds evaluated so far
+            race_scores = sign * scores[:, :end]
+            alive_means = _row_nanmean(race_scores[alive])
+            if np.isnan(alive_means).all(): # Every fit failed so far, so there is no leader yet
+                continue
+            leader = np.flatnonzero(alive)[np.nanargmin(alive_means)]
+            diff = race_scores - race_scores[leader]
+            diff_mean = _row_nanmean(diff)
+            diff_std = _row_nanstd(diff, ddof = 1)
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                t_stat = diff_mean / (diff_std / np.sqrt(end))
+            worse = (diff_mean > 0) & ( (diff_std == 0) | (t_stat > t_dist.ppf(1 - kwargs['racing_alpha'], end - 1)) )
+            alive &= ~worse
+            if kwargs['verbosity_level'] >= 2:
+                print(f'{model_name}: {alive.sum()} of {len(alive)} hyperparameter combinations remain after {end} of {n_folds} folds' + ' '*10)
+    scores[~alive] = sign * np.inf
+
+def _CV_bayes(tasks, folds, results, model_name, kwargs, fold_key, hyperparam_prod):
+    """
+    A helper function that evaluates only kwargs['n_trials'] fits (see below) of the hyperparameter combinations in hyperparam_prod, instead of all of them.
+    The first kwargs['bayes_batch'] combinations are chosen at random, and the next ones are proposed in batches of the same size by _bayes_propose() ...
+        based on the mean validation scores of the combinations evaluated so far. Each combination is evaluated on all folds.
+    n_trials counts the distinct fits (the rows of the tasks) rather than the combinations, such that the budget means the same for every model. ...
+        For example, all n_estimators of a staged RF/GBDT/AdaB task are scored from one fit, so they count as a single trial.
+    The other arguments are the same as those of _CV_dispatch(). The scores of the combinations that were not evaluated are set to +inf in results[0] ...
+        (or -inf when maximizing the MCC for classification), so they are never selected.
+    Shouldn't be called by the user
+    """
+    sign = -1 if kwargs['classification'] else 1 # Such that lower values are always better
+    scores = results[0]
+    encoded = _encode_hyperparams(hyperparam_prod)
+    trial_rows = list(dict.fromkeys( tuple(np.atleast_1d(np.arange(len(hyperparam_prod))[task[1]]).tolist()) for task in tasks )) # The rows scored by each distinct fit
+    n_trials = min(kwargs['n_trials'], len(trial_rows))
+    groups = np.zeros(len(hyperparam_prod), dtype = int) # The trial of each row, such that each batch proposes distinct fits
+    for trial, rows in enumerate(trial_rows):
+        groups[list(rows)] = trial
+    evaluated = np.zeros(len(hyperparam_prod), dtype = bool)
+    batch = _bayes_propose(encoded, evaluated, np.empty(0), min(kwargs['bayes_batch'], n_trials), groups) # Random, as there are no scores yet
+    with _round_kwargs(kwargs) as round_kwargs:
+        while True:
+            in_batch = np.zeros_like(evaluated)
+            in_batch[batch] = True
+            round_tasks = [task for task in tasks if in_batch[task[1]].any()]
+            for task in round_tasks: # Tasks with multiple rows (such as staged boosting) also evaluate combinations that were not proposed
+                evaluated[task[1]] = True
+            _CV_dispatch(round_tasks, folds, results, model_name, round_kwargs, fold_key)
+            n_done = sum(evaluated[list(rows)].any() for rows in trial_rows)
+            if n_done >= n_trials or evaluated.all():
+                break
+            batch = _bayes_propose(encoded, evaluated, sign * _row_nanmean(scores[evaluated]), min(kwargs['bayes_batch'], n_trials - n_done), groups)
+            if kwargs['verbosity_level'] >= 2:
+                print(f'{model_name}: evaluated {n_done} of {n_trials} trials ({evaluated.sum()} hyperparameter combinations)' + ' '*10)
+    scores[~evaluated] = sign * np.inf
+
+@ignore_warnings()
+def _bayes_propose(encoded, evaluated, mean_scores, n_propose, groups = None):
+    """
+    A helper function that returns the indices of the n_propose unevaluated rows of encoded with the largest expected improvement ...
+        according to a Gaussian process fit to the mean_scores (lower is better) of the evaluated rows. If no mean score is finite (or no row was evaluated), ...
+            the rows are chosen at random.
+    The batch is built with the constant liar strategy: after each proposal, the GP is refit (with the same kernel parameters) as if ...
+        the proposed combination had the best score so far, such that the next proposal is made elsewhere.
+    If groups (the fit of each row) is not None, the rows of the same fit as a proposed row are not proposed again in that batch.
+    Shouldn't be called by the user
+    """
+    candidates = np.flatnonzero(~evaluated)
+    if groups is None:
+        groups = np.arange(len(encoded))
+    if not np.isfinite(mean_scores).any(): # Every evaluated fit failed, so there is nothing to model yet
+        candidates = np.random.default_rng(evaluated.sum()).permutation(candidates)
+        return candidates[np.sort(np.unique(groups[candidates], return_index = True)[1])][:n_propose] # One random row of (up to) n_propose distinct fits
+    X_GP = encoded[evaluated]
+    y_GP = mean_scores.copy()
+    y_GP[~np.isfinite(y_GP)] = np.nanmax(y_GP[np.isfinite(y_GP)]) # Failed fits are treated as the worst finite score
+    best = y_GP.min()
+    kernel = ConstantKernel() * Matern(length_scale = np.ones(encoded.shape[1]), nu = 2.5) + WhiteKernel(1e-3)
+    GP = GaussianProcessRegressor(kernel, normalize_y = True, n_restarts_optimizer = 2, random_state = 0).fit(X_GP, y_GP)
+    proposed = []
+    for _ in range(n_propose):
+        mean, std = GP.predict(encoded[candidates], return_std = True)
+        std = np.maximum(std, 1e-12)
+        z = (best - mean) / std
+        EI = (best - mean) * norm.cdf(z) + std * norm.pdf(z)
+        choice = np.argmax(EI)
+        proposed.append(candidates[choice])
+        candidates = candidates[groups[candidates] != groups[proposed[-1]]]
+        if len(candidates) == 0:
+            break
+        X_GP = np.vstack((X_GP, encoded[proposed[-1]]))
+        y_GP = np.append(y_GP, best)
+        GP = GaussianProcessRegressor(GP.kernel_, normalize_y = True, optimizer = None).fit(X_GP, y_GP)
+    return np.array(proposed)
+
+def _encode_hyperparams(hyperparam_prod):
+    """
+    A helper function that encodes each hyperparameter combination in hyperparam_prod as a vector in [0, 1]^n_hyperparams for _bayes_propose().
+    Positive numeric hyperparameters that span more than an order of magnitude (such as C and gamma) are log-scaled, and ...
+        non-numeric hyperparameters (such as None) are encoded by the position of their value.
+    Shouldn't be called by the user
+    """
+    columns = []
+    for values in zip(*hyperparam_prod):
+        unique = list(dict.fromkeys(values)) # dict.fromkeys to remove duplicates but keep the order
+        if all(isinstance(elem, (int, float, np.number)) and not isinstance(elem, bool) for elem in unique):
+            column = np.array(values, dtype = float)
+            if min(unique) > 0 and max(unique) / min(unique) > 10:
+                column = np.log10(column)
+        else:
+            column = np.array([unique.index(elem) for elem in values], dtype = float)
+        span = column.max() - column.min()
+        columns.append((column - column.min()) / span if span > 0 else np.zeros_like(column))
+    return np.column_stack(columns)
+
+@contextmanager
+def _published_folds(folds, fold_cache = None, fold_key = None):
+    """
+    A helper function that dumps the (X_train, y_train, X_val, y_val) arrays of each fold into a temporary folder, which is deleted on exit.
+    Yields a dict of {fold key: tuple of file names}, which are much cheaper to send to the joblib workers than the arrays themselves.
+    folds can be a list or a dict of {fold key: (X_train, y_train, X_val, y_val)}
+    If fold_cache is a dict and fold_key is not None, the folder is kept in fold_cache instead, and later calls with the same fold_key ...
+        yield the same files without iterating over folds. These folders are deleted by clear_fold_cache()
+    Shouldn't be called by the user
+    """
+    cached = fold_cache is not None and fold_key is not None
+    if cached and fold_key in fold_cache:
+        yield fold_cache[fold_key]
+        return
+    folder = mkdtemp(prefix = 'SPA_folds_')
+    if cached:
+        fold_cache.setdefault('folders', []).append(folder)
+    try:
+        handles = {}
+        for fold_idx, (key, fold) in enumerate(folds.items() if isinstance(folds, dict) else enumerate(folds)):
+            handles[key] = tuple(os.path.join(folder, f'fold{fold_idx}_{name}.pkl') for name in ('X_train', 'y_train', 'X_val', 'y_val'))
+            for filename, array in zip(handles[key], fold):
+                dump(np.asarray(array), filename)
+        if cached:
+            fold_cache[fold_key] = handles
+        yield handles
+    finally:
+        if not cached:
+            rmtree(folder, ignore_errors = True) # ignore_errors because Windows cannot delete files that are still memory-mapped by a worker
+
+def clear_fold_cache(fold_cache):
+    """
+    Deletes the folds saved in fold_cache by CV_mse(), including their temporary folders.
+
+    Parameters
+    ----------
+    fold_cache : dict or None
+        The dict passed to CV_mse() as fold_cache.
+    """
+    if fold_cache is None:
+        return
+    for folder in fold_cache.get('folders', []):
+        rmtree(folder, ignore_errors = True)
+    fold_cache.clear()
+
+def _fold_call(task_idx, handle, thread_limit, function, args, kwargs):
+    """
+    A helper function that loads the data of a fold as read-only memmaps (without copying them), then calls function on these data.
+    If thread_limit is not None, the BLAS / OpenMP threads of this worker are limited to thread_limit during the call (see _worker_thread_limit()).
+    Returns the output of the call with the index of its task, as _CV_dispatch() receives the outputs out of order.
+    Shouldn't be called by the user
+    """
+    fold = [load(filename, mmap_mode = 'r') for filename in handle]
+    if thread_limit is None:
+        return task_idx, function(*fold, *args, **kwargs)
+    with threadpool_limits(limits = thread_limit):
+        return task_idx, function(*fold, *args, **kwargs)
+
+@contextmanager
+def _parallel_pool(kwargs, **parallel_kwargs):
+    """
+    A helper function that yields a joblib Parallel with the n_jobs and backend in kwargs. parallel_kwargs are passed to Parallel.
+    If kwargs['inner_max_num_threads'] is not None, the BLAS / OpenMP threads of each worker are limited to avoid oversubscription:
+        loky limits them in its workers, while the threading backend shares the thread pools of this process, so they are limited here.
+        The multiprocessing backend cannot limit them, so _fold_call() does so instead.
+    Shouldn't be called by the user
+    """
+    with ExitStack() as stack:
+        if kwargs['backend'] == 'loky': # Parallel(backend = ...) would ignore the inner_max_num_threads of parallel_config
+            stack.enter_context(parallel_config(backend = 'loky', n_jobs = kwargs['n_jobs'], inner_max_num_threads = kwargs['inner_max_num_threads']))
+        else:
+            stack.enter_context(parallel_config(backend = kwargs['backend'], n_jobs = kwargs['n_jobs']))
+            if kwargs['inner_max_num_threads'] is not None and kwargs['backend'] == 'threading':
+                stack.enter_context(threadpool_limits(limits = kwargs['inner_max_num_threads']))
+        if kwargs['backend'] == 'multiprocessing': # This backend does not support returning generators, so the outputs arrive only after all tasks finish
+            parallel_kwargs['return_as'] = 'list'
+        yield stack.enter_context(Parallel(**parallel_kwargs))
+
+@contextmanager
+def _torch_thread_limit(limit):
+    """
+    A helper function that limits the intra-op threads of torch to limit (if not None) during the context, then restores the previous number.
+    Also works as a decorator. Shouldn't be called by the user
+    """
+    if limit is None:
+        yield
+        return
+    previous = torch.get_num_threads()
+    torch.set_num_threads(limit)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+def _worker_thread_limit(kwargs):
+    """
+    A helper function that returns the thread limit that _fold_call() must set in each worker, which is needed only by the multiprocessing backend.
+    Shouldn't be called by the user
+    """
+    return kwargs['inner_max_num_threads'] if kwargs['backend'] == 'multiprocessing' else None
+
+def _LCEN_run_stage(X, y, X_test, y_test, hyperparam_prod, cv_type, K_fold, Nr, group, eps, kwargs):
+    """
+    A helper function that runs one stage of LCEN (the variable selection runs or the real runs) for all entries of hyperparam_prod.
+    Returns the loss and number of selected variables of each hyperparameter combination and fold (for cross-validation) ...
+        or the information criterion of each hyperparameter combination (for cv_type in {'AIC', 'AICc', 'BIC'}).
+    Shouldn't be called by the user
+    """
+    n_columns = None
+    if kwargs['EN_solver'] == 'auto' and not kwargs['classification'] and X.shape[0] < 500: # The number of features after the expansion, lags, and selection
+        n_columns = max(_LCEN_n_columns(X, y, X_test, y_test, degree, lag, kwargs) for degree, lag in dict.fromkeys((this_prod[0], this_prod[3]) for this_prod in hyperparam_prod))
+    EN_solver = _EN_solver(X.shape[0], n_columns, kwargs)
+    path_groups = _path_groups(hyperparam_prod, 2) # Each (degree, l1_ratio, lag) is fit as a single regularization path over all alphas
+    if 'IC' in cv_type: # Information criteria use the whole training data as a single "fold"
+        folds = [(X, y, X_test, y_test)]
+        n_folds = 1
+        fold_key = None
+        MSE_result = np.empty((len(hyperparam_prod), 1)) * np.nan
+    else:
+        fold_indices, fold_key = _CV_fold_indices(X, y, cv_type, K_fold, Nr, group, kwargs, scale = False)
+        folds = _scaled_folds(X, y, fold_indices, kwargs, scale = False) # _LCEN_transform() scales the data after expanding the features
+        n_folds = len(fold_indices)
+        MSE_result = np.empty((len(hyperparam_prod), K_fold*Nr)) * np.nan
+    Var = np.empty_like(MSE_result) * np.nan # Used when robust_priority == True
+    ICs = np.empty((*MSE_result.shape, 3)) * np.nan
+    if EN_solver == 'batched': # All folds and (l1_ratio, alpha) combinations of each (degree, lag) are fit at once in this process
+        key_rows = {}
+        for prod_idx, this_prod in enumerate(hyperparam_prod):
+            key_rows.setdefault(_LCEN_cache_key(this_prod[0], this_prod[3], kwargs), []).append(prod_idx)
+        folds = [tuple(np.array(elem) for elem in fold) for fold in folds] # Copies, as _scaled_folds() reuses its buffers
+        for (lag, trans_type, interaction), degrees in _LCEN_degree_groups(hyperparam_prod, kwargs).items(): # Only the expansions of one group are kept at a time
+            expanded = [rm._LCEN_transform_degrees(*fold, degrees, lag, trans_type = trans_type, interaction = interaction, **_LCEN_transform_kwargs(kwargs)) for fold in folds]
+            for degree_idx, degree in enumerate(degrees):
+                rows = key_rows[(degree, lag, trans_type, interaction)]
+                _, l1_ratio, alpha, _ = np.array([hyperparam_prod[prod_idx] for prod_idx in rows], dtype = float).T
+                LCEN_params, _, loss_test, fold_ICs = rm._LCEN_batch_fit(*zip(*[outputs[degree_idx][:4] for outputs in expanded]), alpha, l1_ratio)
+                MSE_result[rows, :n_folds] = loss_test.T
+                Var[rows, :n_folds] = (LCEN_params != 0).sum(axis = 2).T
+                ICs[rows, :n_folds] = fold_ICs.transpose(1, 0, 2)
+        return MSE_result, Var, _select_IC(ICs, cv_type)
+    task_kwargs = {key: kwargs[key] for key in ('classification', 'class_weight', 'verbosity_level')} # The tasks need only these entries, so the rest of kwargs (such as selection) is not sent to every task
+    tasks = []
+    for counter in range(n_folds):
+        print_counter = -1 if 'IC' in cv_type else counter # _LCEN_joblib_fun does not print fold numbers for information criteria
+        if EN_solver == 'path':
+            for path_key, (rows, path_alpha) in path_groups.items():
+                cache_key = _LCEN_cache_key(path_key[0], path_key[2], kwargs)
+                tasks.append((counter, rows, path_key[0], (counter, cache_key), delayed(_LCEN_path_joblib_fun)(task_kwargs, path_key, path_alpha, print_counter)))
+        else:
+            for prod_idx, this_prod in enumerate(hyperparam_prod):
+                cache_key = _LCEN_cache_key(this_prod[0], this_prod[3], kwargs)
+                tasks.append((counter, [prod_idx], (this_prod[0], -this_prod[2]), # Higher degrees have more features, and low alphas take the longest to converge
+                        (counter, cache_key), delayed(_LCEN_joblib_fun)(eps, task_kwargs, prod_idx, this_prod, print_counter)))
+    with _LCEN_feature_cache(folds, n_folds, hyperparam_prod, kwargs, fold_key) as feature_cache:
+        _CV_dispatch(tasks, feature_cache, (MSE_result, Var, ICs), 'LCEN', kwargs, published = True)
+    return MSE_result, Var, _select_IC(ICs, cv_type)
+
+def _select_IC(ICs, cv_type):
+    """
+    A helper function that returns the information criterion selected by cv_type from the (AIC, AICc, BIC) returned by _LCEN_run_stage()
+    Shouldn't be called by the user
+    """
+    if cv_type == 'AICc':
+        return ICs[:, 0, 1]
+    elif cv_type == 'BIC':
+        return ICs[:, 0, 2]
+    else: # AIC; ignored if doing cross-validation
+        return ICs[:, 0, 0]
+
+@contextmanager
+def _LCEN_feature_cache(folds, n_folds, hyperparam_prod, kwargs, fold_key = None):
+    """
+    A helper function that expands, lags, scales, and selects the features of each fold once for each (degree, lag) in hyperparam_prod.
+    The resulting matrices are shared read-only by all the alpha and l1_ratio tasks of that fold, so the expansion is not redone for each task.
+    All degrees of a (fold, lag) are obtained from a single expansion of the highest degree by rm._LCEN_transform_degrees().
+    Each worker writes its expansions into a temporary folder (deleted on exit) and returns only their file names, so the expansions are never ...
+        held in this process, and _CV_dispatch() sends them to the tasks as read-only memmaps, like the folds of _published_folds().
+    Yields a dict of {(fold number, (degree, lag, trans_type, interaction)): file names of (X_train, y_train, X_val, y_val)}
+    Shouldn't be called by the user
+    """
+    jobs = list(product(range(n_folds), _LCEN_degree_groups(hyperparam_prod, kwargs).items()))
+    transform_kwargs = _LCEN_transform_kwargs(kwargs)
+    thread_limit = _worker_thread_limit(kwargs)
+    folder = mkdtemp(prefix = 'SPA_LCEN_')
+    try:
+        with _published_folds(folds, kwargs['fold_cache'], fold_key) as handles, _parallel_pool(kwargs) as PAR:
+            temp = PAR(delayed(_fold_call)(job_idx, handles[counter], thread_limit, *delayed(_LCEN_expand_to_disk)(os.path.join(folder, f'job{job_idx}'), degrees, lag,
+                        trans_type = trans_type, interaction = interaction, **transform_kwargs)) for job_idx, (counter, ((lag, trans_type, interaction), degrees)) in enumerate(jobs))
+        cache = {}
+        for (counter, ((lag, trans_type, interaction), degrees)), (_, degree_handles) in zip(jobs, temp):
+            for degree, handle in zip(degrees, degree_handles):
+                cache[(counter, (degree, lag, trans_type, interaction))] = handle
+        yield cache
+    finally:
+        rmtree(folder, ignore_errors = True) # ignore_errors because Windows cannot delete files that are still memory-mapped by a worker
+
+def _LCEN_expand_to_disk(X_train, y_train, X_val, y_val, prefix, degrees, lag, **transform_kwargs):
+    """
+    A helper function that runs rm._LCEN_transform_degrees() on a fold and dumps the (X_train, y_train, X_val, y_val) of each degree into files starting with prefix.
+    Returns the file names of each degree. Used by _LCEN_feature_cache(); shouldn't be called by the user
+    """
+    handles = []
+    for degree, elem in zip(degrees, rm._LCEN_transform_degrees(X_train, y_train, X_val, y_val, degrees, lag, **transform_kwargs)):
+        handles.append(tuple(f'{prefix}_degree{degree}_{name}.pkl' for name in ('X_train', 'y_train', 'X_val', 'y_val')))
+        for filename, array in zip(handles[-1], elem[:4]): # elem[4] is None, as the label names are not needed during CV
+            dump(np.asarray(array), filename)
+    return handles
+
+def _LCEN_degree_groups(hyperparam_prod, kwargs):
+    """
+    A helper function that returns the degrees of each (lag, trans_type, interaction) in hyperparam_prod, which are expanded together by rm._LCEN_transform_degrees()
+    Shouldn't be called by the user
+    """
+    degree_groups = {} # {(lag, trans_type, interaction): degrees}
+    for degree, lag, trans_type, interaction in dict.fromkeys( _LCEN_cache_key(this_prod[0], this_prod[3], kwargs) for this_prod in hyperparam_prod ): # dict.fromkeys to remove duplicates but keep the order
+        degree_groups.setdefault((lag, trans_type, interaction), []).append(degree)
+    return degree_groups
+
+def _LCEN_transform_kwargs(kwargs):
+    """
+    A helper function that returns the arguments of rm._LCEN_transform_degrees() that are the same for all folds and degrees
+    Shouldn't be called by the user
+    """
+    return {'min_lag': kwargs['min_lag'], 'selection': kwargs['selection'], 'transform_y': kwargs['LCEN_transform_y'], 'all_pos_X': kwargs['all_pos_X'],
+            'all_pos_y': kwargs['all_pos_y'], 'scale_X': kwargs['scale_X'], 'scale_y': kwargs['scale_y'], 'classification': kwargs['classification'], 'dtype': kwargs['LCEN_dtype'],
+            'return_names': False} # The label names are needed only for the final model
+
+def _LCEN_cache_key(degree, lag, kwargs):
+    """
+    A helper function that returns the key of an expanded fold in the dict returned by _LCEN_feature_cache()
+    Shouldn't be called by the user
+    """
+    return (degree, lag, kwargs['trans_type'], kwargs['LCEN_interaction'])
+
 @ignore_warnings()
 def _LCEN_joblib_fun(X_train, y_train, X_val, y_val, eps, kwargs, prod_idx, this_prod, counter = -1):
     """
@@ -984,11 +1491,108 @@ def _LCEN_joblib_fun(X_train, y_train, X_val, y_val, eps, kwargs, prod_idx, this
         print(f'Beginning run {prod_idx+1:4} of fold {counter+1:3}', end = '\r')
     elif (prod_idx == 0 or not (prod_idx+1)%100) and kwargs['verbosity_level'] >= 2: # IC -- no folds
         print(f'Beginning run {prod_idx+1:4}', end = '\r')
-    _, variable, _, mse, _, _, _, ICs = rm.LCEN_fitting(X_train, y_train, X_val, y_val, alpha, l1_ratio, degree, lag, kwargs['min_lag'], kwargs['trans_type'],
-                            kwargs['LCEN_interaction'], kwargs['selection'], kwargs['LCEN_transform_y'], kwargs['all_pos_X'], kwargs['all_pos_y'],
-                            kwargs['scale_X'], kwargs['scale_y'], kwargs['classification'], kwargs['class_weight'])
+    _, variable, _, mse, _, _, ICs = rm._LCEN_fit(X_train, y_train, X_val, y_val, alpha, l1_ratio, kwargs['classification'], kwargs['class_weight'])
+    if kwargs['classification']:
+        mse = mse['MCC'] # Hyperparameters are selected based on the MCC for classification tasks
     return mse, np.sum(variable.flatten() != 0), ICs
 
+@ignore_warnings()
+def _LCEN_path_joblib_fun(X_train, y_train, X_val, y_val, kwargs, path_key, alpha, counter = -1):
+    """
+    A helper function to parallelize LCEN when all alphas of a (degree, l1_ratio, lag) combination are fit as a single regularization path.
+    Shouldn't be called by the user
+    """
+    degree, l1_ratio, lag = path_key
+    if counter >= 0 and kwargs['verbosity_level'] >= 2: # CV
+        print(f'Beginning path with degree = {degree}, L1 ratio = {l1_ratio}, lag = {lag} of fold {counter+1:3}', end = '\r')
+    variable, _, mse, ICs = rm._LCEN_path_fit(X_train, y_train, X_val, y_val, alpha, l1_ratio)
+    return mse, np.sum(variable != 0, axis = 1), ICs
+
+def _EN_solver(N, m, kwargs):
+    """
+    A helper function that returns how the EN and LCEN models of a CV_mse() call are fit: 'batched', 'path', or 'individual'.
+    With EN_solver == 'auto', small datasets (N samples) with few features (m, after any LCEN expansion) use rm.EN_batch_fitting(), as their runtime ...
+        is dominated by the per-call overhead of sklearn and joblib. Otherwise, rm.EN_batch_fitting() would run enet_path serially in this process ...
+        (see its max_features), so the paths are parallelized by joblib instead.
+    Shouldn't be called by the user
+    """
+    if kwargs['classification']: # Regularization paths and the batched solver are available only for regression
+        return 'individual'
+    elif kwargs['EN_solver'] == 'auto':
+        return 'batched' if N < 500 and m <= 30 and m < N else 'path'
+    return kwargs['EN_solver']
+
+def _LCEN_n_columns(X, y, X_test, y_test, degree, lag, kwargs):
+    """
+    A helper function that returns the number of features of the LCEN models with this degree and lag after the expansion, lags, and selection.
+    Obtained by running rm._LCEN_transform() on the first lag+2 samples only, so it always agrees with the shapes used during CV.
+    Shouldn't be called by the user
+    """
+    n_samples = lag + 2
+    X_small = rm._LCEN_transform(X[:n_samples], y[:n_samples], X_test[:n_samples], y_test[:n_samples], degree, lag, kwargs['min_lag'], kwargs['trans_type'],
+                                 kwargs['LCEN_interaction'], kwargs['selection'], kwargs['LCEN_transform_y'], kwargs['all_pos_X'], kwargs['all_pos_y'],
+                                 scale_X = False, scale_y = False, classification = kwargs['classification'], return_names = False)[0]
+    return X_small.shape[1]
+
+def _SVM_grid_defaults(X, kwargs):
+    """
+    A helper function that sets the default gamma, C, and epsilon grids of the SVM and ASVM models in kwargs (in place)
+    Shouldn't be called by the user
+    """
+    if 'SVM_gamma' not in kwargs or kwargs['SVM_gamma'] is None:
+        gd = 1/X.shape[1]
+        kwargs['SVM_gamma'] = [gd/50, gd/10, gd/5, gd/2, gd, gd*2, gd*5, gd*10, gd*50]
+    if 'SVM_C' not in kwargs:
+        kwargs['SVM_C'] = [0.01, 0.1, 1, 10, 50, 100]
+    if 'SVM_epsilon' not in kwargs:
+        kwargs['SVM_epsilon'] = [0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3]
+
+def _SVM_precomputed(N, n_tasks, kwargs):
+    """
+    A helper function that returns whether the SVM models of a CV_mse() call share precomputed RBF kernels (see rm.SVM_kernel_fitting()).
+    With SVM_kernel == 'auto', the kernels are used only if N <= 10000 and those of all workers running at once (up to N^2 floats each) fit in kwargs['SVM_kernel_memory'].
+    Racing and Bayesian searches skip (C, epsilon) combinations, so they do not share kernels.
+    Shouldn't be called by the user
+    """
+    if kwargs['SVM_kernel'] != 'auto':
+        return kwargs['SVM_kernel'] == 'precomputed'
+    n_workers = min(effective_n_jobs(kwargs['n_jobs']), n_tasks)
+    return kwargs['search'] == 'grid' and N <= 10000 and 8 * N**2 * n_workers <= kwargs['SVM_kernel_memory']
+
+def _row_nanmean(array):
+    """
+    A helper function that returns np.nanmean(array, axis = 1) without the RuntimeWarnings of the rows whose entries are all NaN (such as hyperparameters ...
+        whose fits failed on every fold), which are NaN in the output. Shouldn't be called by the user
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(array, axis = 1)
+
+def _row_nanstd(array, ddof = 0):
+    """
+    A helper function that returns np.nanstd(array, axis = 1, ddof = ddof) without the RuntimeWarnings of the rows with too few non-NaN entries, ...
+        which are NaN in the output. Shouldn't be called by the user
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanstd(array, axis = 1, ddof = ddof)
+
+def _path_groups(hyperparam_prod, alpha_position):
+    """
+    A helper function that groups the hyperparameter combinations that differ only in their alpha values, such that each group can be ...
+        fit as a single regularization path. Returns a dict of {other hyperparameters: (indices in hyperparam_prod, alphas)}
+    Also used to group the combinations that differ only in their n_estimators for staged boosting (alpha_position is then the position of n_estimators)
+    Shouldn't be called by the user
+    """
+    path_groups = {}
+    for prod_idx, this_prod in enumerate(hyperparam_prod):
+        key = this_prod[:alpha_position] + this_prod[alpha_position+1:]
+        if key not in path_groups:
+            path_groups[key] = ([], [])
+        path_groups[key][0].append(prod_idx)
+        path_groups[key][1].append(this_prod[alpha_position])
+    return path_groups
+
 class MyDataset(Dataset):
     def __init__(self, Xdata, ydata):
         self.Xdata = Xdata
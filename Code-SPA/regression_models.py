@@ -1,6 +1,6 @@
 import statsmodels.api as sm
-from SPLS_Python import SPLS
-from sklearn.linear_model import LinearRegression, ElasticNet, LogisticRegression
+from SPLS_Python import SPLS, SPLS_path, PLS_coef
+from sklearn.linear_model import LinearRegression, ElasticNet, LogisticRegression, enet_path
 from sklearn.cross_decomposition import PLSRegression
 from sklearn.preprocessing import StandardScaler, PolynomialFeatures
 from sklearn.metrics import mean_squared_error as MSE
@@ -9,9 +9,13 @@ from sklearn.metrics import confusion_matrix
 from torch import Tensor, LongTensor
 from torch.nn import CrossEntropyLoss
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, AdaBoostRegressor, RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier
-from sklearn.svm import SVR, SVC
+from sklearn.svm import SVR, SVC, LinearSVR
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import Pipeline
+from sklearn.metrics.pairwise import rbf_kernel
 import numpy as np
 import warnings
+from functools import lru_cache
 warnings.filterwarnings("ignore") # TODO: Want to just ignore the PLS constant residual warnings, but this will do for now
 
 def OLS_fitting(X, y, X_test, y_test, classification = False, class_weight = None, random_state = 0):
@@ -52,7 +56,7 @@ def OLS_fitting(X, y, X_test, y_test, classification = False, class_weight = Non
     OLS_params = OLS_model.coef_
     return(OLS_model, OLS_params, loss_train, loss_test, yhat_train, yhat_test)
 
-def SPLS_fitting(X, y, X_test, y_test, K = None, eta = None, eps = 1e-4, maxstep = 1000):
+def SPLS_fitting(X, y, X_test, y_test, K = None, eta = None, eps = 1e-4, maxstep = 1000, cv_mode = False):
     """
     Fits data using a Sparse PLS model (see doi.org/10.1111%2Fj.1467-9868.2009.00723.x)
 
@@ -66,16 +70,23 @@ def SPLS_fitting(X, y, X_test, y_test, K = None, eta = None, eps = 1e-4, maxstep
         Number of latent variables
     eta: float, optional, default = None
         Sparsity tuning parameter ranging from 0 to 1. 0 is equivalent to PLS.
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSE, number of nonzero coefficients).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
     """
     if eta:
-        _, selected_variables, _, _ = SPLS(X, y, K, eta, eps = eps, max_steps = maxstep)
+        _, selected_variables, _, _, _ = SPLS(X, y, K, eta, eps = eps, max_steps = maxstep)
     else: # eta = 0 is equivalent to regular PLS, which selects all variables
         selected_variables = np.ones(X.shape[1], dtype = bool)
     if len(selected_variables) >= K:
         SPLS_model = PLSRegression(K, scale = False, tol = eps).fit(X[:, selected_variables], y)
+    elif cv_mode:
+        return np.inf, 0
     else:
         return None, None, np.inf, np.inf, None, None
     SPLS_params = SPLS_model.coef_.squeeze()
+    if cv_mode:
+        return MSE(y_test, np.dot(X_test[:, selected_variables], SPLS_params)), np.sum(SPLS_params != 0)
     # Predictions and MSEs
     yhat_train = np.dot(X[:, selected_variables], SPLS_params)
     yhat_test = np.dot(X_test[:, selected_variables], SPLS_params)
@@ -84,7 +95,87 @@ def SPLS_fitting(X, y, X_test, y_test, K = None, eta = None, eps = 1e-4, maxstep
 
     return SPLS_model, SPLS_params, mse_train, mse_test, yhat_train, yhat_test
 
-def EN_fitting(X, y, X_test, y_test, alpha, l1_ratio, max_iter = 10000, tol = 1e-4, random_state = 0, classification = False, class_weight = None):
+def SPLS_path_fitting(X, y, X_test, y_test, K, eta, eps = 1e-4, maxstep = 1000, cv_mode = False):
+    """
+    Fits data using a Sparse PLS model for multiple (K, eta) combinations at once.
+    The SPLS variable selection is sequential in the number of latent variables, so SPLS_path() is run only once with max(K) for all etas. ...
+        Each K is then fit on the variables selected after K iterations as in SPLS_fitting(), but combinations that selected the same variables ...
+        share a single PLS fit, as PLS components are nested. Used by SPA during cross-validation.
+
+    Parameters
+    ----------
+    X, y : Numpy array with shape N x m, N x 1
+        Training data predictors and response.
+    X_test, y_test : Numpy array with shape N_test x m, N_test x 1
+        Testing data predictors and response.
+    K : array of ints
+        Numbers of latent variables. May be in any order; the outputs follow the same order.
+    eta : float or array of floats with the same length as K
+        Sparsity tuning parameters ranging from 0 to 1. 0 is equivalent to PLS (see PLS_path_fitting()).
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSEs, number of nonzero coefficients for each (K, eta)).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
+    """
+    K = np.atleast_1d(np.asarray(K, dtype = int))
+    unique_eta, eta_idx = np.unique(np.broadcast_to(eta, K.shape), return_inverse = True)
+    _, all_selected_list = SPLS_path(X, y, K.max(), unique_eta, eps = eps, max_steps = maxstep)
+    valid = np.zeros(len(K), dtype = bool) # False if not enough variables were selected for K latent variables
+    selection_groups = {} # {selected variables: (selected variables, indices in K)}
+    for idx, (this_K, this_eta_idx) in enumerate(zip(K, eta_idx)):
+        selected_variables = all_selected_list[this_eta_idx][this_K-1]
+        if len(selected_variables) >= this_K:
+            valid[idx] = True
+            selection_groups.setdefault(selected_variables.tobytes(), (selected_variables, []))[1].append(idx)
+    SPLS_params = np.zeros((len(K), X.shape[1]))
+    for selected_variables, rows in selection_groups.values():
+        PLS_model = PLSRegression(K[rows].max(), scale = False, tol = eps).fit(X[:, selected_variables], y)
+        for idx in rows:
+            SPLS_params[idx, selected_variables] = PLS_coef(PLS_model, K[idx]).squeeze()
+    # Predictions and MSEs for all (K, eta) with a single matrix product each
+    loss_test = np.mean((y_test.reshape(-1, 1) - X_test @ SPLS_params.T)**2, axis = 0)
+    loss_test[~valid] = np.inf
+    if cv_mode:
+        return (loss_test, np.sum(SPLS_params != 0, axis = 1))
+    loss_train = np.mean((y.reshape(-1, 1) - X @ SPLS_params.T)**2, axis = 0)
+    loss_train[~valid] = np.inf
+    return (SPLS_params, loss_train, loss_test)
+
+def PLS_path_fitting(X, y, X_test, y_test, K, eps = 1e-4, cv_mode = False):
+    """
+    Fits data using a PLS model (SPLS with eta = 0) for multiple numbers of latent variables at once.
+    PLS components are nested, so a single model is fit with max(K) components, and the coefficients of each smaller K are ...
+        obtained from its first K weights and loadings, which is much cheaper than fitting each K with SPLS_fitting(). Used by SPA during cross-validation.
+
+    Parameters
+    ----------
+    X, y : Numpy array with shape N x m, N x 1
+        Training data predictors and response.
+    X_test, y_test : Numpy array with shape N_test x m, N_test x 1
+        Testing data predictors and response.
+    K : array of ints
+        Numbers of latent variables. May be in any order; the outputs follow the same order.
+        Values larger than the number of predictors return an infinite MSE, as in SPLS_fitting().
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSEs, number of nonzero coefficients for each K).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
+    """
+    K = np.atleast_1d(np.asarray(K, dtype = int))
+    valid = K <= X.shape[1]
+    PLS_params = np.zeros((len(K), X.shape[1]))
+    if valid.any():
+        PLS_model = PLSRegression(K[valid].max(), scale = False, tol = eps).fit(X, y)
+        for idx in np.flatnonzero(valid):
+            PLS_params[idx] = PLS_coef(PLS_model, K[idx]).squeeze()
+    # Predictions and MSEs for all K with a single matrix product each
+    loss_test = np.mean((y_test.reshape(-1, 1) - X_test @ PLS_params.T)**2, axis = 0)
+    loss_test[~valid] = np.inf
+    if cv_mode:
+        return (loss_test, np.sum(PLS_params != 0, axis = 1))
+    loss_train = np.mean((y.reshape(-1, 1) - X @ PLS_params.T)**2, axis = 0)
+    loss_train[~valid] = np.inf
+    return (PLS_params, loss_train, loss_test)
+
+def EN_fitting(X, y, X_test, y_test, alpha, l1_ratio, max_iter = 10000, tol = 1e-4, random_state = 0, classification = False, class_weight = None, cv_mode = False):
     """
     Fits data using sklearn's Elastic Net model
 
@@ -107,10 +198,20 @@ def EN_fitting(X, y, X_test, y_test, alpha, l1_ratio, max_iter = 10000, tol = 1e
     class_weight : array, optional, default = None
         The class weights for each class.
         SPA automatically sets this to an array of ones (equal weights) if the user did not input anything to SPA.main_SPA()
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSE or MCC, number of nonzero coefficients).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
     """
     if not classification:
         EN_model = ElasticNet(alpha = alpha, l1_ratio = l1_ratio, random_state = random_state, fit_intercept = False, max_iter = max_iter, tol = tol)
+        if l1_ratio == 0 and alpha > 0: # Coordinate descent converges poorly without an L1 penalty, so it starts from the exact ridge solution (same as _ridge_path() in CV)
+            # alpha == 0 starts from zeros, as the exact solution interpolates the training data when m >= N
+            EN_model.set_params(warm_start = True)
+            EN_model.coef_ = _ridge_path(X, y, np.array([alpha]))[0]
         EN_model.fit(X, y)
+        EN_model.set_params(warm_start = False)
+        if cv_mode:
+            return _cv_score(EN_model, X_test, y_test, classification), np.sum(EN_model.coef_ != 0)
         yhat_train = EN_model.predict(X)
         yhat_test = EN_model.predict(X_test)
         loss_train = MSE(y, yhat_train)
@@ -119,6 +220,8 @@ def EN_fitting(X, y, X_test, y_test, alpha, l1_ratio, max_iter = 10000, tol = 1e
         if class_weight is None:
             class_weight = np.ones(len( set(y.squeeze()) ))
         EN_model = LogisticRegression(penalty = 'elasticnet', C = 1/alpha, l1_ratio = l1_ratio, solver = 'saga', multi_class = 'multinomial', random_state = random_state).fit(X, y)
+        if cv_mode:
+            return _cv_score(EN_model, X_test, y_test, classification, class_weight), np.sum(EN_model.coef_ != 0)
         yhat_train = EN_model.predict_proba(X)
         yhat_test = EN_model.predict_proba(X_test)
         pred_class_train = yhat_train.argmax(axis=1)
@@ -128,8 +231,51 @@ def EN_fitting(X, y, X_test, y_test, alpha, l1_ratio, max_iter = 10000, tol = 1e
     EN_params = EN_model.coef_
     return (EN_model, EN_params, loss_train, loss_test, yhat_train, yhat_test)
 
+def EN_path_fitting(X, y, X_test, y_test, alpha, l1_ratio, max_iter = 10000, tol = 1e-4, cv_mode = False):
+    """
+    Fits data using sklearn's Elastic Net model for multiple alpha values at once.
+    The alphas are solved as one warm-started regularization path (from the largest to the smallest alpha), which is much ...
+        cheaper than fitting each alpha from scratch with EN_fitting(). Used by SPA during cross-validation (regression only).
+    When l1_ratio == 0 (ridge), all alphas > 0 are instead solved exactly from a single thin SVD of X, as in EN_fitting(). alpha == 0 is fit by coordinate descent.
+
+    Parameters
+    ----------
+    X, y : Numpy array with shape N x m, N x 1
+        Training data predictors and response.
+    X_test, y_test : Numpy array with shape N_test x m, N_test x 1
+        Testing data predictors and response.
+    alpha : array of floats
+        The weights of the L1 and L2 regularizations: alpha*l1_ratio*||w||_1 + 0.5*alpha*(1 - l1_ratio)*||w||^2_2
+        May be in any order; the outputs follow the same order.
+    l1_ratio : float
+        Ratio of L1 penalty to total penalty. When l1_ratio == 1, only the L1 penalty is used.
+    max_iter : int, optional, default = 10000
+        The maximum number of iterations for each alpha
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSEs, number of nonzero coefficients for each alpha).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
+    """
+    alpha = np.atleast_1d(np.asarray(alpha, dtype = float))
+    if l1_ratio == 0:
+        EN_params = np.empty((len(alpha), X.shape[1]))
+        EN_params[alpha > 0] = _ridge_path(X, y, alpha[alpha > 0])
+        if (alpha == 0).any(): # Same model as EN_fitting()
+            _, coefs, _ = enet_path(X, y.ravel(), l1_ratio = l1_ratio, alphas = [0.], max_iter = max_iter, tol = tol)
+            EN_params[alpha == 0] = coefs.T
+    else:
+        order = np.argsort(alpha)[::-1] # enet_path goes from the largest to the smallest alpha
+        _, coefs, _ = enet_path(X, y.ravel(), l1_ratio = l1_ratio, alphas = alpha[order], max_iter = max_iter, tol = tol)
+        EN_params = np.empty((len(alpha), X.shape[1]))
+        EN_params[order] = coefs.T
+    # Predictions and MSEs for all alphas with a single matrix product each
+    loss_test = np.mean((y_test.reshape(-1, 1) - X_test @ EN_params.T)**2, axis = 0)
+    if cv_mode:
+        return (loss_test, np.sum(EN_params != 0, axis = 1))
+    loss_train = np.mean((y.reshape(-1, 1) - X @ EN_params.T)**2, axis = 0)
+    return (EN_params, loss_train, loss_test)
+
 def LCEN_fitting(X, y, X_test, y_test, alpha, l1_ratio, degree = 1, lag = 0, min_lag = 0, trans_type = 'all', interaction = True, selection = None, transform_y = False,
-                 all_pos_X = None, all_pos_y = True, scale_X = True, scale_y = True, classification = False, class_weight = None):
+                 all_pos_X = None, all_pos_y = True, scale_X = True, scale_y = True, classification = False, class_weight = None, dtype = np.float64):
     """
     Fits data using the LASSO-Clip-EN (LCEN) algorithm (doi.org/10.48550/arXiv.2402.17120).
     LCEN is a powerful, non-linear, and interpretable feature selection algorithm with considerable feature selection capabilities, model accuracy, and speed.
@@ -181,18 +327,219 @@ def LCEN_fitting(X, y, X_test, y_test, alpha, l1_ratio, degree = 1, lag = 0, min
     class_weight : array, optional, default = None
         The class weights for each class.
         SPA automatically sets this to an array of ones (equal weights) if the user did not input anything to SPA.main_SPA()
+    dtype : NumPy float dtype, optional, default = np.float64
+        The dtype of the expanded features. np.float32 halves their memory use.
+    """
+    X, y, X_test, y_test, label_names = _LCEN_transform(X, y, X_test, y_test, degree, lag, min_lag, trans_type, interaction, selection, transform_y,
+                                                        all_pos_X, all_pos_y, scale_X, scale_y, classification, dtype = dtype)
+    LCEN_model, LCEN_params, loss_train, loss_test, yhat_train, yhat_test, ICs = _LCEN_fit(X, y, X_test, y_test, alpha, l1_ratio, classification, class_weight)
+    return (LCEN_model, LCEN_params, loss_train, loss_test, yhat_train, yhat_test, label_names, ICs)
+
+def _LCEN_fit(X, y, X_test, y_test, alpha, l1_ratio, classification = False, class_weight = None):
+    """
+    A helper function that is automatically called by SPA.
+    Fits the EN step of LCEN to data that were already expanded, lagged, scaled, and selected by _LCEN_transform().
+    """
+    if X.shape[1] == 0:
+        LCEN_model = None
+        LCEN_params = np.empty(0)
+        loss_train = np.var(y) # TODO: for classification, this is not var(y) but guessing only the majority class and calculating the metrics from there
+        loss_test = np.var(y_test)
+        yhat_train = np.zeros(y.shape) # Ok to be 0 because y is scaled --> mean(y) is approximately 0
+        yhat_test = np.zeros(y_test.shape)
+    else:
+        LCEN_model, LCEN_params, loss_train, loss_test, yhat_train, yhat_test = EN_fitting(X, y, X_test, y_test, alpha, l1_ratio, classification = classification, class_weight = class_weight)
+    if not classification:
+        ICs = _information_criteria(X.shape[0], (LCEN_params!=0).flatten().sum(), loss_train)
+    else:
+        ICs = (0, 0, 0)
+    return (LCEN_model, LCEN_params, loss_train, loss_test, yhat_train, yhat_test, ICs)
+
+def _ridge_path(X, y, alpha):
+    """
+    Returns the coefficients (n_alphas x m) of the Elastic Net models with l1_ratio == 0 and no intercept for all alphas. Used by EN_path_fitting()
+    All alphas should be > 0, as alpha == 0 returns the minimum-norm least squares solution, which interpolates the training data when m >= N.
+    """
+    # The objective is 1/(2N) ||y - Xw||^2 + 0.5*alpha*||w||^2, so w = V diag(s / (s^2 + N*alpha)) U.T y, where X = U diag(s) V.T
+    U, s, Vt = np.linalg.svd(X, full_matrices = False)
+    nonzero = s > 1e-15 # Same cutoff as Ridge(solver = 'svd')
+    shrinkage = np.zeros((len(alpha), len(s)))
+    shrinkage[:, nonzero] = s[nonzero] / (s[nonzero]**2 + X.shape[0]*alpha.reshape(-1, 1))
+    return (shrinkage * (U.T @ y.ravel())) @ Vt
+
+def EN_batch_fitting(X, y, X_test, y_test, alpha, l1_ratio, max_iter = 10000, tol = 1e-4, max_features = 30, cv_mode = False):
+    """
+    Fits data using Elastic Net models for many (fold, alpha, l1_ratio) problems at once, which avoids the per-call overhead of sklearn on small datasets.
+    All problems with an L1 penalty are solved together by a batched primal-dual active set (semismooth Newton) method on the Gram matrix of each fold, ...
+        whose solutions satisfy the optimality (KKT) conditions up to rounding. Problems with only an L2 penalty are solved by _ridge_path(). Problems with ...
+        alpha == 0 (as in EN_path_fitting()) and those in which the active set method does not converge are fit with enet_path. Used by SPA during cross-validation (regression only).
+
+    Parameters
+    ----------
+    X, y : list of Numpy arrays with shape N x m, N x 1
+        Training data predictors and response of each fold. All folds must have the same m, but may have different N.
+    X_test, y_test : list of Numpy arrays with shape N_test x m, N_test x 1
+        Testing data predictors and response of each fold.
+    alpha : array of floats
+        The weights of the L1 and L2 regularizations: alpha*l1_ratio*||w||_1 + 0.5*alpha*(1 - l1_ratio)*||w||^2_2
+    l1_ratio : float or array of floats with the same length as alpha
+        Ratio of L1 penalty to total penalty. When l1_ratio == 1, only the L1 penalty is used.
+    max_iter : int, optional, default = 10000
+        The maximum number of iterations of enet_path, which is used when the active set method does not converge
+    max_features : int, optional, default = 30
+        If m > max_features, the problems with an L1 penalty are fit by enet_path instead of the active set method, ...
+            as the batched m x m systems become more expensive than coordinate descent. The same happens if m >= N, as the active set method may cycle then.
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSEs, number of nonzero coefficients), each with shape n_folds x n_alphas.
+        Otherwise, returns (coefficients with shape n_folds x n_alphas x m, train MSEs, test MSEs).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
+    """
+    alpha = np.atleast_1d(np.asarray(alpha, dtype = float))
+    l1_ratio = np.broadcast_to(np.asarray(l1_ratio, dtype = float), alpha.shape)
+    lambda1, lambda2 = alpha*l1_ratio, alpha*(1 - l1_ratio)
+    EN_params = np.zeros((len(X), len(alpha), X[0].shape[1]))
+    ridge = (lambda1 == 0) & (lambda2 > 0)
+    if ridge.any():
+        for fold_idx in range(len(X)):
+            EN_params[fold_idx, ridge] = _ridge_path(X[fold_idx], y[fold_idx], lambda2[ridge])
+    lasso = np.flatnonzero(~ridge) # Includes alpha == 0
+    if len(lasso) and X[0].shape[1] > 0:
+        converged = np.zeros((len(X), len(lasso)), dtype = bool) # The problems that are not solved by the active set method are refit by enet_path
+        active_set = np.flatnonzero(lambda1[lasso] > 0) # alpha == 0 is always fit by enet_path, as the exact least squares solution differs from that of coordinate descent
+        if len(active_set) and X[0].shape[1] <= max_features and X[0].shape[1] < min(this_X.shape[0] for this_X in X):
+            gram = np.stack([this_X.T @ this_X / this_X.shape[0] for this_X in X]).astype(float) # float64 even for float32 features, as the KKT conditions are checked to 1e-8
+            corr = np.stack([this_X.T @ this_y.ravel() / this_X.shape[0] for this_X, this_y in zip(X, y)]).astype(float)
+            chunk_size = max(1, 2**21 // (len(X) * X[0].shape[1]**2)) # Limits the size of the batched n_folds x chunk_size x m x m systems to 16 MB
+            for start in range(0, len(active_set), chunk_size):
+                position = active_set[start:start+chunk_size]
+                EN_params[:, lasso[position]], converged[:, position] = _EN_active_set(gram, corr, lambda1[lasso[position]], lambda2[lasso[position]])
+        for fold_idx in np.flatnonzero(~converged.all(axis = 1)):
+            refit = lasso[~converged[fold_idx]]
+            for this_l1_ratio in np.unique(l1_ratio[refit]):
+                idx = refit[l1_ratio[refit] == this_l1_ratio]
+                idx = idx[np.argsort(alpha[idx])[::-1]] # enet_path goes from the largest to the smallest alpha
+                _, coefs, _ = enet_path(X[fold_idx], y[fold_idx].ravel(), l1_ratio = this_l1_ratio, alphas = alpha[idx], max_iter = max_iter, tol = tol)
+                EN_params[fold_idx, idx] = coefs.T
+    # Predictions and MSEs for all problems of each fold with a single matrix product each
+    loss_test = np.array([np.mean((this_y.reshape(-1, 1) - this_X @ params.T)**2, axis = 0) for this_X, this_y, params in zip(X_test, y_test, EN_params)])
+    if cv_mode:
+        return (loss_test, np.sum(EN_params != 0, axis = 2))
+    loss_train = np.array([np.mean((this_y.reshape(-1, 1) - this_X @ params.T)**2, axis = 0) for this_X, this_y, params in zip(X, y, EN_params)])
+    return (EN_params, loss_train, loss_test)
+
+def _EN_active_set(gram, corr, lambda1, lambda2, max_iter = 50):
+    """
+    Solves min 0.5*w.T @ gram @ w - corr.T @ w + 0.5*lambda2*||w||^2 + lambda1*||w||_1 (the Elastic Net objective without its constant term) ...
+        for each fold (first axis of gram and corr) and (lambda1, lambda2) pair at once with a primal-dual active set method.
+    Returns the coefficients (n_folds x n_pairs x m) and whether each problem converged (n_folds x n_pairs). Used by EN_batch_fitting()
+    """
+    m = corr.shape[1]
+    hessian = gram[:, None] + lambda2[:, None, None] * np.eye(m)
+    corr = np.broadcast_to(corr[:, None], hessian.shape[:3])
+    lambda1 = lambda1[:, None]
+    diagonal = np.diagonal(hessian, axis1 = 2, axis2 = 3)
+    EN_params = np.zeros(corr.shape)
+    dual = corr.copy() # corr - hessian @ EN_params. Equals lambda1*sign(EN_params) on the active set and is within [-lambda1, lambda1] elsewhere at the optimum
+    sign = np.zeros(corr.shape)
+    for it in range(max_iter):
+        # The active set and signs predicted by the current primal and dual variables
+        new_sign = np.sign(dual + diagonal*EN_params) * (np.abs(dual + diagonal*EN_params) > lambda1)
+        new_sign[new_sign == -sign] = 0 # Coefficients that would flip their sign are first set to 0, which prevents the method from cycling between both signs
+        if it >= 10: # Longer cycles are broken by changing only the coefficient with the largest KKT violation of each problem
+            violation = np.where(new_sign != sign, np.abs(np.abs(dual + diagonal*EN_params) - lambda1), -1)
+            new_sign = np.where(violation == violation.max(axis = 2, keepdims = True), new_sign, sign)
+        if np.array_equal(new_sign, sign): # The active sets did not change, so the KKT conditions hold
+            break
+        sign = new_sign
+        active = sign != 0
+        # Solving the reduced system of each problem, with the inactive coefficients fixed at 0
+        system = np.where(active[..., :, None] & active[..., None, :], hessian, np.eye(m))
+        rhs = np.where(active, corr - lambda1*sign, 0)
+        try:
+            EN_params = np.linalg.solve(system, rhs[..., None])[..., 0]
+        except np.linalg.LinAlgError: # At least one reduced system is singular
+            EN_params = (np.linalg.pinv(system) @ rhs[..., None])[..., 0]
+        dual = corr - (hessian @ EN_params[..., None])[..., 0]
+    # Optimality (KKT) conditions
+    scale = np.abs(corr).max(axis = 2, keepdims = True) + lambda1
+    converged = np.where(sign != 0, (np.abs(dual - lambda1*sign) <= 1e-8*scale) & (sign*EN_params > 0), np.abs(dual) <= lambda1 + 1e-8*scale).all(axis = 2)
+    return EN_params, converged
+
+def LCEN_path_fitting(X, y, X_test, y_test, alpha, l1_ratio, degree = 1, lag = 0, min_lag = 0, trans_type = 'all', interaction = True, selection = None, transform_y = False,
+                 all_pos_X = None, all_pos_y = True, scale_X = True, scale_y = True):
+    """
+    Fits data using the LCEN algorithm for multiple alpha values at once. The features are expanded only once, and the ...
+        alphas are solved as one warm-started regularization path with EN_path_fitting().
+    Used by SPA during cross-validation (regression only). See LCEN_fitting() for the meaning of each parameter.
+    Returns the coefficients (n_alphas x m), the train and test MSEs (n_alphas), and the (AIC, AICc, BIC) values (n_alphas x 3).
+    """
+    X, y, X_test, y_test, _ = _LCEN_transform(X, y, X_test, y_test, degree, lag, min_lag, trans_type, interaction, selection, transform_y,
+                                                all_pos_X, all_pos_y, scale_X, scale_y)
+    return _LCEN_path_fit(X, y, X_test, y_test, alpha, l1_ratio)
+
+def _LCEN_path_fit(X, y, X_test, y_test, alpha, l1_ratio):
+    """
+    A helper function that is automatically called by SPA.
+    Fits the EN step of LCEN as a regularization path to data that were already expanded, lagged, scaled, and selected by _LCEN_transform().
+    """
+    alpha = np.atleast_1d(alpha)
+    if X.shape[1] == 0:
+        LCEN_params = np.empty((len(alpha), 0))
+        loss_train = np.tile(np.var(y), len(alpha))
+        loss_test = np.tile(np.var(y_test), len(alpha))
+    else:
+        LCEN_params, loss_train, loss_test = EN_path_fitting(X, y, X_test, y_test, alpha, l1_ratio)
+    ICs = np.column_stack(_information_criteria(X.shape[0], (LCEN_params!=0).sum(axis = 1), loss_train))
+    return (LCEN_params, loss_train, loss_test, ICs)
+
+def _LCEN_batch_fit(X, y, X_test, y_test, alpha, l1_ratio):
+    """
+    A helper function that is automatically called by SPA.
+    Same as _LCEN_path_fit(), but fits all folds (lists of X, y, X_test, y_test) and (alpha, l1_ratio) pairs at once with EN_batch_fitting().
+    Each output has an additional first dimension for the folds.
+    """
+    alpha = np.atleast_1d(alpha)
+    if X[0].shape[1] == 0:
+        LCEN_params = np.empty((len(X), len(alpha), 0))
+        loss_train = np.array([np.tile(np.var(this_y), len(alpha)) for this_y in y])
+        loss_test = np.array([np.tile(np.var(this_y), len(alpha)) for this_y in y_test])
+    else:
+        LCEN_params, loss_train, loss_test = EN_batch_fitting(X, y, X_test, y_test, alpha, l1_ratio)
+    ICs = np.array([np.column_stack(_information_criteria(this_X.shape[0], (params!=0).sum(axis = 1), loss)) for this_X, params, loss in zip(X, LCEN_params, loss_train)])
+    return (LCEN_params, loss_train, loss_test, ICs)
+
+def _LCEN_transform(X, y, X_test, y_test, degree = 1, lag = 0, min_lag = 0, trans_type = 'all', interaction = True, selection = None, transform_y = False,
+                 all_pos_X = None, all_pos_y = True, scale_X = True, scale_y = True, classification = False, expanded = None, dtype = np.float64, return_names = True):
+    """
+    A helper function that is automatically called by SPA.
+    Expands the features, adds the lagged variables, scales, and selects the variables used by an LCEN model.
+    See LCEN_fitting() for the meaning of each parameter.
+    expanded is the (X_out, X_test_out, label_names) of _feature_trans(X, X_test, degree) if it was already calculated, such as by _LCEN_transform_degrees().
+    dtype is the dtype of the expanded features (see _feature_trans()).
+    If return_names == False, the label names (which are needed only for the final model) are returned as None.
+    If selection is not None, only the selected features are expanded (see _feature_trans()), as they usually are a small fraction of all features.
     """
     if all_pos_X is None: # all_pos_X is never None, unless this function is called manually by the end-user
         all_pos_X = np.all(X >= 0, axis = 0)
         if X_test:
             all_pos_X = all_pos_X & np.all(X_test >= 0, axis = 0)
+    n_features = X.shape[1]
+    columns = None
+    if selection is not None and expanded is None and not transform_y and X.shape[1] > 0:
+        # Only the expanded features that are selected (directly or through their lagged copies) are calculated. The selection is ...
+        #   then remapped from the columns of the full expansion (and its lagged copies) to those of this reduced expansion
+        n_columns = len(_feature_names(n_features, degree, interaction, trans_type, tuple(np.asarray(all_pos_X, dtype = bool).tolist())))
+        n_blocks = lag-min_lag+1 if lag > 0 else 1 # The features at t, t-1, ..., t-(lag-min_lag)
+        selection = np.flatnonzero(selection)
+        block, column = np.divmod(selection, n_columns)
+        is_X = block < n_blocks # The other entries are the y(t-1), ..., y(t-(lag-min_lag)) entries
+        columns = np.unique(column[is_X])
+        selection = np.where(is_X, block*len(columns) + np.searchsorted(columns, column), selection - (n_columns-len(columns))*n_blocks)
     # Expanding the X features
-    if not transform_y and X.shape[1] > 0:
-        X, X_test, label_names = _feature_trans(X, X_test, degree, interaction, trans_type, all_pos_X, all_pos_y)
-    elif X.shape[1] == 0:
-        label_names = np.array([])
-    if transform_y:
-        n_X_vars = X.shape[1]
+    if not transform_y and expanded is not None:
+        X, X_test = expanded[:2]
+    elif not transform_y and X.shape[1] > 0:
+        X, X_test, _ = _feature_trans(X, X_test, degree, interaction, trans_type, all_pos_X, all_pos_y, dtype, columns)
     # Adding variables from previous timesteps (t-1 to t-lag)
     if lag > 0:
         X_temp = np.hstack([X[lag-1-idx : -idx-1, :] for idx in range(min_lag, lag)]) # The additional entries representing the previous times (t-1 to t-lag)
@@ -202,26 +549,23 @@ def LCEN_fitting(X, y, X_test, y_test, alpha, l1_ratio, degree = 1, lag = 0, min
         X = np.hstack((X[lag:], X_temp, y_temp))
         y = y[lag:]
         X_test = np.hstack((X_test, X_test_temp, y_test_temp))
-        if not transform_y:
-            label_names = np.concatenate((label_names, [elem + f'(t-{idx+1})' for idx in range(lag-min_lag) for elem in label_names], [f'y(t-{idx+1})' for idx in range(lag-min_lag)]))
     if transform_y: # Feature transformation that includes the y features in the X and X_test variables
-        X, X_test, label_names = _feature_trans(X, X_test, degree, interaction, trans_type, all_pos_X, all_pos_y)
-        # Correcting the label names
-        for idx in range(n_X_vars*(lag+1) + lag - 1, n_X_vars-1, -1): # xN to x(n_X_vars). In reverse order to avoid x11 to x19 being caught in x1, for example
-            for elem_idx, elem in enumerate(label_names):
-                if idx >= n_X_vars * (lag + 1): # These entries are the y(t-1), y(t-2), ..., y(t-N) entries
-                    replacement = f'y(t-{idx - n_X_vars * (lag+1) + 1})'
-                elif idx >= n_X_vars: # These entries are the x0(t-1), x1(t-1), ..., x0(t-N), ..., xN(t-N) entries
-                    replacement = f'x{idx%n_X_vars}(t-{idx//n_X_vars})'
-                if idx >= n_X_vars: # Entries < n_X_vars are the actual x0, x1, ..., xN entries. Thus, they already have the correct ID
-                    label_names[elem_idx] = elem.replace(f'x{idx}', replacement)
+        if selection is not None: # Only the selected features are calculated
+            columns, selection = np.flatnonzero(selection), slice(None)
+        X, X_test, _ = _feature_trans(X, X_test, degree, interaction, trans_type, all_pos_X, all_pos_y, dtype, columns)
+    # The label names depend only on the shapes and options, so they are memoized by _LCEN_label_names()
+    if return_names:
+        label_names = _LCEN_label_names(n_features, degree, lag, min_lag, trans_type, interaction, transform_y,
+                                        tuple(np.atleast_1d(all_pos_X).tolist()), tuple(np.atleast_1d(all_pos_y).tolist()))
+    else:
+        label_names = None
 
     # Scale data (mean = 0, stdev = 1)
     if scale_X and X.shape[0] > 0 and X.shape[1] > 0: # StandardScaler requires at least one feature and one sample to work
-        scaler_x = StandardScaler(with_mean=True, with_std=True)
+        scaler_x = StandardScaler(with_mean=True, with_std=True, copy=False) # In place, as X and X_test are new arrays created by _feature_trans() or the lags above
         scaler_x.fit(X)
-        X = scaler_x.transform(X)
-        X_test = scaler_x.transform(X_test)
+        X = scaler_x.transform(X, copy = not X.flags.owndata) # Except for the views of _feature_trans_degrees(), which share their memory with the other degrees
+        X_test = scaler_x.transform(X_test, copy = not X_test.flags.owndata)
     if scale_y and not classification:
         scaler_y = StandardScaler(with_mean=True, with_std=True)
         scaler_y.fit(y)
@@ -232,27 +576,82 @@ def LCEN_fitting(X, y, X_test, y_test, alpha, l1_ratio, degree = 1, lag = 0, min
         X = X[:, selection]
         X_test = X_test[:, selection]
 
-    if X.shape[1] == 0:
-        LCEN_model = None
-        LCEN_params = np.empty(0)
-        loss_train = np.var(y) # TODO: for classification, this is not var(y) but guessing only the majority class and calculating the metrics from there
-        loss_test = np.var(y_test)
-        yhat_train = np.zeros(y.shape) # Ok to be 0 because y is scaled --> mean(y) is approximately 0
-        yhat_test = np.zeros(y_test.shape)
-    else:
-        LCEN_model, LCEN_params, loss_train, loss_test, yhat_train, yhat_test = EN_fitting(X, y, X_test, y_test, alpha, l1_ratio, classification = classification, class_weight = class_weight)
-    if not classification:
-        # Calculating information criteria values
-        num_train = X.shape[0] # Typically written as n
-        num_parameter = (LCEN_params!=0).flatten().sum() # Typically written as k
+
+    return (X, y, X_test, y_test, label_names)
+
+def _LCEN_transform_degrees(X, y, X_test, y_test, degrees = (1,), lag = 0, min_lag = 0, trans_type = 'all', interaction = True, selection = None, transform_y = False,
+                 all_pos_X = None, all_pos_y = True, scale_X = True, scale_y = True, classification = False, dtype = np.float64, return_names = True):
+    """
+    A helper function that is automatically called by SPA.
+    Same as _LCEN_transform(), but for multiple degrees at once. The features are expanded only once, for the highest degree, and the lower degrees ...
+        reuse a column subset of that expansion (see _feature_trans_degrees()). Returns a list with the output of _LCEN_transform() for each degree.
+    """
+    if transform_y or X.shape[1] == 0 or len(degrees) == 1: # With transform_y == True, the features are expanded after adding the lagged variables
+        return [_LCEN_transform(X, y, X_test, y_test, degree, lag, min_lag, trans_type, interaction, selection, transform_y, all_pos_X, all_pos_y,
+                                scale_X, scale_y, classification, dtype = dtype, return_names = return_names) for degree in degrees]
+    expansions = _feature_trans_degrees(X, X_test, degrees, interaction, trans_type, all_pos_X, all_pos_y, dtype)
+    order = sorted(degrees, key = lambda degree: degree == max(degrees)) # The highest degree may be scaled in place, so it goes after the lower degrees, which may be views of it
+    outputs = {degree: _LCEN_transform(X, y, X_test, y_test, degree, lag, min_lag, trans_type, interaction, selection, transform_y, all_pos_X, all_pos_y,
+                            scale_X, scale_y, classification, expansions[degree], return_names = return_names) for degree in order}
+    return [outputs[degree] for degree in degrees]
+
+@lru_cache(maxsize = 32) # Few combinations occur per run, and the names of large expansions take tens of MB
+def _LCEN_label_names(n_features, degree, lag, min_lag, trans_type, interaction, transform_y, all_pos_X, all_pos_y):
+    """
+    Returns the label names of the features created by _LCEN_transform() from n_features variables, before the selection.
+    The names are derived from _LCEN_table() and depend only on the arguments (all_pos_X and all_pos_y are tuples), so they are memoized and built only once per combination.
+    Used by _LCEN_transform()
+    """
+    label_names = _table_names(*_LCEN_table(n_features, degree, lag, min_lag, trans_type, interaction, transform_y, all_pos_X, all_pos_y))
+    label_names.flags.writeable = False # The same array is returned by every call with these arguments
+    return label_names
+
+def _LCEN_table(n_features, degree, lag, min_lag, trans_type, interaction, transform_y, all_pos_X, all_pos_y):
+    """
+    Returns a description of the features created by _LCEN_transform() from n_features variables, before the selection, and the names of its variables.
+    The table is as in _feature_table(). Without transform_y, its variables are x0, ..., xN and y, and the lagged copies of the features and the y(t-1), y(t-2), ... ...
+        entries have lag > 0. With transform_y, the lagged variables are added before the expansion, so the variables of the table are ...
+        x0, ..., xN, x0(t-1), ..., xN(t-1), ..., y(t-1), y(t-2), ... and every lag is 0. Used by _LCEN_label_names()
+    """
+    all_pos_X, all_pos_y = np.array(all_pos_X, dtype = bool), np.array(all_pos_y, dtype = bool)
+    lags = range(min_lag+1, lag+1) if lag > 0 else range(0) # The lags of the additional entries, as in _LCEN_transform()
+    if transform_y: # The variables are the lagged x and y features
+        n_columns = n_features * (len(lags)+1) + len(lags)
+        all_pos = np.concatenate(( all_pos_X, np.tile(all_pos_y, n_columns - len(all_pos_X)) )).astype(bool)
+        variable_names = [f'x{number}' for number in range(n_features)] + [f'x{number}(t-{this_lag})' for this_lag in lags for number in range(n_features)]
+        variable_names += [f'y(t-{this_lag})' for this_lag in lags]
+        return (_feature_table(n_columns, degree, interaction, trans_type, tuple(all_pos.tolist())), variable_names)
+    base = _feature_table(n_features, degree, interaction, trans_type, tuple(all_pos_X.tolist()))
+    table = _empty_table(n_features + 1, len(base) * (len(lags)+1) + len(lags))
+    for block, this_lag in enumerate((0, *lags)): # The features at t, t-1, ..., t-lag
+        rows = table[block*len(base) : (block+1)*len(base)]
+        for field in ('transform', 'variable', 'power2', 'degree'):
+            rows[field] = base[field]
+        rows['power'][:, :n_features] = base['power']
+        rows['lag'] = this_lag
+    y_rows = table[len(table)-len(lags):] # The y(t-1), y(t-2), ... entries
+    y_rows['variable'], y_rows['power'][:, n_features], y_rows['lag'], y_rows['degree'] = n_features, 1, list(lags), 1
+    table.flags.writeable = False
+    return (table, [f'x{number}' for number in range(n_features)] + ['y'])
+
+def _information_criteria(num_train, num_parameter, loss_train):
+    """
+    Returns the AIC, AICc, and BIC of a regression model given its number of training points (typically written as n), ...
+        its number of nonzero parameters (typically written as k), and its training MSE.
+    Also works elementwise with arrays of num_parameter and loss_train.
+    Models with num_parameter >= num_train - 1 (which may interpolate the training data, making log(MSE) -> -inf) get infinite ICs, so they are never selected.
+    """
+    with np.errstate(divide = 'ignore'):
         AIC = num_train*np.log(loss_train) + 2*num_parameter # num_train * log(MSE) is one of the formulae to replace L. Shown in https://doi.org/10.1002/wics.1460, for example.
-        AICc = AIC + 2*num_parameter*(num_parameter+1) / (num_train - num_parameter - 1)
+        AICc = AIC + 2*num_parameter*(num_parameter+1) / np.maximum(num_train - num_parameter - 1, 1)
         BIC = num_train*np.log(loss_train) + num_parameter*np.log(num_train)
-    else:
-        AIC, AICc, BIC = 0, 0, 0
-    return (LCEN_model, LCEN_params, loss_train, loss_test, yhat_train, yhat_test, label_names, (AIC, AICc, BIC))
+    overfit = np.asarray(num_parameter) >= num_train - 1
+    if overfit.any():
+        AIC, AICc, BIC = (np.where(overfit, np.inf, IC) for IC in (AIC, AICc, BIC))
+    return (AIC, AICc, BIC)
 
-def forest_fitting(X, y, X_test, y_test, n_estimators = 100, max_depth = 10, min_samples_leaf = 0.1, max_features = 1.0, learning_rate = None, random_state = 0, classification = False, class_weight = None):
+def forest_fitting(X, y, X_test, y_test, n_estimators = 100, max_depth = 10, min_samples_leaf = 0.1, max_features = 1.0, learning_rate = None, random_state = 0, classification = False, class_weight = None, cv_mode = False,
+                   staged_n_estimators = None):
     """
     Fits data using a random forest or gradient-boosted decision trees
 
@@ -283,7 +682,17 @@ def forest_fitting(X, y, X_test, y_test, n_estimators = 100, max_depth = 10, min
     class_weight : array, optional, default = None
         The class weights for each class.
         SPA automatically sets this to an array of ones (equal weights) if the user did not input anything to SPA.main_SPA()
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSE or MCC, number of features used by the trees).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
+    staged_n_estimators : list of int or None, optional, default = None
+        Used only with cv_mode == True. If not None, the model is fit once with max(staged_n_estimators) trees, ...
+            and the outputs of cv_mode are returned as arrays with one entry per value in staged_n_estimators, obtained from the first n trees.
+        The first n trees are the same trees a separate model with n trees would have (for random forests, because their seeds are drawn in sequence ...
+            from random_state; for gradient boosting, because it is sequential), so this is the same as fitting a separate model for each n.
     """
+    if staged_n_estimators is not None and cv_mode:
+        n_estimators = max(staged_n_estimators)
     if (learning_rate is None or learning_rate == 0) and not classification:
         forest = RandomForestRegressor(n_estimators, max_depth = max_depth, random_state = random_state, max_features = max_features, min_samples_leaf = min_samples_leaf)
     elif not classification:
@@ -295,6 +704,10 @@ def forest_fitting(X, y, X_test, y_test, n_estimators = 100, max_depth = 10, min
         forest = GradientBoostingClassifier(n_estimators = n_estimators, learning_rate = learning_rate, max_depth = max_depth, random_state = random_state,
                                            max_features = max_features, min_samples_leaf = min_samples_leaf)
     forest.fit(X, y.flatten())
+    if cv_mode and staged_n_estimators is not None:
+        return _staged_cv_score(forest, X_test, y_test, staged_n_estimators, classification, class_weight)
+    if cv_mode:
+        return _cv_score(forest, X_test, y_test, classification, class_weight), np.sum(forest.feature_importances_ != 0)
     # Predictions and metrics
     if not classification:
         yhat_train = forest.predict(X)
@@ -313,7 +726,7 @@ def forest_fitting(X, y, X_test, y_test, n_estimators = 100, max_depth = 10, min
 
     return (forest, loss_train, loss_test, yhat_train, yhat_test)
 
-def SVM_fitting(X, y, X_test, y_test, gamma = 'scale', C = 100, epsilon = 0.1, tol = 1e-4, max_iter = 10000, classification = False, class_weight = None):
+def SVM_fitting(X, y, X_test, y_test, gamma = 'scale', C = 100, epsilon = 0.1, tol = 1e-4, max_iter = 10000, classification = False, class_weight = None, cv_mode = False):
     """
     Support Vector Machine-based regression
 
@@ -339,12 +752,17 @@ def SVM_fitting(X, y, X_test, y_test, gamma = 'scale', C = 100, epsilon = 0.1, t
     class_weight : array, optional, default = None
         The class weights for each class.
         SPA automatically sets this to an array of ones (equal weights) if the user did not input anything to SPA.main_SPA()
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSE or MCC, number of support vectors).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
     """
     if not classification:
         SVM_model = SVR(gamma = gamma, C = C, epsilon = epsilon, tol = tol, max_iter = max_iter)
     else:
         SVM_model = SVC(gamma = gamma, C = C, probability = True, tol = tol, max_iter = max_iter)
     SVM_model.fit(X, y.flatten())
+    if cv_mode:
+        return _cv_score(SVM_model, X_test, y_test, classification, class_weight), len(SVM_model.support_)
     # Predictions and metrics
     if not classification:
         yhat_train = SVM_model.predict(X)
@@ -363,7 +781,135 @@ def SVM_fitting(X, y, X_test, y_test, gamma = 'scale', C = 100, epsilon = 0.1, t
 
     return (SVM_model, loss_train, loss_test, yhat_train, yhat_test)
 
-def AdaBoost_fitting(X, y, X_test, y_test, n_estimators = 50, learning_rate = 0.1, random_state = 0, classification = False, class_weight = None):
+def SVM_kernel_fitting(X, y, X_test, y_test, gamma, C, epsilon = None, tol = 1e-4, max_iter = 10000, classification = False, class_weight = None, cv_mode = False):
+    """
+    Support Vector Machine-based regression for multiple (C, epsilon) values with the same gamma.
+    The RBF kernels of the training data and of the testing vs training data are calculated only once and used as precomputed kernels by all ...
+        the (C, epsilon) models, instead of being recalculated by each model as in SVM_fitting(). Used by SPA during cross-validation.
+
+    Parameters
+    ----------
+    X, y : Numpy array with shape N x m, N x 1
+        Training data predictors and response.
+    X_test, y_test : Numpy array with shape N_test x m, N_test x 1
+        Testing data predictors and response.
+    gamma : float >= 0
+        Kernel coefficient for the RBF kernel.
+    C : array of floats > 0
+        Parameter inversely proportional to the strength of the regularization
+    epsilon : array of floats >= 0 or None, optional, default = None
+        Epsilon-tube within which no penalty is associated in the training loss function. Must have the same length as C.
+        Relevant only when classification == False.
+    max_iter : int, optional, default = 10000
+        The maximum number of iterations
+    classification : bool, optional, default = False
+        Whether to train a model for a classification (True) or regression (False) task.
+    class_weight : array, optional, default = None
+        The class weights for each class.
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSEs or MCCs, numbers of support vectors) for each (C, epsilon).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
+    """
+    K_train = rbf_kernel(X, gamma = gamma)
+    K_test = rbf_kernel(X_test, X, gamma = gamma)
+    if epsilon is None:
+        epsilon = [None] * len(C)
+    SVM_models, loss_train, loss_test, n_support = [], [], [], []
+    for this_C, this_epsilon in zip(C, epsilon):
+        if not classification:
+            SVM_model = SVR(kernel = 'precomputed', C = this_C, epsilon = this_epsilon, tol = tol, max_iter = max_iter)
+        else:
+            SVM_model = SVC(kernel = 'precomputed', C = this_C, probability = True, tol = tol, max_iter = max_iter)
+        SVM_model.fit(K_train, y.flatten())
+        loss_test.append(_cv_score(SVM_model, K_test, y_test, classification, class_weight))
+        n_support.append(len(SVM_model.support_))
+        if not cv_mode:
+            SVM_models.append(SVM_model)
+            loss_train.append(_cv_score(SVM_model, K_train, y, classification, class_weight))
+    if cv_mode:
+        return (np.array(loss_test), np.array(n_support))
+    return (SVM_models, np.array(loss_train), np.array(loss_test))
+
+def ASVM_fitting(X, y, X_test, y_test, gamma = 'scale', n_components = 300, C = 1, epsilon = 0.1, tol = 1e-4, max_iter = 10000, classification = False, class_weight = None, cv_mode = False):
+    """
+    Approximate Support Vector Machine-based regression for large datasets.
+    The RBF kernel is approximated by a Nystroem map of rank n_components, and a linear SVM with the epsilon-insensitive loss of SVR (regression) ...
+        or a logistic regression (classification) is trained on the mapped features. The cost grows linearly with the number of samples instead of quadratically to cubically as in SVM_fitting().
+
+    Parameters
+    ----------
+    X, y : Numpy array with shape N x m, N x 1
+        Training data predictors and response.
+    X_test, y_test : Numpy array with shape N_test x m, N_test x 1
+        Testing data predictors and response.
+    gamma : (float >=0) or str in {'scale', 'auto'}, optional, default = 'scale'
+        Kernel coefficient for the RBF kernel
+        If 'scale', gamma = 1 / (X.shape[1] * X.var())
+        If 'auto', gamma = 1 / X.shape[1]
+    n_components : int > 0, optional, default = 300
+        The rank of the kernel approximation (number of training samples used to build the Nystroem map).
+        Larger values approximate the kernel better, but are slower. Capped at the number of samples.
+    C : float > 0, optional, default = 1
+        Parameter inversely proportional to the strength of the regularization
+    epsilon : float >= 0, optional, default = 0.1
+        Epsilon-tube within which no penalty is associated in the training loss function.
+        Relevant only when classification == False.
+    max_iter : int, optional, default = 10000
+        The maximum number of iterations
+    classification : bool, optional, default = False
+        Whether to train a model for a classification (True) or regression (False) task.
+    class_weight : array, optional, default = None
+        The class weights for each class.
+        SPA automatically sets this to an array of ones (equal weights) if the user did not input anything to SPA.main_SPA()
+    cv_mode : bool, optional, default = False
+        If True, C and epsilon must be lists of the same length (epsilon may be None when classification == True). The Nystroem map is calculated ...
+            only once, and only (validation MSEs or MCCs, ranks of the approximation) are returned for each (C, epsilon).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
+    """
+    if gamma == 'scale':
+        gamma = 1 / (X.shape[1] * X.var())
+    elif gamma == 'auto':
+        gamma = 1 / X.shape[1]
+    feature_map = Nystroem(gamma = gamma, n_components = min(n_components, X.shape[0]), random_state = 0)
+    if cv_mode:
+        X_map = feature_map.fit_transform(X)
+        X_test_map = feature_map.transform(X_test)
+        if epsilon is None:
+            epsilon = [None] * len(C)
+        loss_test = [_cv_score(_ASVM_linear_model(this_C, this_epsilon, tol, max_iter, classification).fit(X_map, y.flatten()), X_test_map, y_test, classification, class_weight)
+                     for this_C, this_epsilon in zip(C, epsilon)]
+        return np.array(loss_test), np.full(len(loss_test), feature_map.components_.shape[0])
+    ASVM_model = Pipeline([('nystroem', feature_map), ('linear', _ASVM_linear_model(C, epsilon, tol, max_iter, classification))])
+    ASVM_model.fit(X, y.flatten())
+    # Predictions and metrics
+    if not classification:
+        yhat_train = ASVM_model.predict(X)
+        yhat_test = ASVM_model.predict(X_test)
+        loss_train = MSE(y, yhat_train)
+        loss_test = MSE(y_test, yhat_test)
+    else:
+        if class_weight is None:
+            class_weight = np.ones(len( set(y.squeeze()) ))
+        yhat_train = ASVM_model.predict_proba(X)
+        yhat_test = ASVM_model.predict_proba(X_test)
+        pred_class_train = yhat_train.argmax(axis=1)
+        loss_train = _classification_score(y, pred_class_train, class_weight)
+        pred_class_test = yhat_test.argmax(axis=1)
+        loss_test = _classification_score(y_test, pred_class_test, class_weight)
+
+    return (ASVM_model, loss_train, loss_test, yhat_train, yhat_test)
+
+def _ASVM_linear_model(C, epsilon, tol, max_iter, classification):
+    """
+    Returns the unfitted linear model trained on the Nystroem features by ASVM_fitting(). Regression uses the epsilon-insensitive loss of SVR, which ASVM replaces ...
+        for large datasets. Logistic regression is used for classification because, unlike LinearSVC, it returns class probabilities
+    """
+    if not classification:
+        return LinearSVR(C = C, epsilon = epsilon, loss = 'epsilon_insensitive', dual = True, tol = tol, max_iter = max_iter)
+    return LogisticRegression(C = C, tol = tol, max_iter = max_iter)
+
+def AdaBoost_fitting(X, y, X_test, y_test, n_estimators = 50, learning_rate = 0.1, random_state = 0, classification = False, class_weight = None, cv_mode = False,
+                     staged_n_estimators = None):
     """
     Adaptive Boosting regression
 
@@ -386,12 +932,25 @@ def AdaBoost_fitting(X, y, X_test, y_test, n_estimators = 50, learning_rate = 0.
     class_weight : array, optional, default = None
         The class weights for each class.
         SPA automatically sets this to an array of ones (equal weights) if the user did not input anything to SPA.main_SPA()
+    cv_mode : bool, optional, default = False
+        If True, skips the train set predictions and returns only (validation MSE or MCC, number of features used by the estimators).
+        Used by SPA during cross-validation, as the fitted models are not needed there.
+    staged_n_estimators : list of int or None, optional, default = None
+        Used only with cv_mode == True. If not None, the model is fit once with max(staged_n_estimators) estimators, ...
+            and the outputs of cv_mode are returned as arrays with one entry per value in staged_n_estimators, obtained from the first n estimators.
+        Boosting is sequential, so these are the same as fitting a separate model for each n.
     """
+    if staged_n_estimators is not None and cv_mode:
+        n_estimators = max(staged_n_estimators)
     if not classification:
         AdaB_model = AdaBoostRegressor(n_estimators = n_estimators, learning_rate = learning_rate, loss = 'square', random_state = random_state)
     else:
         AdaB_model = AdaBoostClassifier(n_estimators = n_estimators, learning_rate = learning_rate, algorithm = 'SAMME', random_state = random_state)
     AdaB_model.fit(X, y.flatten())
+    if cv_mode and staged_n_estimators is not None:
+        return _staged_cv_score(AdaB_model, X_test, y_test, staged_n_estimators, classification, class_weight)
+    if cv_mode:
+        return _cv_score(AdaB_model, X_test, y_test, classification, class_weight), np.sum(AdaB_model.feature_importances_ != 0)
     # Predictions and metrics
     if not classification:
         yhat_train = AdaB_model.predict(X)
@@ -410,12 +969,15 @@ def AdaBoost_fitting(X, y, X_test, y_test, n_estimators = 50, learning_rate = 0.
 
     return (AdaB_model, loss_train, loss_test, yhat_train, yhat_test)
 
-def _feature_trans(X, X_test = None, degree = 2, interaction = True, trans_type = 'all', all_pos_X = None, all_pos_y = True):
+def _feature_trans(X, X_test = None, degree = 2, interaction = True, trans_type = 'all', all_pos_X = None, all_pos_y = True, dtype = np.float64, columns = None):
     """
     A helper function that is automatically called by SPA.
     Performs non-linear transformations of X (and X_test). Transformations include polynomial transforms up to "degree", ...
     interactions between the raw variables in X (up to "degree" powers at the same time). If trans_type == 'all', also ...
     includes ln, sqrt, and inverse transforms of power up to "degree". Also includes some interaction terms among them.
+    The number of features is determined beforehand by _feature_names(), and every transform is written directly into ...
+        a single preallocated Fortran-order array by _feature_trans_kernel(), which avoids the temporaries of stacking the transforms.
+    The label names are memoized by _feature_names() and are read-only, as the same array is shared by all calls with the same shapes and options.
 
     Parameters
     ----------
@@ -440,114 +1002,322 @@ def _feature_trans(X, X_test = None, degree = 2, interaction = True, trans_type
             sqrt(k) for some k<0.
         This used to be determined within this function, but it leads to array size problems when some folds have negative ...
             entries and some do not, as the number of features will vary per fold.
+    dtype : NumPy float dtype, optional, default = np.float64
+        The dtype of the transformed arrays. np.float32 halves their memory use, which matters for degree >= 3 transforms of many variables.
+    columns : array of int, optional, default = None
+        If not None, only these columns of the transform are calculated and returned (in this order), together with their label names.
+        Each column is calculated on its own by _feature_trans_columns(), so the cost scales with len(columns) instead of with all features.
     """
-    X_test_out = None # Declaring this variable to avoid errors when doing the return statement
     if all_pos_X is None: # all_pos_X is never None, unless this function is called manually by the end-user
         all_pos_X = np.all(X >= 0, axis = 0) # This assumes [perhaps incorrectly] that all entries of X are indeed X entries (and not y entries that were concatenated because LCEN_transform_y == True)
-        if X_test: # X_test may be None
+        if X_test is not None:
             all_pos_X = all_pos_X & np.all(X_test >= 0, axis = 0)
+    number_y_entries = X.shape[1] - len(all_pos_X) # Additional y entries within the array X = total entries - X entries. Is != 0 only when LCEN_transform_y == True
+    all_pos = np.concatenate(( all_pos_X, np.tile(all_pos_y, number_y_entries) )).astype(bool)
+    label_names = _feature_names(X.shape[1], degree, interaction, trans_type, tuple(all_pos.tolist()))
+    if columns is not None:
+        recipes = _feature_recipes(X.shape[1], degree, interaction, trans_type, tuple(all_pos.tolist()))
+        X_out = _feature_trans_columns(X, recipes, columns, dtype)
+        X_test_out = None if X_test is None else _feature_trans_columns(X_test, recipes, columns, dtype)
+        return (X_out, X_test_out, label_names[columns])
+    X_out = _feature_trans_kernel(X, degree, interaction, trans_type, all_pos, len(label_names), dtype)
+    X_test_out = None if X_test is None else _feature_trans_kernel(X_test, degree, interaction, trans_type, all_pos, len(label_names), dtype)
+    return (X_out, X_test_out, label_names)
 
+@lru_cache(maxsize = 32)
+def _feature_names(n_features, degree, interaction, trans_type, all_pos):
+    """
+    Returns the label names of the features created by _feature_trans() from n_features variables, in the same order as its columns.
+    The names are derived from _feature_table() and depend only on the arguments (all_pos is a tuple), so they are memoized and returned as a read-only array.
+    Used by _feature_trans() and _LCEN_label_names()
+    """
+    label_names = _table_names(_feature_table(n_features, degree, interaction, trans_type, all_pos), [f'x{number}' for number in range(n_features)])
+    label_names.flags.writeable = False
+    return label_names
+
+@lru_cache(maxsize = 32) # The power rows of large expansions take as much memory as their label names
+def _feature_table(n_features, degree, interaction, trans_type, all_pos):
+    """
+    Returns a description of the features created by _feature_trans() from n_features variables, in the same order as its columns.
+    It is a structured array with the fields 'transform', 'variable' (the transformed variable, or -1 for interactions among multiple variables), ...
+        'power' (a row with the power of each variable), 'power2' (the second power of the transforms 5 and 7), 'lag' (always 0 here; see _LCEN_table()), ...
+        and 'degree' (the lowest degree whose _feature_trans() includes that feature).
+    With p = power and p2 = power2, the transforms are 0 = prod(x^p), 1 = ln(x)^p, 2 = sqrt(x) (p = 1), 3 = 1/prod(x^p), 4 = x^(p+0.5), ...
+        5 = ln(x)^p/x^p2, 6 = 1/x^(p-0.5), and 7 = ln(x)^p/x^(p2-0.5).
+    The label names (_feature_names()) and the calculation of each column (_feature_recipes()) are derived from this table, so they cannot disagree.
+    Memoized like _feature_names(). Also used by _feature_trans_degrees() and _LCEN_table()
+    """
+    if n_features == 0: # No features to expand, as in the LCEN models with only the y(t-1), y(t-2), ... variables
+        table = _empty_table(0)
+        table.flags.writeable = False
+        return table
+    poly = PolynomialFeatures(degree, include_bias = False, interaction_only = trans_type.casefold() == 'simple_interaction').fit(np.zeros((1, n_features)))
+    single = (poly.powers_ != 0).sum(axis = 1) == 1 # Same as the interaction_column of _feature_trans_kernel(), negated
+    kept = single if not interaction else np.ones_like(single)
+    pos, every = np.flatnonzero(all_pos), np.arange(n_features)
+    one_hot = lambda variables, power: np.eye(n_features, dtype = np.int8)[variables] * power
+    blocks = [(0, poly.powers_[kept], 0, poly.powers_[kept].sum(axis = 1))] # (transform, power, power2, degree) of each block of columns, in the order of _feature_trans_kernel()
+    if trans_type.casefold() == 'all':
+        blocks += [(1, poly.powers_[single], 0, poly.powers_[single].sum(axis = 1)), (2, one_hot(pos, 1), 0, 1), (3, poly.powers_[kept], 0, poly.powers_[kept].sum(axis = 1))]
+        blocks += [(4, one_hot(pos, pow1), 0, pow1+1) for pow1 in range(1, degree)]
+        blocks += [(5, one_hot(every, pow1), pow2, pow1+pow2) for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree]
+        blocks += [(6, one_hot(pos, pow1), 0, pow1+1) for pow1 in range(1, degree)]
+        blocks += [(7, one_hot(pos, pow1), pow2, pow1+pow2+1) for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree-1]
+    table = _empty_table(n_features, sum(len(power) for _, power, _, _ in blocks))
+    col = 0
+    for transform, power, power2, this_degree in blocks:
+        table['transform'][col:col+len(power)] = transform
+        table['power'][col:col+len(power)] = power
+        table['power2'][col:col+len(power)] = power2
+        table['degree'][col:col+len(power)] = this_degree
+        col += len(power)
+    single = (table['power'] != 0).sum(axis = 1) == 1
+    table['variable'] = np.where(single, table['power'].argmax(axis = 1), -1)
+    table.flags.writeable = False
+    return table
+
+def _empty_table(n_variables, n_columns = 0):
+    """
+    Returns a zeroed table of _feature_table() with n_columns features of n_variables variables. Used by _feature_table() and _LCEN_table()
+    """
+    return np.zeros(n_columns, dtype = [('transform', np.int8), ('variable', np.int32), ('power', np.int8, (n_variables,)), ('power2', np.int8),
+                                        ('lag', np.int16), ('degree', np.int16)])
+
+def _table_names(table, variable_names):
+    """
+    Returns the label names of the features described by a table of _feature_table() or _LCEN_table(), given the names of its variables.
+    Used by _feature_names() and _LCEN_label_names()
+    """
+    rows, variables = np.nonzero(table['power']) # The variables of each feature, in increasing order
+    variables = np.split(variables, np.searchsorted(rows, np.arange(1, len(table))))
+    exponent = lambda power: f'^{power}' if power != 1 else ''
+    label_names = []
+    for (transform, _, power, power2, lag, _), these_variables in zip(table.tolist(), variables):
+        name = variable_names[these_variables[0]]
+        pow1 = power[these_variables[0]]
+        if transform in {0, 3}: # Products of variables such as x0^2*x1, or their inverse
+            elem = '*'.join(variable_names[number] + exponent(power[number]) for number in these_variables)
+            elem = elem if transform == 0 else f'1/({elem})' # 1/(x1^3) is the same as (1/x1)^3
+        elif transform == 1:
+            elem = f'ln({name}){exponent(pow1)}' # Of the form ln(x1)^3, not ln(x1^3)
+        elif transform == 2:
+            elem = f'sqrt({name})'
+        elif transform == 4:
+            elem = f'{name}^{pow1+0.5}'
+        elif transform == 5:
+            elem = f'ln({name}){exponent(pow1)}/({name}){exponent(power2)}'
+        elif transform == 6:
+            elem = f'1/({name}^{pow1-0.5})'
+        else:
+            elem = f'ln({name}){exponent(pow1)}/({name}^{power2-0.5})'
+        label_names.append(elem + f'(t-{lag})' if lag > 0 else elem)
+    return np.array(label_names, dtype = str)
+
+def _feature_trans_kernel(X, degree, interaction, trans_type, all_pos, n_columns, dtype = np.float64):
+    """
+    Writes the features of _feature_trans() for a single array X into a preallocated N x n_columns Fortran-order array of the given dtype.
+    Each transform family is computed from (at most) N x m temporaries and written into its own block of columns, in the order of _feature_names().
+    Used by _feature_trans()
+    """
+    X = np.asarray(X, dtype = float)
+    X_out = np.empty((X.shape[0], n_columns), dtype = dtype, order = 'F')
     # Polynomial transforms (and interaction terms)
-    poly = PolynomialFeatures(degree, include_bias = False, interaction_only = trans_type.casefold() == 'simple_interaction', order = 'F') # Switching to Fortran order to speed up Elastic Net (and LCEN) [but does not make any significant difference]
-    X_out = poly.fit_transform(X)
-    label_names = poly.get_feature_names_out()
-    interaction_column = np.array([' ' in elem for elem in label_names], dtype = bool) # To filter out interactions if user asked for a polynomial-only transform. Also for the log, sqrt, and inv terms below when poly_trans_only == False
-    number_y_entries = X.shape[1] - len(all_pos_X) # Additional y entries within the array X = total entries - X entries. Is != 0 only when LCEN_transform_y == True
-    all_pos = np.concatenate(( all_pos_X, np.tile(all_pos_y, number_y_entries) ))
-    for idx in range(len(label_names)):
-        label_names[idx] = label_names[idx].translate({ord(i): '*' for i in ' '}) # str.translate replaces the characters on the right of the for (in this case, a whitespace) with an asterisk
-    if X_test is not None:
-        X_test_out = poly.fit_transform(X_test)
-    # Discarding the interaction terms (x1*x2, x2*x3*x5, (x1)^2 * x4, etc.) if requested to do so by the user
-    if not interaction:
-        X_out = X_out[:, ~interaction_column]
-        label_names = label_names[~interaction_column]
-        if X_test is not None:
-            X_test_out = X_test_out[:, ~interaction_column]
+    col = _poly_into(X_out, 0, X, degree, trans_type.casefold() == 'simple_interaction', not interaction)
     # Including ln, sqrt, and inverse terms; and also their higher-degree transforms if degree >= 2
     if trans_type.casefold() == 'all':
         # Setting up the transforms
         Xlog = np.where(X!=0, np.log(np.abs(X)), -50) # Avoiding log(0) = -inf
-        Xsqrt = np.sqrt(X[:, all_pos])
         Xinv = 1/X
         Xinv[Xinv == np.inf] = 1e15
         Xinv[Xinv == -np.inf] = -1e15
-        if X_test is not None:
-            Xlog_t = np.where(X_test!=0, np.log(np.abs(X_test)), -50) # Avoiding log(0) = -inf
-            Xsqrt_t = np.sqrt(X_test[:, all_pos])
-            Xinv_t = 1/X_test
-            Xinv_t[Xinv_t == np.inf] = 1e15
-            Xinv_t[Xinv_t == -np.inf] = -1e15
-        # ln transform
-        Xlog_trans = poly.fit_transform(Xlog)[:, ~interaction_column]
-        X_out = np.column_stack((X_out, Xlog_trans))
-        temp_label_names = poly.get_feature_names_out()[~interaction_column]
-        for idx in range(len(temp_label_names)): # Converting the names from x0-like to ln(x0)-like
-            power_split = temp_label_names[idx].split('^') # Separates the variable (e.g.: x0 or x1) from the power it was raised to, if it exists
-            if len(power_split) > 1:
-                power = f'^{power_split[-1]}'
-                base = ''.join(power_split[:-1])
-            else: # Variable hasn't beed raised to any power (equivalent to ^1), but we need an empty "power" variable to avoid errors
-                power = ''
-                base = power_split[0]
-            temp_label_names[idx] = f'ln({base}){power}' # Final name is of the form ln(x1)^3, not ln(x1^3)
-        label_names = np.concatenate((label_names, temp_label_names))
-        if X_test is not None:
-            Xlog_test_trans = poly.fit_transform(Xlog_t)[:, ~interaction_column]
-            X_test_out = np.column_stack((X_test_out, Xlog_test_trans))
-        # sqrt transform
-        X_out = np.column_stack((X_out, Xsqrt))
-        temp_label_names = [f'sqrt(x{number})' for number in range(X.shape[1]) if all_pos[number]]
-        label_names = np.concatenate((label_names, temp_label_names))
-        if X_test is not None:
-            X_test_out = np.column_stack((X_test_out, Xsqrt_t))
-        # Inverse transform
-        if not interaction:
-            Xinv_trans = poly.fit_transform(Xinv)[:, ~interaction_column]
-            temp_label_names = poly.get_feature_names_out()[~interaction_column]
+        n_pos = np.sum(all_pos)
+        # ln, sqrt, and inverse transforms
+        col = _poly_into(X_out, col, Xlog, degree, False, True)
+        X_out[:, col:col+n_pos] = np.sqrt(X[:, all_pos])
+        col = _poly_into(X_out, col+n_pos, Xinv, degree, False, not interaction)
+        # Specific interactions between X, ln(X), sqrt(X), and 1/X that occur for degree >= 2
+        blocks = [lambda pow1 = pow1: X[:, all_pos]**(pow1+0.5) for pow1 in range(1, degree)]
+        blocks += [lambda pow1 = pow1, pow2 = pow2: Xlog**pow1 * Xinv**pow2 for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree]
+        blocks += [lambda pow1 = pow1: Xinv[:, all_pos]**(pow1-0.5) for pow1 in range(1, degree)]
+        blocks += [lambda pow1 = pow1, pow2 = pow2: Xlog[:, all_pos]**pow1 * Xinv[:, all_pos]**(pow2-0.5) for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree-1]
+        for block in blocks: # Each block is computed only when it is written, so only one N x m temporary exists at a time
+            values = block()
+            X_out[:, col:col+values.shape[1]] = values
+            col += values.shape[1]
+    return X_out
+
+@lru_cache(maxsize = 32)
+def _feature_recipes(n_features, degree, interaction, trans_type, all_pos):
+    """
+    Returns how each feature created by _feature_trans() from n_features variables is calculated, in the same order as its columns.
+    Each entry is (transform, variables, pow1, pow2), where transform, pow1 (= power), and pow2 (= power2) are as in _feature_table(). For the polynomial, ln, and inverse transforms, ...
+        variables are the variables that are multiplied (in this order, as in _poly_into()); otherwise, it contains only the transformed variable.
+    Memoized like _feature_names(). Used by _feature_trans()
+    """
+    table = _feature_table(n_features, degree, interaction, trans_type, all_pos)
+    recipes = []
+    for transform, variable, power, power2 in zip(table['transform'].tolist(), table['variable'].tolist(), table['power'], table['power2'].tolist()):
+        if transform in {0, 1, 3}: # Degree d terms are degree d-1 terms times their lowest variable
+            recipes.append((transform, tuple(np.repeat(np.arange(n_features), power)[::-1].tolist()), 0, 0))
+        else:
+            recipes.append((transform, (variable,), int(power[variable]) if transform != 2 else 0, power2)) # sqrt(x) needs no power
+    return recipes
+
+def _feature_trans_columns(X, recipes, columns, dtype = np.float64):
+    """
+    Writes only the given columns of the features of _feature_trans() for a single array X into an N x len(columns) Fortran-order array.
+    The operations are the same as in _feature_trans_kernel(), so the values are exactly the same. Used by _feature_trans()
+    """
+    X = np.asarray(X, dtype = float)
+    X_out = np.empty((X.shape[0], len(columns)), dtype = dtype, order = 'F')
+    if any(recipes[col][0] != 0 for col in columns): # Same transforms as in _feature_trans_kernel()
+        Xlog = np.where(X!=0, np.log(np.abs(X)), -50) # Avoiding log(0) = -inf
+        Xinv = 1/X
+        Xinv[Xinv == np.inf] = 1e15
+        Xinv[Xinv == -np.inf] = -1e15
+    for out_col, col in enumerate(columns):
+        transform, variables, pow1, pow2 = recipes[col]
+        number = variables[0]
+        if transform in {0, 1, 3}: # Products of variables of X, ln(X), or 1/X
+            base = X if transform == 0 else Xlog if transform == 1 else Xinv
+            X_out[:, out_col] = base[:, number]
+            for other in variables[1:]:
+                np.multiply(X_out[:, out_col], base[:, other], out = X_out[:, out_col], casting = 'unsafe')
+        elif transform == 2:
+            X_out[:, out_col] = np.sqrt(X[:, number])
+        elif transform == 4:
+            X_out[:, out_col] = X[:, number]**(pow1+0.5)
+        elif transform == 5:
+            X_out[:, out_col] = Xlog[:, number]**pow1 * Xinv[:, number]**pow2
+        elif transform == 6:
+            X_out[:, out_col] = Xinv[:, number]**(pow1-0.5)
         else:
-            Xinv_trans = poly.fit_transform(Xinv)
-            temp_label_names = poly.get_feature_names_out()
-        X_out = np.column_stack((X_out, Xinv_trans))
-        for idx in range(len(temp_label_names)): # Converting the names from x0-like to ln(x0)-like
-            temp_label_names[idx] = temp_label_names[idx].translate({ord(i): '*' for i in ' '}) # str.translate replaces the characters on the right of the "for i in" (in this case, a whitespace) with an asterisk
-            temp_label_names[idx] = f'1/({temp_label_names[idx]})' # 1/(x1^3) is the same as (1/x1)^3, so we do not need the fancy manipulations used above in the ln transform naming
-        label_names = np.concatenate((label_names, temp_label_names))
+            X_out[:, out_col] = Xlog[:, number]**pow1 * Xinv[:, number]**(pow2-0.5)
+    return X_out
+
+def _poly_into(X_out, col, X, degree, interaction_only = False, powers_only = False):
+    """
+    Writes the PolynomialFeatures(degree, include_bias = False, interaction_only = interaction_only) transform of X into X_out, starting at column col.
+    If powers_only == True, only the powers of each variable are written (x0, ..., xN, x0^2, ..., xN^2, ...), which is the same as ...
+        removing the interaction columns of the full transform. Returns the column after the last written column.
+    The degree d terms are calculated from the degree d-1 terms as in PolynomialFeatures, so the values are exactly the same. Used by _feature_trans_kernel()
+    """
+    n_features = X.shape[1]
+    X_out[:, col:col+n_features] = X
+    if powers_only:
+        for _ in range(2, degree+1 if not interaction_only else 1): # Interaction-only transforms have no powers >= 2
+            np.multiply(X_out[:, col:col+n_features], X, out = X_out[:, col+n_features:col+2*n_features], casting = 'unsafe')
+            col += n_features
+        return col + n_features
+    index = list(range(col, col+n_features+1)) # index[idx] is the first degree d-1 column whose lowest variable is idx
+    col += n_features
+    for _ in range(2, degree+1):
+        new_index = []
+        end = index[-1]
+        for feature_idx in range(n_features):
+            start = index[feature_idx]
+            new_index.append(col)
+            if interaction_only:
+                start += index[feature_idx+1] - index[feature_idx]
+            next_col = col + end - start
+            if next_col <= col:
+                break
+            # X_out[:, start:end] are the degree d-1 terms that exclude the variables before feature_idx
+            np.multiply(X_out[:, start:end], X[:, feature_idx:feature_idx+1], out = X_out[:, col:next_col], casting = 'unsafe')
+            col = next_col
+        new_index.append(col)
+        index = new_index
+    return col
+
+def _feature_trans_degrees(X, X_test = None, degrees = (2,), interaction = True, trans_type = 'all', all_pos_X = None, all_pos_y = True, dtype = np.float64):
+    """
+    A helper function that is automatically called by SPA.
+    Same as _feature_trans(), but for multiple degrees at once. The features of a degree are a subset of those of any higher degree, ...
+        so X is expanded only once, for the highest degree, and each lower degree is a column subset of that expansion.
+    Returns a dict of {degree: (X_out, X_test_out, label_names)}, whose columns are in the same order as those of _feature_trans(degree).
+    The highest degree is the expansion itself, and the lower degrees are views of it whenever their columns are contiguous, so they must not be modified in place.
+    """
+    if all_pos_X is None: # Determined here because the columns of each degree depend on all_pos_X
+        all_pos_X = np.all(X >= 0, axis = 0)
         if X_test is not None:
-            if not interaction:
-                Xinv_test_trans = poly.fit_transform(Xinv_t)[:, ~interaction_column]
-            else:
-                Xinv_test_trans = poly.fit_transform(Xinv_t)
-            X_test_out = np.column_stack((X_test_out, Xinv_test_trans))
-        # Specific interactions between X, ln(X), sqrt(X), and 1/X that occur for degree >= 2
-        if degree >= 2:
-            normal_plus_half_interaction = np.column_stack([X[:, all_pos]**(pow1+0.5) for pow1 in range(1, degree)])
-            normal_plus_half_names = [f'x{number}^{pow1+0.5}' for pow1 in range(1, degree) for number in range(X.shape[1]) if all_pos[number]]
-            log_inv_interaction = np.column_stack([Xlog**pow1 * Xinv**pow2 for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree])
-            log_inv_names = [f'ln(x{number})^{pow1}/(x{number})^{pow2}' for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree for number in range(X.shape[1])]
-            log_inv_names = [elem[:-2].replace('^1/', '/') + elem[-2:].replace('^1', '') for elem in log_inv_names] # Removing ^1. String addition to avoid removing ^10, ^11, ^12, ...
-            inv_minus_half_interaction = np.column_stack([Xinv[:, all_pos]**(pow1-0.5) for pow1 in range(1, degree)])
-            inv_minus_half_names = [f'1/(x{number}^{pow1-0.5})' for pow1 in range(1, degree) for number in range(X.shape[1]) if all_pos[number]]
-            if degree == 2: # degree == 2 does not have the ln(x) * sqrt(x) / x type of interactions
-                X_out = np.column_stack((X_out, normal_plus_half_interaction, log_inv_interaction, inv_minus_half_interaction))
-                label_names = np.concatenate((label_names, normal_plus_half_names, log_inv_names, inv_minus_half_names))
+            all_pos_X = all_pos_X & np.all(X_test >= 0, axis = 0)
+    X_out, X_test_out, label_names = _feature_trans(X, X_test, max(degrees), interaction, trans_type, all_pos_X, all_pos_y, dtype)
+    all_pos = np.concatenate(( all_pos_X, np.tile(all_pos_y, X.shape[1] - len(all_pos_X)) )).astype(bool) # As in _feature_trans()
+    table = _feature_table(X.shape[1], max(degrees), interaction, trans_type, tuple(all_pos.tolist()))
+    expansions = {}
+    for degree in degrees:
+        if degree == max(degrees):
+            expansions[degree] = (X_out, X_test_out, label_names)
+            continue
+        idx = np.flatnonzero(table['degree'] <= degree) # The features of this degree, which are in the same relative order in both expansions
+        if len(idx) > 0 and idx[-1] - idx[0] + 1 == len(idx): # Contiguous columns (such as the polynomial-only transforms) become a view instead of a copy
+            idx = slice(idx[0], idx[-1] + 1)
+        expansions[degree] = (X_out[:, idx], None if X_test_out is None else X_test_out[:, idx], label_names[idx]) # Fortran-ordered, as with PolynomialFeatures(order = 'F')
+    return expansions
+
+def _cv_score(model, X_test, y_test, classification = False, class_weight = None):
+    """
+    Returns the validation MSE (regression) or MCC (classification) of a fitted model. Used by the *_fitting functions when cv_mode == True
+    """
+    if not classification:
+        return MSE(y_test, model.predict(X_test))
+    if class_weight is None:
+        class_weight = np.ones(len( set(y_test.squeeze()) ))
+    pred_class_test = model.predict_proba(X_test).argmax(axis=1)
+    return _classification_score(y_test, pred_class_test, class_weight)['MCC']
+
+def _staged_cv_score(model, X_test, y_test, staged_n_estimators, classification = False, class_weight = None):
+    """
+    Returns the validation MSE (regression) or MCC (classification) and the number of features used of the ensembles made of the first n estimators ...
+        of a fitted forest or boosting model, for each n in staged_n_estimators. Used by forest_fitting() and AdaBoost_fitting() when cv_mode == True
+    """
+    if classification and class_weight is None:
+        class_weight = np.ones(len( set(y_test.squeeze()) ))
+    targets = set(staged_n_estimators) | {len(model.estimators_)} # AdaBoost stops early after a perfect fit, in which case larger ensembles are the same as the last one
+    if isinstance(model, AdaBoostRegressor): # staged_predict() recomputes the weighted median of all previous estimators at each stage
+        all_pred = np.array([estimator.predict(X_test) for estimator in model.estimators_])
+        # The weighted medians are taken only at the requested n. The other stages yield None, as only their trees are needed (for used_features)
+        staged_pred = (_weighted_median_predict(all_pred[:n], model.estimator_weights_[:n]) if n in targets else None for n in range(1, len(model.estimators_)+1))
+    elif isinstance(model, (RandomForestRegressor, RandomForestClassifier)):
+        staged_pred = _staged_forest_predict(model, X_test, classification)
+    elif classification:
+        staged_pred = model.staged_predict_proba(X_test)
+    else:
+        staged_pred = model.staged_predict(X_test)
+    # Estimators of gradient boosting are arrays with one tree per class
+    trees = [np.atleast_1d(estimator) for estimator in model.estimators_]
+    used_features = np.zeros(X_test.shape[1], dtype = bool)
+    scores, n_features = {}, {}
+    for n, pred in enumerate(staged_pred, 1):
+        for tree in trees[n-1]:
+            used_features[tree.tree_.feature[tree.tree_.feature >= 0]] = True # Leaves have negative feature indices
+        if n in targets:
+            if not classification:
+                scores[n] = MSE(y_test, pred)
             else:
-                log_inv_minus_oneandhalf_interaction = np.column_stack([Xlog[:, all_pos]**pow1 * Xinv[:, all_pos]**(pow2-0.5) for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree-1])
-                log_inv_minus_oneandhalf_names = [f'ln(x{number})^{pow1}/(x{number}^{pow2-0.5})' for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree-1 for number in range(X.shape[1]) if all_pos[number]]
-                log_inv_minus_oneandhalf_names = [elem[:-2].replace('^1/', '/') + elem[-2:].replace('^1', '') for elem in log_inv_minus_oneandhalf_names] # Removing ^1. String addition to avoid removing ^10, ^11, ^12, ...
-                X_out = np.column_stack((X_out, normal_plus_half_interaction, log_inv_interaction, inv_minus_half_interaction, log_inv_minus_oneandhalf_interaction))
-                label_names = np.concatenate((label_names, normal_plus_half_names, log_inv_names, inv_minus_half_names, log_inv_minus_oneandhalf_names))
-            if X_test is not None:
-                normal_plus_half_interaction = np.column_stack([X_test[:, all_pos]**(pow1+0.5) for pow1 in range(1, degree)])
-                log_inv_interaction = np.column_stack([Xlog_t**pow1 * Xinv_t**pow2 for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree])
-                inv_minus_half_interaction = np.column_stack([Xinv_t[:, all_pos]**(pow1-0.5) for pow1 in range(1, degree)])
-                if degree == 2:
-                    X_test_out = np.column_stack((X_test_out, normal_plus_half_interaction, log_inv_interaction, inv_minus_half_interaction))
-                else:
-                    log_inv_minus_oneandhalf_interaction = np.column_stack([Xlog_t[:, all_pos]**pow1 * Xinv_t[:, all_pos]**(pow2-0.5) for pow1 in range(1,degree) for pow2 in range(1,degree) if pow1+pow2 <= degree-1])
-                    X_test_out = np.column_stack((X_test_out, normal_plus_half_interaction, log_inv_interaction, inv_minus_half_interaction, log_inv_minus_oneandhalf_interaction))
+                scores[n] = _classification_score(y_test, pred.argmax(axis=1), class_weight)['MCC']
+            n_features[n] = used_features.sum()
+    last = len(trees)
+    return np.array([scores[min(n, last)] for n in staged_n_estimators]), np.array([n_features[min(n, last)] for n in staged_n_estimators])
 
-    return (X_out, X_test_out, label_names)
+def _staged_forest_predict(forest, X_test, classification = False):
+    """
+    Yields the predictions of the random forests made of the first 1, 2, ... trees of forest, which are the means of the predictions of these trees.
+    Each tree is predicted only once, and the predictions are summed in the same order as in RandomForestRegressor.predict()
+    """
+    total = 0
+    for n, tree in enumerate(forest.estimators_, 1):
+        total = total + (tree.predict_proba(X_test) if classification else tree.predict(X_test))
+        yield total / n
+
+def _weighted_median_predict(predictions, weights):
+    """
+    Returns the weighted median of the predictions (n_estimators x N) of an AdaBoostRegressor, as calculated by AdaBoostRegressor.predict()
+    """
+    sorted_idx = np.argsort(predictions, axis = 0)
+    weight_cdf = np.cumsum(weights[sorted_idx], axis = 0)
+    median_idx = (weight_cdf >= 0.5 * weight_cdf[-1]).argmax(axis = 0)
+    return predictions[sorted_idx[median_idx, np.arange(predictions.shape[1])], np.arange(predictions.shape[1])]
 
 def _classification_score(y, pred_class, class_weight):
     """
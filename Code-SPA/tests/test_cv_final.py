@@ -0,0 +1,154 @@
+import os
+import sys
+import warnings
+from itertools import product
+from unittest import mock
+import numpy as np
+import pytest
+import torch
+from joblib import load
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import cv_final as cv
+import regression_models as rm
+
+def _LCEN_data():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0.5, 2, (50, 8)) # The degree 2 expansion has many more features than training points
+    y = X[:, :1] - X[:, 1:2]**2 + rng.normal(0, 0.3, (50, 1))
+    return X[:40], y[:40], X[40:], y[40:]
+
+@pytest.mark.parametrize('EN_solver', ['batched', 'path', 'individual'])
+def test_LCEN_IC_does_not_select_interpolating_models(EN_solver):
+    X, y, X_test, y_test = _LCEN_data()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        hyperparams, _, LCEN_params, _, loss_test, *_ = cv.CV_mse('LCEN', X, y, X_test, y_test, cv_type = 'AICc', EN_solver = EN_solver, verbosity_level = 0,
+                                                                  degree = [1, 2], lag = [0], n_jobs = 1)
+    assert len(LCEN_params) < X.shape[0] - 1
+    assert loss_test < 0.5*np.var(y_test)
+
+def test_EN_solvers_select_the_same_model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size = (60, 8))
+    y = X[:, :2] @ np.array([[1.], [-0.5]]) + rng.normal(0, 0.5, (60, 1))
+    results = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for EN_solver in ['batched', 'path', 'individual']:
+            hyperparams, _, EN_params, *_ = cv.CV_mse('EN', X[:50], y[:50], X[50:], y[50:], X[:50], y[:50], alpha = [0, 1e-3, 1e-2, 0.1], l1_ratio = [0, 0.5, 1],
+                                                      EN_solver = EN_solver, verbosity_level = 0, n_jobs = 1)
+            results.append((hyperparams, EN_params))
+    for hyperparams, EN_params in results[1:]:
+        assert hyperparams == results[0][0]
+        assert np.allclose(EN_params, results[0][1])
+
+def test_SVM_precomputed_kernels_fit_in_the_memory_budget_of_all_workers():
+    kwargs = {'SVM_kernel': 'auto', 'search': 'grid', 'n_jobs': 1, 'SVM_kernel_memory': 2e9}
+    assert cv._SVM_precomputed(10000, 45, kwargs) # 800 MB
+    kwargs['n_jobs'] = 16
+    assert not cv._SVM_precomputed(10000, 45, kwargs)
+    assert cv._SVM_precomputed(10000, 2, kwargs) # Only 2 tasks can run at once
+    assert cv._SVM_precomputed(3000, 45, kwargs)
+    kwargs['SVM_kernel'] = 'precomputed'
+    assert cv._SVM_precomputed(10000, 45, kwargs)
+
+def _run_bayes(hyperparam_prod, trial_rows, score, n_trials, n_folds = 2):
+    """
+    Runs cv._CV_bayes() with a fake _CV_dispatch() that writes score(row) (NaN for failed fits) into the results.
+    trial_rows are the rows scored by each fit. Returns the scores and the rows of each fit that was dispatched.
+    """
+    tasks = [(fold, list(rows), 0, fold, None) for fold in range(n_folds) for rows in trial_rows]
+    scores = np.full((len(hyperparam_prod), n_folds), np.nan)
+    fits = []
+    def fake_dispatch(round_tasks, folds, results, model_name, kwargs, fold_key = None):
+        for fold, rows, *_ in round_tasks:
+            results[0][rows, fold] = [score(row) for row in rows]
+            if fold == 0:
+                fits.append(tuple(rows))
+    kwargs = {'classification': False, 'n_trials': n_trials, 'bayes_batch': 3, 'fold_cache': {}, 'verbosity_level': 0}
+    with mock.patch.object(cv, '_CV_dispatch', fake_dispatch):
+        cv._CV_bayes(tasks, None, (scores, ), 'SVM', kwargs, None, hyperparam_prod)
+    return scores, fits
+
+def test_bayes_search_stays_within_the_trial_budget():
+    hyperparam_prod = list(product([0.01, 0.1, 1, 10, 100], [0.1, 1, 10, 100]))
+    optimum = np.log10([1, 10])
+    scores, fits = _run_bayes(hyperparam_prod, [(row, ) for row in range(len(hyperparam_prod))],
+                              lambda row: np.sum((np.log10(hyperparam_prod[row]) - optimum)**2), n_trials = 7)
+    assert len(fits) == len(set(fits)) == 7
+    evaluated = np.isfinite(scores).all(axis = 1)
+    assert evaluated.sum() == 7 and np.isinf(scores[~evaluated]).all()
+    # Staged fits score several rows (such as n_estimators values) at once, but count as a single trial
+    scores, fits = _run_bayes(hyperparam_prod, [tuple(range(start, start+4)) for start in range(0, len(hyperparam_prod), 4)], lambda row: float(row), n_trials = 3)
+    assert len(fits) == len(set(fits)) == 3
+    assert np.isfinite(scores).all(axis = 1).sum() == 12
+
+@pytest.mark.parametrize('failed', [lambda row: True, lambda row: row < 10])
+@pytest.mark.filterwarnings('error::RuntimeWarning') # No 'Mean of empty slice' warnings for the failed fits
+def test_bayes_search_handles_failed_batches(failed):
+    hyperparam_prod = list(product([0.01, 0.1, 1, 10, 100], [0.1, 1, 10, 100]))
+    scores, fits = _run_bayes(hyperparam_prod, [(row, ) for row in range(len(hyperparam_prod))], lambda row: np.nan if failed(row) else float(row), n_trials = 9)
+    assert len(fits) == len(set(fits)) == 9
+
+def test_LCEN_feature_cache_returns_memmapped_expansions():
+    rng = np.random.default_rng(0)
+    X, y = rng.uniform(0.5, 2, (30, 3)), rng.normal(size = (30, 1))
+    folds = [(X[:20], y[:20], X[20:], y[20:]), (X[10:], y[10:], X[:10], y[:10])]
+    kwargs = {'min_lag': 0, 'selection': None, 'LCEN_transform_y': False, 'all_pos_X': np.ones(3, dtype = bool), 'all_pos_y': False, 'scale_X': True, 'scale_y': True,
+              'classification': False, 'LCEN_dtype': np.float64, 'trans_type': 'all', 'LCEN_interaction': True, 'fold_cache': None, 'n_jobs': 1, 'backend': 'loky', 'inner_max_num_threads': None}
+    with cv._LCEN_feature_cache(folds, len(folds), [(1, 1, 0.1, 0), (2, 1, 0.1, 0)], kwargs) as feature_cache:
+        assert len(feature_cache) == 4
+        for (counter, (degree, *_)), handle in feature_cache.items():
+            expected = rm._LCEN_transform(*folds[counter], degree, all_pos_X = kwargs['all_pos_X'], all_pos_y = False)
+            for filename, array in zip(handle, expected[:4]):
+                assert np.allclose(load(filename, mmap_mode = 'r'), array)
+    assert not any(os.path.exists(filename) for handle in feature_cache.values() for filename in handle) # The folder is deleted on exit
+
+def test_torch_thread_limit_restores_the_previous_number():
+    previous = torch.get_num_threads()
+    @cv._torch_thread_limit(previous + 1)
+    def threads():
+        return torch.get_num_threads()
+    assert threads() == previous + 1 and torch.get_num_threads() == previous
+    with cv._torch_thread_limit(None):
+        assert torch.get_num_threads() == previous
+
+def _run_race(n_folds, racing_folds, n_rows = 6):
+    """
+    Runs cv._CV_race() with a fake _CV_dispatch(), in which the rows have increasingly worse scores. Returns the scores and the dispatched (row, fold) pairs.
+    """
+    rng = np.random.default_rng(0)
+    tasks = [(fold, [row], 0, fold, None) for fold in range(n_folds) for row in range(n_rows)]
+    scores = np.full((n_rows, n_folds), np.nan)
+    dispatched = []
+    def fake_dispatch(round_tasks, folds, results, model_name, kwargs, fold_key = None):
+        for fold, rows, *_ in round_tasks:
+            results[0][rows, fold] = rows[0] + rng.normal(0, 0.1)
+            dispatched.append((rows[0], fold))
+    kwargs = {'classification': False, 'racing_folds': racing_folds, 'racing_alpha': 0.05, 'fold_cache': {}, 'verbosity_level': 0}
+    with mock.patch.object(cv, '_CV_dispatch', fake_dispatch):
+        cv._CV_race(tasks, None, (scores, ), 'RF', kwargs)
+    return scores, dispatched
+
+def test_racing_eliminates_hyperparameters_with_non_repeated_folds(capsys):
+    scores, dispatched = _run_race(5, None) # Such as KFold with K_fold = 5
+    assert len(dispatched) < 6*5
+    assert np.isfinite(scores[0]).all() and np.isinf(scores[-1]).all()
+    assert 'WARNING' not in capsys.readouterr().out
+    _, dispatched = _run_race(5, 5) # A single round cannot eliminate anything
+    assert len(dispatched) == 6*5
+    assert 'WARNING' in capsys.readouterr().out
+
+def test_auto_EN_solver_batches_only_few_features():
+    kwargs = {'classification': False, 'EN_solver': 'auto'}
+    assert cv._EN_solver(100, 10, kwargs) == 'batched'
+    assert cv._EN_solver(100, 40, kwargs) == 'path' # The batched solver would run enet_path serially
+    assert cv._EN_solver(20, 25, kwargs) == 'path'
+    assert cv._EN_solver(1000, 10, kwargs) == 'path'
+    # The LCEN features are counted after the expansion and lags
+    X, y, X_test, y_test = _LCEN_data()
+    kwargs.update({'min_lag': 0, 'trans_type': 'all', 'LCEN_interaction': True, 'selection': None, 'LCEN_transform_y': False,
+                   'all_pos_X': np.ones(X.shape[1], dtype = bool), 'all_pos_y': False})
+    for degree, lag in [(1, 0), (2, 0), (1, 2)]:
+        expected = rm._LCEN_transform(X, y, X_test, y_test, degree, lag, all_pos_X = kwargs['all_pos_X'], all_pos_y = False, return_names = False)[0].shape[1]
+        assert cv._LCEN_n_columns(X, y, X_test, y_test, degree, lag, kwargs) == expected
@@ -0,0 +1,150 @@
+import os
+import sys
+import warnings
+from unittest import mock
+import numpy as np
+import pytest
+from sklearn.ensemble import AdaBoostRegressor
+from sklearn.linear_model import ElasticNet, Ridge
+from sklearn.metrics import mean_squared_error as MSE
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import regression_models as rm
+
+def test_staged_cv_score_adaboost_medians_only_at_targets():
+    rng = np.random.default_rng(0)
+    X, X_test = rng.normal(size = (60, 3)), rng.normal(size = (20, 3))
+    y, y_test = X[:, :1] + rng.normal(0, 0.5, (60, 1)), X_test[:, :1]
+    model = AdaBoostRegressor(n_estimators = 20, learning_rate = 0.1, loss = 'square', random_state = 0).fit(X, y.ravel())
+    targets = [5, 10]
+    with mock.patch.object(rm, '_weighted_median_predict', wraps = rm._weighted_median_predict) as median:
+        scores, _ = rm._staged_cv_score(model, X_test, y_test, targets)
+    called_n = sorted(call.args[0].shape[0] for call in median.call_args_list)
+    assert called_n == sorted(set(targets) | {len(model.estimators_)})
+    # Same scores as the (quadratic) staged_predict() of sklearn
+    staged = list(model.staged_predict(X_test))
+    assert np.allclose(scores, [MSE(y_test, staged[n-1]) for n in targets])
+
+def test_EN_ridge_at_alpha_zero_uses_coordinate_descent():
+    # The exact ridge solution at alpha == 0 interpolates the training data when m >= N
+    rng = np.random.default_rng(0)
+    X = rng.normal(size = (30, 50))
+    y = X[:, :1] + rng.normal(0, 0.5, (30, 1))
+    alpha = np.array([0, 1e-3, 0.1])
+    EN_params, _, _ = rm.EN_path_fitting(X, y, X, y, alpha, 0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        CD_model = ElasticNet(alpha = 0, l1_ratio = 0, fit_intercept = False, max_iter = 10000, tol = 1e-4).fit(X, y)
+    assert np.allclose(EN_params[0], CD_model.coef_)
+    assert np.allclose(rm.EN_fitting(X, y, X, y, 0., 0)[1], CD_model.coef_)
+    # alpha > 0 is solved exactly, as in Ridge, and the final model is still an ElasticNet
+    assert np.allclose(EN_params[1:], [Ridge(alpha = 30*this_alpha, fit_intercept = False).fit(X, y).coef_.ravel() for this_alpha in alpha[1:]])
+    for this_alpha, params in zip(alpha[1:], EN_params[1:]):
+        EN_model, final_params = rm.EN_fitting(X, y, X, y, this_alpha, 0)[:2]
+        assert isinstance(EN_model, ElasticNet) and np.allclose(final_params, params)
+
+def test_information_criteria_reject_interpolating_models():
+    # Models with k >= N-1 get infinite ICs (whatever their training MSE), and the usual formulae apply otherwise
+    num_parameter, loss_train = np.array([3, 18, 19, 25]), np.array([0.5, 0.1, 0.1, 1e-30])
+    AIC, AICc, BIC = rm._information_criteria(20, num_parameter, loss_train)
+    assert np.allclose(AIC[:2], 20*np.log(loss_train[:2]) + 2*num_parameter[:2])
+    assert np.allclose(AICc[:2], AIC[:2] + 2*num_parameter[:2]*(num_parameter[:2]+1) / (20 - num_parameter[:2] - 1))
+    assert np.allclose(BIC[:2], 20*np.log(loss_train[:2]) + num_parameter[:2]*np.log(20))
+    for IC in (AIC, AICc, BIC):
+        assert np.isposinf(IC[2:]).all()
+    # Same for the scalar ICs of a final LCEN model
+    rng = np.random.default_rng(0)
+    X, y = rng.uniform(0.5, 2, (20, 4)), rng.normal(size = (20, 1))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        LCEN_params, *_, ICs = rm.LCEN_fitting(X, y, X, y, 1e-3, 0, degree = 2, all_pos_X = np.ones(4, dtype = bool))[1:]
+    assert np.count_nonzero(LCEN_params) >= 19 and np.isposinf(ICs).all()
+
+@pytest.mark.parametrize('shape', [(60, 8), (30, 50)]) # Active set method and enet_path (m >= N)
+def test_EN_batch_fitting_matches_path_and_individual(shape):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size = shape)
+    y = X[:, :2] @ np.array([[1.], [-0.5]]) + rng.normal(0, 0.5, (shape[0], 1))
+    split = shape[0] * 3 // 4
+    folds = [(X[train], y[train], X[val], y[val]) for train, val in [(np.r_[:split], np.r_[split:]), (np.r_[shape[0]-split:], np.r_[:shape[0]-split])]]
+    alpha, l1_ratio = np.tile([0, 1e-3, 1e-2, 0.1], 3), np.repeat([0, 0.5, 1], 4)
+    # Coordinate descent (tol = 1e-4) solves the alpha == 0 problems only approximately, hence the tolerances
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        batch_params, _, batch_loss = rm.EN_batch_fitting(*zip(*folds), alpha, l1_ratio)
+        for fold_idx, fold in enumerate(folds):
+            for this_l1_ratio in np.unique(l1_ratio):
+                rows = l1_ratio == this_l1_ratio
+                path_params, _, path_loss = rm.EN_path_fitting(*fold, alpha[rows], this_l1_ratio)
+                assert np.allclose(batch_params[fold_idx, rows], path_params, atol = 1e-2)
+                assert np.allclose(batch_loss[fold_idx, rows], path_loss, rtol = 1e-2)
+                if shape[0] > shape[1]: # The alpha == 0 models of the individual fits are not unique (nor warm-started) when m >= N
+                    individual_params = [rm.EN_fitting(*fold, this_alpha, this_l1_ratio)[1].ravel() for this_alpha in alpha[rows]]
+                    assert np.allclose(path_params, individual_params, atol = 1e-2)
+
+@pytest.mark.parametrize('degree, trans_type, interaction', [(1, 'all', True), (2, 'all', True), (3, 'all', True), (3, 'poly', True), (2, 'all', False), (3, 'simple_interaction', True)])
+def test_feature_trans_columns_match_the_full_expansion(degree, trans_type, interaction):
+    rng = np.random.default_rng(0)
+    X, X_test = rng.uniform(0.5, 2, (20, 4)), rng.uniform(0.5, 2, (8, 4))
+    X[:, 1] -= 1 # A variable with negative entries, which has fewer transforms
+    all_pos_X = np.all(X >= 0, axis = 0) & np.all(X_test >= 0, axis = 0)
+    full, full_test, full_names = rm._feature_trans(X, X_test, degree, interaction, trans_type, all_pos_X)
+    columns = rng.choice(full.shape[1], min(15, full.shape[1]), replace = False)
+    reduced, reduced_test, reduced_names = rm._feature_trans(X, X_test, degree, interaction, trans_type, all_pos_X, columns = columns)
+    assert np.allclose(reduced, full[:, columns]) and np.allclose(reduced_test, full_test[:, columns])
+    assert np.array_equal(reduced_names, full_names[columns])
+
+@pytest.mark.parametrize('lag, transform_y', [(0, False), (2, False), (2, True)])
+def test_LCEN_transform_selection_matches_slicing_the_full_expansion(lag, transform_y):
+    rng = np.random.default_rng(0)
+    X, X_test = rng.uniform(0.5, 2, (30, 3)), rng.uniform(0.5, 2, (10, 3))
+    y, y_test = rng.uniform(0.5, 2, (30, 1)), rng.uniform(0.5, 2, (10, 1))
+    all_pos_X = np.ones(3, dtype = bool)
+    full = rm._LCEN_transform(X, y, X_test, y_test, 2, lag, transform_y = transform_y, all_pos_X = all_pos_X)
+    selection = np.zeros(full[0].shape[1], dtype = bool)
+    selection[rng.choice(len(selection), 12, replace = False)] = True
+    if lag: # Also selects the lagged copies of the X features and the y entries
+        selection[-1] = True
+    reduced = rm._LCEN_transform(X, y, X_test, y_test, 2, lag, selection = selection, transform_y = transform_y, all_pos_X = all_pos_X)
+    assert np.allclose(reduced[0], full[0][:, selection]) and np.allclose(reduced[2], full[2][:, selection])
+    assert np.array_equal(reduced[4], full[4])
+
+@pytest.mark.parametrize('trans_type, degrees', [('poly', (3, 1, 2)), ('all', (3, 1, 2)), ('all', (1, 3))])
+def test_LCEN_transform_degrees_views_match_each_degree(trans_type, degrees):
+    rng = np.random.default_rng(0)
+    X, X_test = rng.uniform(0.5, 2, (30, 3)), rng.uniform(0.5, 2, (10, 3))
+    y, y_test = rng.uniform(0.5, 2, (30, 1)), rng.uniform(0.5, 2, (10, 1))
+    all_pos_X = np.ones(3, dtype = bool)
+    expansions = rm._feature_trans_degrees(X, X_test, degrees, trans_type = trans_type, all_pos_X = all_pos_X)
+    assert expansions[max(degrees)][0].flags.owndata # The highest degree is not copied
+    if trans_type == 'poly': # Its lower degrees are contiguous columns
+        assert all(np.shares_memory(expansions[degree][0], expansions[max(degrees)][0]) for degree in degrees)
+    # The views must not be scaled in place, which would change the other degrees
+    together = rm._LCEN_transform_degrees(X, y, X_test, y_test, degrees, trans_type = trans_type, all_pos_X = all_pos_X)
+    for degree, output in zip(degrees, together):
+        single = rm._LCEN_transform(X, y, X_test, y_test, degree, trans_type = trans_type, all_pos_X = all_pos_X)
+        assert np.allclose(output[0], single[0]) and np.allclose(output[2], single[2])
+        assert np.array_equal(output[4], single[4])
+
+def _table_column(row, Z):
+    # Calculates a feature of _feature_table() or _LCEN_table() from its description alone
+    power, power2, variable = row['power'].astype(float), float(row['power2']), row['variable']
+    x, log = Z[:, variable] if variable >= 0 else None, np.log(Z)
+    formulae = {0: lambda: np.prod(Z**power, axis = 1), 1: lambda: np.prod(log**power, axis = 1), 2: lambda: np.sqrt(x), 3: lambda: 1/np.prod(Z**power, axis = 1),
+                4: lambda: x**(power[variable]+0.5), 5: lambda: log[:, variable]**power[variable] / x**power2, 6: lambda: 1/x**(power[variable]-0.5),
+                7: lambda: log[:, variable]**power[variable] / x**(power2-0.5)}
+    return formulae[row['transform']]()
+
+@pytest.mark.parametrize('degree, lag, min_lag, trans_type', [(3, 0, 0, 'all'), (2, 2, 0, 'all'), (3, 3, 1, 'poly')])
+def test_LCEN_table_describes_the_columns_and_names(degree, lag, min_lag, trans_type):
+    rng = np.random.default_rng(0)
+    X, X_test = rng.uniform(0.5, 2, (30, 3)), rng.uniform(0.5, 2, (10, 3))
+    y, y_test = rng.uniform(0.5, 2, (30, 1)), rng.uniform(0.5, 2, (10, 1))
+    all_pos_X = np.array([True, False, True]) # Fewer transforms for x1, as if it had negative entries
+    X_out, _, _, _, label_names = rm._LCEN_transform(X, y, X_test, y_test, degree, lag, min_lag, trans_type, all_pos_X = all_pos_X, scale_X = False, scale_y = False)
+    table, variable_names = rm._LCEN_table(3, degree, lag, min_lag, trans_type, True, False, tuple(all_pos_X.tolist()), (True,))
+    assert len(table) == X_out.shape[1] == len(label_names) and variable_names == ['x0', 'x1', 'x2', 'y']
+    Z = np.hstack((X, y))
+    for col, row in enumerate(table):
+        assert np.allclose(X_out[:, col], _table_column(row, Z[lag-row['lag'] : len(Z)-row['lag']]))
+        assert label_names[col].endswith(f'(t-{row["lag"]})') == (row['lag'] > 0)
+        assert all((variable_names[number] in label_names[col]) == (row['power'][number] != 0) for number in range(len(variable_names)))
@@ -14,6 +14,8 @@ setup(
     install_requires = [
         'notebook>=6.4.11',
         'scikit-learn>=1.0.2',
+        'joblib>=1.4', # For Parallel(return_as = 'generator_unordered')
+        'threadpoolctl>=3.1',
         'matplotlib>=3.5.1',
         'pandas>=1.4.2',
         'statsmodels>=0.13.2',